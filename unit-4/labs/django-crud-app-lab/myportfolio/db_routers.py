@@ -0,0 +1,107 @@
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Read replica routing (https://docs.djangoproject.com/en/5.2/topics/db/multi-db/)
+# ReplicaRoutingMiddleware marks requests for the read-only pages listed in REPLICA_READ_VIEWS, and ReadReplicaRouter sends the projects app's reads during those requests to the replica database.
+# Everything else goes to the primary ("default"): writes, every other page, and the auth and sessions tables, which must always be current.
+# Replicas lag a little behind the primary, so after a user changes something (any successful POST) their session is pinned to the primary for REPLICA_STICKY_SECONDS.
+# That way they always see their own changes, while everyone else's reads keep going to the replica.
+# Nothing changes until a replica is configured: without a REPLICA_DATABASE_ALIAS entry in DATABASES every query goes to "default".
+
+# Only these apps' tables are read from the replica
+REPLICA_APPS = {"projects"}
+# Session key holding the time until which this user's reads go to the primary
+STICKY_SESSION_KEY = "_db_primary_until"
+
+class RoutingState:
+    def __init__(self):
+        self.use_replica = False
+
+# The routing decision of the request being handled.
+# A context variable rather than a global or thread local: each request (and each async task) gets its own, and it follows async views into the threads the ORM runs their queries in.
+_routing = ContextVar("db_routing", default=None)
+
+def replica_alias():
+    alias = settings.REPLICA_DATABASE_ALIAS
+    return alias if alias in settings.DATABASES else None
+
+def using_replica():
+    state = _routing.get()
+    return bool(state and state.use_replica)
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in REPLICA_APPS and using_replica():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Name the primary explicitly: by default Django writes an object back to the database it was read from, which could be the replica
+        if model._meta.app_label in REPLICA_APPS:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary, so objects from either may point at each other
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica copies the primary's schema through replication, never through migrate
+        if db == replica_alias() and db != DEFAULT_DB_ALIAS:
+            return False
+        return None
+
+# List it after SessionMiddleware and AuthenticationMiddleware in MIDDLEWARE
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _routing.set(RoutingState())
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        self.pin_to_primary(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = _routing.set(RoutingState())
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        # Reading the user and writing to the session can both query the database, which async code must do in a thread
+        await sync_to_async(self.pin_to_primary)(request, response)
+        return response
+
+    # Called by Django once the URL is resolved, just before the view runs
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if replica_alias() is None or request.method not in ("GET", "HEAD"):
+            return None
+        if request.resolver_match.url_name not in settings.REPLICA_READ_VIEWS:
+            return None
+        if request.session.get(STICKY_SESSION_KEY, 0) > time.time():
+            return None
+        _routing.get().use_replica = True
+        return None
+
+    def pin_to_primary(self, request, response):
+        if request.method in ("GET", "HEAD", "OPTIONS") or response.status_code >= 400:
+            return
+        if replica_alias() is None or not request.user.is_authenticated:
+            return
+        request.session[STICKY_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
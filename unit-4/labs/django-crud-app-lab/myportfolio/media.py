@@ -0,0 +1,143 @@
+import mimetypes
+import os
+import posixpath
+import re
+from stat import S_ISREG
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# NOTES ON SERVING MEDIA:
+# serve_media() sends uploaded files (see urls.py). Unlike django.views.static.serve, which static() uses, it is meant to be used in production too:
+# - Every file gets an ETag and a Last-Modified date, and a browser asking "has it changed?" (If-None-Match / If-Modified-Since) gets an empty 304 Not Modified instead of the whole file again.
+# - Files named after their content's hash (see myportfolio/storage.py) never change, so the browser may keep them for a year without asking at all.
+#   Other files are sent with "no-cache", which means "ask every time": the 304s keep that cheap.
+# - Range requests (Range: bytes=0-1023) get just those bytes (206 Partial Content), so videos can seek and interrupted downloads can resume.
+# - With MEDIA_SENDFILE set, Django only checks the request and then hands the file to the web server (X-Sendfile for Apache and lighttpd, X-Accel-Redirect for nginx),
+#   which sends it far more efficiently and without tying up a Python worker for the whole download.
+# Without MEDIA_SENDFILE, whole files are sent with FileResponse, which WSGI servers such as gunicorn pass to the operating system's sendfile().
+# Example nginx setup for MEDIA_SENDFILE = "X-Accel-Redirect" (MEDIA_ACCEL_REDIRECT_PREFIX = "/internal-media/"):
+#   location /internal-media/ { internal; alias /path/to/uploads/; }
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+SENDFILE_HEADERS = {"x-sendfile": "X-Sendfile", "x-accel-redirect": "X-Accel-Redirect"}
+# Partial files are read this many bytes at a time
+CHUNK_SIZE = 64 * 1024
+# Only a single range is supported; a request for several gets the whole file, which HTTP allows
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def media_path(path):
+    path = posixpath.normpath(path).lstrip("/")
+    # Hidden files and folders (such as the storage's .blobs/) are never served
+    if any(part.startswith(".") for part in path.split("/")):
+        raise Http404("Not found")
+    try:
+        return safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+
+def make_etag(path, stat):
+    # A content-addressed name already is the hash of the content; otherwise the time it was last changed and its size will do, as in nginx
+    digest = getattr(default_storage, "digest", lambda name: None)(path)
+    return f'"{digest}"' if digest else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+# Returns (first byte, last byte) to send, None to send the whole file, or False when the range is outside the file
+def byte_range(header, size):
+    match = RANGE.match(header.replace(" ", ""))
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # "bytes=-500" means the last 500 bytes
+        if int(last) == 0 or size == 0:
+            return False
+        return max(size - int(last), 0), size - 1
+    if last and int(last) < int(first):
+        return None
+    if int(first) >= size:
+        return False
+    return int(first), min(int(last), size - 1) if last else size - 1
+
+# If-Range asks for the range only if the file is still the one the browser has part of; otherwise it wants the whole file
+def range_still_valid(request, etag, last_modified):
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+def read_range(path, start, length):
+    with open(path, "rb") as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+@require_safe
+def serve_media(request, path):
+    full_path = media_path(path)
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Not found")
+    if not S_ISREG(stat.st_mode):
+        raise Http404("Not found")
+
+    etag = make_etag(path, stat)
+    last_modified = int(stat.st_mtime)
+    is_immutable = getattr(default_storage, "is_immutable", lambda name: False)(path)
+    # The headers every answer about this file carries, including a 304 Not Modified
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if is_immutable else REVALIDATE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    response = get_conditional_response(request, etag, last_modified, HttpResponse(headers=headers))
+    if response.status_code != 200:
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    headers["Content-Type"] = content_type or "application/octet-stream"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    sendfile = settings.MEDIA_SENDFILE.lower()
+    if sendfile:
+        if sendfile not in SENDFILE_HEADERS:
+            raise ImproperlyConfigured(f"MEDIA_SENDFILE must be one of {', '.join(SENDFILE_HEADERS.values())}, or empty")
+        # The web server checks Range itself and sends the file; these headers are kept on its response
+        if sendfile == "x-accel-redirect":
+            headers["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(posixpath.normpath(path).lstrip("/"))
+        else:
+            headers["X-Sendfile"] = full_path
+        return HttpResponse(headers=headers)
+
+    size = stat.st_size
+    requested = byte_range(request.headers.get("Range", ""), size) if range_still_valid(request, etag, last_modified) else None
+    if requested is False:
+        headers["Content-Range"] = f"bytes */{size}"
+        return HttpResponse(status=416, headers=headers)
+    if requested is not None:
+        start, end = requested
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = end - start + 1
+        if request.method == "HEAD":
+            return HttpResponse(status=206, headers=headers)
+        return StreamingHttpResponse(read_range(full_path, start, end - start + 1), status=206, headers=headers)
+
+    if request.method == "HEAD":
+        headers["Content-Length"] = size
+        return HttpResponse(headers=headers)
+    return FileResponse(open(full_path, "rb"), headers=headers)
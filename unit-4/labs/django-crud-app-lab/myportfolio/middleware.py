@@ -0,0 +1,15 @@
+from django.middleware.gzip import GZipMiddleware
+
+# Content types worth compressing. Images (other than SVG), video, fonts and zip files are compressed already, and gzipping them again only costs CPU.
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+# GZipMiddleware compresses every response of 200 bytes or more the browser accepts gzip for. This version leaves alone:
+# - responses whose content is compressed already (see COMPRESSIBLE_TYPES), such as the uploaded project images
+# - partial responses (206 and Range answers from myportfolio/media.py): Content-Range counts bytes of the file, so the bytes sent must not change
+# Like GZipMiddleware it adds up to 100 random bytes to each compressed response, which defeats the BREACH attack on the CSRF token in the pages.
+class CompressionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        if response.status_code == 206 or response.has_header("Content-Range") or not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        return super().process_response(request, response)
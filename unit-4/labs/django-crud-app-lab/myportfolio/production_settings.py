@@ -0,0 +1,43 @@
+import os
+from django.core.exceptions import ImproperlyConfigured
+from myportfolio.settings import *  # noqa: F401,F403
+from myportfolio.settings import TEMPLATES
+
+# NOTES ON PRODUCTION SETTINGS:
+# Start the server with DJANGO_SETTINGS_MODULE=myportfolio.production_settings (e.g. `DJANGO_SETTINGS_MODULE=myportfolio.production_settings gunicorn myportfolio.wsgi`).
+# Everything comes from settings.py except what is changed below.
+# Deploy steps: `python manage.py migrate`, then `python manage.py warm_templates` (stops the deploy if a template is broken).
+
+DEBUG = False
+
+# The key in settings.py is in the repository, so production must set its own: refuse to start without it rather than quietly use the public one
+SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY")
+if not SECRET_KEY:
+    raise ImproperlyConfigured("Set the DJANGO_SECRET_KEY environment variable to a long random value (see production_settings.py)")
+ALLOWED_HOSTS = os.environ.get("DJANGO_ALLOWED_HOSTS", "localhost").split(",")
+
+# settings.py worked SERVE_MEDIA out while DEBUG was still on; without a web server serving MEDIA_ROOT, set SERVE_MEDIA=1 (see myportfolio/media.py)
+SERVE_MEDIA = os.environ.get("SERVE_MEDIA") == "1"
+
+# The cached template loader, spelled out: templates are parsed once per process and never checked for changes (restart to pick up new ones).
+# APP_DIRS has to be off when loaders are listed; the app_directories loader does the same job.
+# Template debug off skips the bookkeeping used for the yellow error pages, which DEBUG = False never shows anyway.
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        "APP_DIRS": False,
+        "OPTIONS": {
+            **TEMPLATES[0]["OPTIONS"],
+            "debug": False,
+            "loaders": [
+                ("django.template.loaders.cached.Loader", [
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ]),
+            ],
+        },
+    },
+]
+
+# Parse every template when a server process starts (see myportfolio/template_cache.py)
+WARM_TEMPLATES = True
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,10 +44,18 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Gzips the pages on their way out (see myportfolio/middleware.py). Listed above everything that reads or changes the response body, so it runs last on the way out.
+    'myportfolio.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # Answers "has it changed?" (If-None-Match / If-Modified-Since) with an empty 304 for any response with an ETag or Last-Modified date,
+    # and gives the others an ETag made from their content. Below CompressionMiddleware so that ETag is taken of the uncompressed page.
+    # That still renders the page first; the project list answers with a 304 before rendering anything (see projects/conditional.py).
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Sends the read-only pages' queries to the read replica, if there is one (see myportfolio/db_routers.py)
+    'myportfolio.db_routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -72,17 +81,65 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'myportfolio.wsgi.application'
 
+# Parse every template when the server starts instead of on first use (see myportfolio/template_cache.py). production_settings.py turns it on.
+WARM_TEMPLATES = False
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection reuse
+# Without CONN_MAX_AGE Django opens a new connection to Postgres at the start of every request and closes it at the end.
+# Connecting (TCP, authentication, backend process start up) usually takes longer than all of a page's queries together.
+# CONN_MAX_AGE keeps a connection open for that many seconds and reuses it for the following requests of the same thread (None keeps it forever).
+# CONN_HEALTH_CHECKS makes sure a reused connection still works before a request uses it, so a database restart does not turn into errors.
+# Instead of that, DB_POOL=1 turns on Django's connection pool, shared by every thread of a process, which also suits ASGI where each request may run in a new thread.
+# The pool needs psycopg 3 (pipenv install "psycopg[binary,pool]" in place of psycopg2-binary), and CONN_MAX_AGE must be 0 with it because the pool does the reusing.
+# Check the effect with `python manage.py benchmark_connections`.
+# Persistent connections only suit WSGI. Under ASGI (asgi.py sets DJANGO_ASGI=1) or with ASYNC_READ_VIEWS on, the sync ORM code runs in sync_to_async threads, each with its own connection,
+# and CONN_MAX_AGE would keep every one of them open until they pile up (https://docs.djangoproject.com/en/5.2/ref/databases/#persistent-connections).
+# There CONN_MAX_AGE is always 0, whatever DB_CONN_MAX_AGE says: turn on DB_POOL=1 to reuse connections instead.
+# Environment variables: DB_CONN_MAX_AGE (seconds, or none for no limit; default 60), DB_POOL (1 to turn the pool on), DB_POOL_MIN_SIZE and DB_POOL_MAX_SIZE.
+
+DB_POOL = os.environ.get("DB_POOL") == "1"
+DB_CONN_MAX_AGE = os.environ.get("DB_CONN_MAX_AGE", "60")
+ASYNC_SERVER = os.environ.get("DJANGO_ASGI") == "1" or os.environ.get("ASYNC_READ_VIEWS") == "1"
+
 DATABASES = {
     'default': {
        'ENGINE': 'django.db.backends.postgresql',
        'NAME': 'myportfolio',
+       'CONN_MAX_AGE': 0 if DB_POOL or ASYNC_SERVER else (None if DB_CONN_MAX_AGE.lower() == "none" else int(DB_CONN_MAX_AGE)),
+       'CONN_HEALTH_CHECKS': True,
+       'OPTIONS': {
+           'pool': {
+               'min_size': int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+               'max_size': int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+           },
+       } if DB_POOL else {},
    }
 }
 
+# Read replica
+# Set DB_REPLICA_HOST (and DB_REPLICA_NAME if it differs) to send the read-only pages below to a streaming replica of the primary database (see myportfolio/db_routers.py).
+# The replica uses the same settings as 'default' otherwise. In tests it mirrors 'default', so no second test database is created.
+REPLICA_DATABASE_ALIAS = "replica"
+if os.environ.get("DB_REPLICA_HOST"):
+    DATABASES[REPLICA_DATABASE_ALIAS] = {
+        **DATABASES['default'],
+        'HOST': os.environ["DB_REPLICA_HOST"],
+        'NAME': os.environ.get("DB_REPLICA_NAME", DATABASES['default']['NAME']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ["myportfolio.db_routers.ReadReplicaRouter"]
+
+# URL names of the pages whose projects queries may be answered by the replica
+REPLICA_READ_VIEWS = ["project_list", "project_detail", "project_search"]
+
+# How long after a change a user's pages are read from the primary, so they see their own writes despite replication lag
+REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,6 +182,25 @@ STATIC_URL = 'static/'
 MEDIA_ROOT = BASE_DIR / "uploads/"
 MEDIA_URL = "media/"
 
+# Store uploads under the SHA-256 hash of their content, so a file uploaded many times is only kept once (see myportfolio/storage.py)
+STORAGES = {
+    "default": {
+        "BACKEND": "myportfolio.storage.ContentAddressedStorage",
+        # Projects sharing a picture share its file, so a file is only deleted once no project uses it any more
+        "OPTIONS": {"in_use": "projects.images.file_in_use"},
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
+# Uploads are served by myportfolio/media.py. Set SERVE_MEDIA to 1 to keep serving them from Django when DEBUG is off.
+SERVE_MEDIA = DEBUG or os.environ.get("SERVE_MEDIA") == "1"
+# Leave empty to send uploads from Python, or set it to "X-Sendfile" (Apache, lighttpd) or "X-Accel-Redirect" (nginx) to let the web server send them
+MEDIA_SENDFILE = os.environ.get("MEDIA_SENDFILE", "")
+# The internal nginx location that points at MEDIA_ROOT, used with X-Accel-Redirect
+MEDIA_ACCEL_REDIRECT_PREFIX = "/internal-media/"
+
 # Add this variable to specify where decorators and mixins should redirect to
 LOGIN_URL = 'home'
 
@@ -134,6 +210,18 @@ LOGIN_REDIRECT_URL = '/projects/'
 # Add this variable to specify where logging out redirects to
 LOGOUT_REDIRECT_URL = 'home'
 
+# Turn this on when the site is served by an ASGI server (e.g. `uvicorn myportfolio.asgi:application`) to use the async versions of the project list and detail pages.
+# Leave it off under WSGI (runserver, gunicorn), where every async view would need its own event loop.
+# Set the ASYNC_READ_VIEWS environment variable to 1 to turn it on without editing this file.
+ASYNC_READ_VIEWS = os.environ.get("ASYNC_READ_VIEWS") == "1"
+
+# Background tasks (see projects/tasks.py)
+# How many seconds a worker may spend on a task before other workers assume it died and run the task again
+TASK_VISIBILITY_TIMEOUT = 300
+# Run tasks straight away in the request that queues them instead of waiting for `python manage.py run_worker`.
+# Set the TASK_QUEUE_EAGER environment variable to 1 when developing without a worker.
+TASK_QUEUE_EAGER = os.environ.get("TASK_QUEUE_EAGER") == "1"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+from django.core.files.storage import FileSystemStorage
+from django.utils.module_loading import import_string
+
+# NOTES ON CONTENT-ADDRESSED STORAGE:
+# The default FileSystemStorage saves every upload as a new file, so the same screenshot uploaded to ten projects takes up ten times the disk space.
+# ContentAddressedStorage (the "default" entry in STORAGES) names each upload after the SHA-256 hash of its content instead of the name it was uploaded with:
+#   project3.png -> project_images/5f0c...e1.png
+# - The file's bytes are kept once, in uploads/.blobs/5f/5f0c...e1. Every name with that content is a hard link to that blob, so it takes no extra space.
+# - The same content uploaded to the same folder gets the same name, and the file is not written again.
+# - The number of hard links is the reference count: delete() removes a name, and removes the blob with its last name.
+# - A name that contains the content's hash can never start holding different content, so browsers may cache it forever
+#   (see myportfolio/media.py, and in production have the web server send "Cache-Control: public, max-age=31536000, immutable" for these names).
+# Hard links need the blobs and the names on one filesystem that supports them (any Linux or macOS filesystem, NTFS), which is why the blobs live inside MEDIA_ROOT.
+# Files saved before this storage was turned on keep their old names and are served as before.
+# Because equal content gets one name, two projects that upload the same picture point at the very same file, and the hard link count cannot tell them apart.
+# So delete() first asks the `in_use` function named in the storage's OPTIONS (see STORAGES in settings.py) whether any row still uses the name,
+# and leaves the file alone if one does. Clear the field (and save) before deleting its file, or the file stays until it is deleted again.
+
+BLOB_DIRECTORY = ".blobs"
+# Uploads are read and hashed this many bytes at a time, so a large upload is never held in memory whole
+CHUNK_SIZE = 64 * 1024
+CONTENT_NAME = re.compile(r"^(?P<digest>[0-9a-f]{64})(\.[A-Za-z0-9]+)?$")
+
+class ContentAddressedStorage(FileSystemStorage):
+    # in_use: a function (or its dotted path) taking a name and returning True while something still refers to it
+    def __init__(self, *args, in_use=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_use = in_use
+
+    def is_in_use(self, name):
+        if self.in_use is None:
+            return False
+        # Imported on first use, since the function usually queries models that are not ready while settings are read
+        in_use = import_string(self.in_use) if isinstance(self.in_use, str) else self.in_use
+        return in_use(name)
+
+    def blob_path(self, digest):
+        return os.path.join(self.location, BLOB_DIRECTORY, digest[:2], digest)
+
+    # The hash a name was given by this storage, or None for any other name
+    def digest(self, name):
+        match = CONTENT_NAME.match(posixpath.basename(name))
+        return match["digest"] if match else None
+
+    def is_immutable(self, name):
+        return self.digest(name) is not None
+
+    # How many names share this file's content (0 when the file was not saved by this storage)
+    def references(self, name):
+        digest = self.digest(name)
+        try:
+            return os.stat(self.blob_path(digest)).st_nlink - 1 if digest else 0
+        except FileNotFoundError:
+            return 0
+
+    def get_available_name(self, name, max_length=None):
+        # The real name is only known once the content has been hashed, so leave it alone here and pick it in _save()
+        return name
+
+    def _save(self, name, content):
+        blobs = os.path.join(self.location, BLOB_DIRECTORY)
+        os.makedirs(blobs, exist_ok=True)
+        # Copy the upload to a temporary file, hashing each chunk on the way, then give it its real name
+        temporary = os.path.join(blobs, f"upload-{uuid.uuid4().hex}")
+        digest = hashlib.sha256()
+        with open(temporary, "xb") as output:
+            for chunk in content.chunks(CHUNK_SIZE):
+                digest.update(chunk)
+                output.write(chunk)
+        try:
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            digest = digest.hexdigest()
+            extension = posixpath.splitext(name)[1].lower()
+            name = posixpath.join(posixpath.dirname(name), digest + extension)
+            self.link(temporary, digest, self.path(name))
+        finally:
+            os.unlink(temporary)
+        return name
+
+    def link(self, temporary, digest, path):
+        blob = self.blob_path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        while True:
+            try:
+                os.link(temporary, blob)
+            except FileExistsError:
+                # This content is stored already; the temporary copy is thrown away
+                pass
+            try:
+                os.link(blob, path)
+            except FileExistsError:
+                # The same content was uploaded to this folder before, under this very name
+                return
+            except FileNotFoundError:
+                # delete() removed the blob along with its last name in between: store it again
+                continue
+            return
+
+    def delete(self, name):
+        # Another row still shows this file
+        if self.is_in_use(name):
+            return
+        digest = self.digest(name)
+        path = self.path(name)
+        blob = self.blob_path(digest) if digest else None
+        shares_blob = blob is not None and os.path.exists(path) and os.path.exists(blob) and os.path.samefile(path, blob)
+        super().delete(name)
+        if shares_blob:
+            try:
+                # Only the blob's own link is left: nothing uses this content any more
+                if os.stat(blob).st_nlink == 1:
+                    os.unlink(blob)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,49 @@
+import time
+from pathlib import Path
+from django.conf import settings
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.cached import Loader as CachedLoader
+
+# NOTES ON TEMPLATE CACHING:
+# Turning a template file into a Template object (reading it, then parsing every tag and variable) costs far more than rendering it.
+# The cached template loader keeps each parsed template in memory, so every template is only parsed once per process.
+# production_settings.py turns it on explicitly, together with template debug off (no line-number bookkeeping while parsing and rendering).
+# warm_templates() parses every template of this site up front, so the first visitor to each page after a deploy does not pay for it;
+# wsgi.py and asgi.py call it when WARM_TEMPLATES is on. `python manage.py warm_templates` does the same at deploy time to catch template errors before the site goes live.
+
+# The template folders of this site (the apps' templates/ folders and DIRS), leaving out the ones that come with Django and other packages
+def template_directories(engine):
+    for loader in engine.template_loaders:
+        loaders = loader.loaders if isinstance(loader, CachedLoader) else [loader]
+        for inner in loaders:
+            for directory in inner.get_dirs():
+                directory = Path(directory)
+                if directory.is_dir() and directory.resolve().is_relative_to(Path(settings.BASE_DIR).resolve()):
+                    yield directory
+
+def template_names(engine):
+    names = set()
+    for directory in template_directories(engine):
+        names.update(path.relative_to(directory).as_posix() for path in directory.rglob("*.html"))
+    return sorted(names)
+
+def django_engines():
+    return [backend.engine for backend in engines.all() if isinstance(backend, DjangoTemplates)]
+
+# Load (and with the cached loader, keep) every template. Returns {template name: milliseconds it took}.
+# Raises the first TemplateSyntaxError it meets unless `errors` is a list to collect (name, error) pairs in.
+def warm_templates(errors=None):
+    timings = {}
+    for engine in django_engines():
+        for name in template_names(engine):
+            started = time.perf_counter()
+            try:
+                engine.get_template(name)
+            except Exception as error:
+                if errors is None:
+                    raise
+                errors.append((name, error))
+                continue
+            timings[name] = (time.perf_counter() - started) * 1000
+    return timings
@@ -28,10 +28,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-# Import static to help serve media files during development
-from django.conf.urls.static import static
+# ? Import static to help serve media files during development
+# ? from django.conf.urls.static import static
+from myportfolio.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -39,4 +40,11 @@ urlpatterns = [
     # Add the following line to include the projects app URLs after projects template is created.
     path("projects/", include("projects.urls")),
     path("accounts/", include("django.contrib.auth.urls")),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# ? ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
+
+# Serve media files, like static() did during development, but with caching, range requests and (with MEDIA_SENDFILE) web server offload (see myportfolio/media.py)
+if settings.SERVE_MEDIA:
+    urlpatterns += [
+        re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.*)$", serve_media),
+    ]
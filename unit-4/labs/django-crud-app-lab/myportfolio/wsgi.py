@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myportfolio.settings')
 
 application = get_wsgi_application()
+
+# Parse all the templates now, before the first request needs them (production_settings.py turns this on)
+if settings.WARM_TEMPLATES:
+    from myportfolio.template_cache import warm_templates
+
+    warm_templates()
@@ -1,12 +1,27 @@
 from django.contrib import admin
 # Import Project and Technology classes from models.py
-from projects.models import Project, Technology
+from projects.models import Project, Task, Technology
+# Import the background task queue, which makes the resized copies of uploaded images
+from projects.tasks import enqueue
+from projects.images import forget_variants
 
 class ProjectAdmin(admin.ModelAdmin):
-    pass
+    # Images uploaded through the admin need their resized copies too (see projects/images.py)
+    def save_model(self, request, obj, form, change):
+        if "image" in form.changed_data:
+            forget_variants(obj)
+        super().save_model(request, obj, form, change)
+        if "image" in form.changed_data:
+            enqueue("projects.tasks.process_project_image", obj.pk)
 
 class TechnologyAdmin(admin.ModelAdmin):
     pass
 
+# Shows queued and failed background tasks, with the error of the last attempt
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ["name", "args", "status", "attempts", "run_after", "created_at"]
+    list_filter = ["status", "name"]
+
 admin.site.register(Project, ProjectAdmin)
-admin.site.register(Technology, TechnologyAdmin)
\ No newline at end of file
+admin.site.register(Technology, TechnologyAdmin)
+admin.site.register(Task, TaskAdmin)
\ No newline at end of file
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'projects'
+
+    def ready(self):
+        # Connect the signal handlers that keep the search vectors and Project.updated_at (for the project list's ETag) up to date
+        from projects import signals  # noqa: F401
@@ -0,0 +1,59 @@
+import hashlib
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+# NOTES ON CONDITIONAL PAGES:
+# A browser that has a page already sends its ETag back (If-None-Match) when it loads the page again. If nothing on the page has changed,
+# the view answers with an empty 304 Not Modified and the browser shows its own copy: no template rendering and no page sent.
+# The ETag has to change whenever the page would, so the project list's (see project_list_etag in views.py) is made from:
+# - the newest updated_at and the number of the projects listed (an added or changed project moves the first, a deleted one the second)
+# - the user, since each user sees their own projects
+# - the CSRF cookie: every page holds a CSRF token for its forms (the logout button in base.html), and a copy kept from before the cookie changed would hold a token that no longer works
+# The cards and the filter bar also show technology names, so the handlers in signals.py bump updated_at of the projects whose technologies are added, removed, renamed or deleted.
+# ConditionalGetMiddleware cannot do this by itself: it hashes the rendered page, so the page is rendered anyway, and the CSRF token is masked differently on every render, so that hash never matches.
+# Changing a template does not change the ETags, so after deploying template changes browsers may keep showing their copies until something on the page changes.
+
+def page_etag(request, *parts):
+    key = "|".join(str(part) for part in (request.user.pk, request.META["CSRF_COOKIE"], *parts))
+    # Hashed so the CSRF secret never shows up in the header
+    return f'"{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"'
+
+# Only a logged in user with a CSRF cookie gets an ETag. Without the cookie, rendering the page is what makes it.
+def can_etag(request):
+    return request.user.is_authenticated and request.META.get("CSRF_COOKIE") is not None
+
+def changes(queryset):
+    stats = queryset.order_by().aggregate(updated=Max("updated_at"), count=Count("id"))
+    return stats["updated"], stats["count"]
+
+async def achanges(queryset):
+    stats = await queryset.order_by().aaggregate(updated=Max("updated_at"), count=Count("id"))
+    return stats["updated"], stats["count"]
+
+# Like django.views.decorators.http.condition(etag_func=...), which cannot await the async views' queries.
+# An async view takes an async etag_func. Also marks the pages private (only the user's own browser may keep them)
+# and "no-cache" (the browser must ask whether its copy is current before showing it, which is what sends the ETag back).
+def conditional_page(etag_func):
+    def finish(request, response, etag):
+        if etag and request.method in ("GET", "HEAD"):
+            response.headers.setdefault("ETag", etag)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                etag = await etag_func(request, *args, **kwargs)
+                response = get_conditional_response(request, etag=etag) or await view(request, *args, **kwargs)
+                return finish(request, response, etag)
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                etag = etag_func(request, *args, **kwargs)
+                response = get_conditional_response(request, etag=etag) or view(request, *args, **kwargs)
+                return finish(request, response, etag)
+        return inner
+    return decorator
@@ -0,0 +1,107 @@
+import hashlib
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.db.models.functions import Now
+
+# NOTES ON IMAGE VARIANTS:
+# Uploaded project images are full size photos and screenshots (often several MB), but the project list only shows them 300px wide.
+# When an image is uploaded we save smaller WebP copies ("variants") next to it in project_images/variants/, and the templates ask for the variant that fits (see templatetags/image_variants.py).
+# Variants are named after the SHA-256 hash of the original's content, and a project whose picture another project already has reuses that project's variants, so the same picture is only resized once.
+# Resizing needs Pillow (pipenv install pillow). Without it no variants are made and the templates keep showing the original image.
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Variant name -> largest width in pixels. Images are only ever scaled down, keeping their aspect ratio.
+VARIANT_WIDTHS = {
+    "thumb": 300,
+    "medium": 800,
+}
+VARIANT_DIRECTORY = "project_images/variants"
+WEBP_QUALITY = 80
+
+def hash_file(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(64 * 1024), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+# The name a variant is saved under. ContentAddressedStorage keeps the folder but renames the file after the variant's own content,
+# so an existing variant is found through a project with the same image_hash (reuse_variants), never by this name.
+def variant_name(image_hash, width):
+    # Spread the files over 256 folders by the first two characters of the hash so no folder gets huge
+    return f"{VARIANT_DIRECTORY}/{image_hash[:2]}/{image_hash}-{width}w.webp"
+
+def resize_to_webp(original, width):
+    resized = original.copy()
+    # thumbnail() scales down in place to fit the box and never scales up
+    resized.thumbnail((width, width * 10))
+    output = BytesIO()
+    resized.save(output, format="WEBP", quality=WEBP_QUALITY)
+    return ContentFile(output.getvalue())
+
+# Whether any project still shows this file, as its image or as one of its variants (used by ContentAddressedStorage.delete)
+def file_in_use(name):
+    from projects.models import Project
+
+    # image_variants is stored as JSON text, in which the name appears in quotes
+    return Project.objects.filter(Q(image=name) | Q(image_variants__icontains=f'"{name}"')).exists()
+
+# The recorded variants belong to the old picture once the image is replaced or cleared.
+# Forget them before the project is saved, so the pages show the new original (or no image) until a worker has made the new variants.
+def forget_variants(project):
+    project.image_hash = ""
+    project.image_variants = {}
+
+# Make the variants for one project's image and record them on the project.
+# Returns the {variant name: storage path} dict that was saved (empty when there is no image or Pillow is missing).
+def generate_variants(project, storage=default_storage):
+    from projects.models import Project
+
+    if not project.image:
+        variants, image_hash = {}, ""
+    else:
+        with project.image.open("rb") as file:
+            image_hash = hash_file(file)
+            variants = {}
+            if Image is not None:
+                variants = reuse_variants(project, image_hash, storage) or make_variants(file, image_hash, storage)
+    project.image_hash = image_hash
+    project.image_variants = variants
+    # update() rather than save() so only these columns are written and no save signals fire a second time.
+    # update() skips auto_now, so updated_at is set here: the project list shows the new thumbnail.
+    Project.objects.filter(pk=project.pk).update(image_hash=image_hash, image_variants=variants, updated_at=Now())
+    return variants
+
+# Variants another project already has for the same picture
+def reuse_variants(project, image_hash, storage):
+    from projects.models import Project
+
+    others = Project.objects.filter(image_hash=image_hash).exclude(pk=project.pk).exclude(image_variants={})
+    for variants in others.values_list("image_variants", flat=True)[:5]:
+        if set(variants) == set(VARIANT_WIDTHS) and all(storage.exists(name) for name in variants.values()):
+            return variants
+    return None
+
+def make_variants(file, image_hash, storage):
+    # Already processed pictures were found by reuse_variants() (by image_hash); here every variant is made
+    try:
+        original = Image.open(file)
+        # Phone photos store their rotation separately; apply it so the variants are the right way up
+        original = ImageOps.exif_transpose(original)
+        original.load()
+    except (OSError, SyntaxError):
+        # Not an image Pillow can read (e.g. a PDF uploaded to the FileField): keep serving the original
+        return {}
+    if original.mode not in ("RGB", "RGBA"):
+        original = original.convert("RGBA")
+    names = {}
+    for variant, width in VARIANT_WIDTHS.items():
+        # The storage may pick another name than the one asked for (ContentAddressedStorage names files after their content), so keep the one it returns
+        names[variant] = storage.save(variant_name(image_hash, width), resize_to_webp(original, width))
+    return names
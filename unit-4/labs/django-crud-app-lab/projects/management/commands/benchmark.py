@@ -0,0 +1,178 @@
+import itertools
+import json
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from projects.models import Project
+from projects.seeding import seed_projects
+
+# Run with: python manage.py benchmark --output before.json
+# Creates a throwaway test database (like `manage.py test` does), seeds it with a deterministic fixture,
+# then requests every page of the site with Django's test client from several threads at once and reports
+# p50/p95/p99 latency, throughput and database queries per route as JSON.
+# Run it before and after a change with the same arguments and compare the two files.
+# Only GET pages are driven so every run sees the same data.
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    rank = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+def summarize(samples):
+    latencies = sorted(sample["ms"] for sample in samples)
+    queries = [sample["queries"] for sample in samples]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for sample in samples if sample["status"] >= 400),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3),
+        "queries_mean": round(sum(queries) / len(queries), 2),
+        "queries_max": max(queries),
+    }
+
+class Command(BaseCommand):
+    help = "Benchmark every myportfolio page against a seeded test database and report latency and query counts as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--projects-per-user", type=int, default=50)
+        parser.add_argument("--technologies", type=int, default=20)
+        parser.add_argument("--technologies-per-project", type=int, default=3)
+        parser.add_argument("--skew", type=float, default=0.0, help="How unevenly projects are shared between users (see the seed command)")
+        parser.add_argument("--requests", type=int, default=100, help="Timed requests per route (default: 100)")
+        parser.add_argument("--warmup", type=int, default=5, help="Untimed requests per route before measuring (default: 5)")
+        parser.add_argument("--concurrency", type=int, default=4, help="Number of client threads (default: 4)")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the fixture and request order")
+        parser.add_argument("--output", help="Write the JSON report to this file instead of standard output")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as report_file:
+                report_file.write(output + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def run_benchmark(self, options):
+        started = time.perf_counter()
+        fixture = seed_projects(
+            users=options["users"],
+            projects_per_user=options["projects_per_user"],
+            technologies=options["technologies"],
+            technologies_per_project=options["technologies_per_project"],
+            skew=options["skew"],
+            seed=options["seed"],
+        )
+        fixture["seconds"] = round(time.perf_counter() - started, 3)
+
+        # Benchmark as the user with the most projects
+        busiest = Project.objects.values("user").annotate(total=Count("id")).order_by("-total", "user")[:1]
+        user = User.objects.get(id=busiest.values("user"))
+        routes = self.build_routes(user, random.Random(options["seed"]))
+
+        # One logged in test client per thread. Logging in writes a session, so log every client in up front
+        # (a write racing the other threads' reads can fail on SQLite) and hand them out as the threads start.
+        clients = queue.SimpleQueue()
+        for _ in range(options["concurrency"]):
+            client = Client()
+            client.force_login(user)
+            clients.put(client)
+        local = threading.local()
+
+        def get_client():
+            if not hasattr(local, "client"):
+                local.client = clients.get()
+            return local.client
+
+        def timed_get(job):
+            route_name, url = job
+            client = get_client()
+            with CaptureQueriesContext(connections["default"]) as queries:
+                request_started = time.perf_counter()
+                response = client.get(url)
+                elapsed_ms = (time.perf_counter() - request_started) * 1000
+            return route_name, {"ms": elapsed_ms, "status": response.status_code, "queries": len(queries)}
+
+        def jobs(count):
+            # Interleave the routes so every route sees the same mix of concurrent traffic
+            return [
+                (route_name, next(urls))
+                for _ in range(count)
+                for route_name, urls in routes
+            ]
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            list(pool.map(timed_get, jobs(options["warmup"])))
+            run_started = time.perf_counter()
+            results = list(pool.map(timed_get, jobs(options["requests"])))
+            wall_seconds = time.perf_counter() - run_started
+
+        samples = {}
+        for route_name, sample in results:
+            samples.setdefault(route_name, []).append(sample)
+        return {
+            "project": "myportfolio",
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "options": {key: options[key] for key in (
+                "users", "projects_per_user", "technologies", "technologies_per_project", "skew",
+                "requests", "warmup", "concurrency", "seed",
+            )},
+            "fixture": fixture,
+            "total": {
+                "requests": len(results),
+                "errors": sum(1 for _, sample in results if sample["status"] >= 400),
+                "wall_seconds": round(wall_seconds, 3),
+                "throughput_rps": round(len(results) / wall_seconds, 1),
+            },
+            "routes": {route_name: summarize(route_samples) for route_name, route_samples in samples.items()},
+        }
+
+    # (route name, endless iterator of URLs) for every GET page in pages.urls and projects.urls.
+    # Pages for one object cycle through the benchmark user's projects.
+    def build_routes(self, user, rng):
+        project_ids = list(Project.objects.filter(user=user).values_list("id", flat=True))
+        rng.shuffle(project_ids)
+
+        def each(name, ids):
+            return itertools.cycle([reverse(name, kwargs={"pk": object_id}) for object_id in ids])
+
+        def fixed(url):
+            return itertools.repeat(url)
+
+        return [
+            ("home", fixed(reverse("home"))),
+            ("signup", fixed(reverse("signup"))),
+            ("project_list", fixed(reverse("project_list"))),
+            ("project_detail", each("project_detail", project_ids)),
+            ("project_create", fixed(reverse("project_create"))),
+            ("project_update", each("project_update", project_ids)),
+            ("project_delete", each("project_delete", project_ids)),
+        ]
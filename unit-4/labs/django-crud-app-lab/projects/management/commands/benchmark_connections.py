@@ -0,0 +1,125 @@
+import copy
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.db.utils import load_backend
+from projects.management.commands.benchmark import percentile
+from projects.models import Project
+
+# How many projects the benchmark query loads, about one page's worth
+PAGE_SIZE = 24
+
+# Run with: python manage.py benchmark_connections
+# Shows what reusing database connections (the CONN_MAX_AGE / DB_POOL settings) saves per request.
+# Each "request" does what Django does around a real one: check whether the connection should be closed (request_started),
+# run the project list page's query, then close the connection unless it may be reused (request_finished).
+# The same requests run once per connection strategy, each on its own connection built from DATABASES[--database]:
+#   new-connection  CONN_MAX_AGE=0: connect and disconnect every request (Django's default)
+#   persistent      CONN_MAX_AGE=None with CONN_HEALTH_CHECKS: connect once, then reuse
+#   pool            Django's psycopg 3 connection pool (Postgres with psycopg[pool] only; skipped otherwise)
+# Run it against Postgres over the network to see the real difference; on SQLite connecting is nearly free.
+
+def summarize(latencies, connects):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "connects": connects,
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3),
+    }
+
+def pool_available(settings_dict):
+    if settings_dict["ENGINE"] != "django.db.backends.postgresql":
+        return False
+    try:
+        import psycopg  # noqa: F401
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class Command(BaseCommand):
+    help = "Compare per-request latency with a new database connection per request, persistent connections and the connection pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests per strategy (default: 200)")
+        parser.add_argument("--database", default="default", help="Which entry in DATABASES to connect to (default: default)")
+        parser.add_argument("--output", help="Write the JSON report to this file instead of standard output")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests must be at least 1")
+        configured = connections[options["database"]].settings_dict
+        strategies = {
+            "new-connection": {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "OPTIONS": {"pool": False}},
+            "persistent": {"CONN_MAX_AGE": None, "CONN_HEALTH_CHECKS": True, "OPTIONS": {"pool": False}},
+        }
+        if pool_available(configured):
+            strategies["pool"] = {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "OPTIONS": {"pool": True}}
+        else:
+            self.stderr.write("Skipping pool: it needs Postgres with psycopg 3 and psycopg_pool installed.")
+
+        report = {
+            "database": configured["ENGINE"].rsplit(".", 1)[-1],
+            "configured": {
+                "CONN_MAX_AGE": configured["CONN_MAX_AGE"],
+                "CONN_HEALTH_CHECKS": configured["CONN_HEALTH_CHECKS"],
+                "pool": bool(configured["OPTIONS"].get("pool")),
+            },
+            "strategies": {},
+        }
+        for name, overrides in strategies.items():
+            settings_dict = copy.deepcopy(configured)
+            options_dict = {**settings_dict["OPTIONS"], **overrides.pop("OPTIONS")}
+            if not options_dict["pool"]:
+                del options_dict["pool"]
+            settings_dict.update(overrides, OPTIONS=options_dict)
+            report["strategies"][name] = self.run_strategy(name, settings_dict, options["requests"])
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as report_file:
+                report_file.write(output + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Connection benchmark written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    # A connection of our own, so changing its settings does not touch the one the rest of Django uses
+    def build_connection(self, name, settings_dict):
+        return load_backend(settings_dict["ENGINE"]).DatabaseWrapper(settings_dict, alias=f"benchmark-{name}")
+
+    def run_strategy(self, name, settings_dict, requests):
+        connection = self.build_connection(name, settings_dict)
+        sql, params = Project.objects.order_by("id")[:PAGE_SIZE].query.get_compiler(connection=connection).as_sql()
+        connects = 0
+
+        # Django sends connection_created every time a connection is opened (or taken from the pool)
+        def count_connect(sender, **kwargs):
+            nonlocal connects
+            if kwargs["connection"] is connection:
+                connects += 1
+
+        latencies = []
+        connection_created.connect(count_connect)
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                connection.close_if_unusable_or_obsolete()
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                connection.close_if_unusable_or_obsolete()
+                latencies.append((time.perf_counter() - started) * 1000)
+        except DatabaseError as error:
+            raise CommandError(f"{name}: {error} (has the database been migrated?)")
+        finally:
+            connection_created.disconnect(count_connect)
+            connection.close()
+            if settings_dict["OPTIONS"].get("pool"):
+                connection.close_pool()
+        return summarize(latencies, connects)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from projects.images import Image, generate_variants
+from projects.models import Project
+
+# Run with: python manage.py generate_image_variants
+# Makes the resized copies (see projects/images.py) for project images uploaded before variants existed, or for every image with --all (e.g. after changing VARIANT_WIDTHS).
+# Variants that already exist for the same image content are reused rather than resized again.
+class Command(BaseCommand):
+    help = "Create the resized WebP variants of project images that do not have them yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Regenerate the variants of every project image")
+
+    def handle(self, *args, **options):
+        if Image is None:
+            self.stderr.write(self.style.WARNING("Pillow is not installed (pipenv install pillow), so only image hashes will be recorded."))
+        projects = Project.objects.exclude(image="")
+        if not options["all"]:
+            projects = projects.filter(image_variants={})
+        done = 0
+        # iterator() streams the projects instead of loading them all at once; only() skips the long descriptions
+        for project in projects.only("id", "image", "image_hash", "image_variants").iterator(chunk_size=200):
+            generate_variants(project)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} project images."))
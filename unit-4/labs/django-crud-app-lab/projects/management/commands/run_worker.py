@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from projects.tasks import run_pending
+
+# Run with: python manage.py run_worker
+# Works through the background tasks queued with projects.tasks.enqueue (see projects/tasks.py), then waits for more.
+# Start as many workers as you like; each task is only ever handed to one of them at a time.
+# Use --once to run whatever is due and exit, e.g. from cron or in a deploy script.
+class Command(BaseCommand):
+    help = "Run queued background tasks (image processing and other slow work)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run the tasks that are due, then exit")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to wait when the queue is empty (default: 2)")
+        parser.add_argument("--visibility-timeout", type=int, help="Seconds a claimed task stays hidden from other workers (default: TASK_VISIBILITY_TIMEOUT)")
+        parser.add_argument("--max-tasks", type=int, help="Exit after running this many tasks")
+
+    def handle(self, *args, **options):
+        if options["poll_interval"] <= 0:
+            raise CommandError("--poll-interval must be positive")
+        remaining = options["max_tasks"]
+        total = failed_total = 0
+        try:
+            while remaining is None or remaining > 0:
+                ran, failed = run_pending(limit=remaining, visibility_timeout=options["visibility_timeout"])
+                total += ran
+                failed_total += failed
+                if ran:
+                    self.stdout.write(f"  ran {ran} tasks ({failed} failed)")
+                if remaining is not None:
+                    remaining -= ran
+                if options["once"]:
+                    break
+                if not ran:
+                    # Like a request finishing: drop the database connection if it is broken or past CONN_MAX_AGE
+                    close_old_connections()
+                    time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Worker stopped after running {total} tasks ({failed_total} failed)."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from projects.search import search_enabled, update_search_vectors
+
+# Run with: python manage.py update_search_vectors
+# Rebuilds the full-text search vector of every project (see projects/search.py), e.g. after changing SEARCH_CONFIG or after writing projects with bulk_create or update().
+class Command(BaseCommand):
+    help = "Rebuild the full-text search vectors of all projects (Postgres only)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Projects updated per query (default: 1000)")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if not search_enabled():
+            self.stderr.write(self.style.WARNING("Full-text search needs Postgres; this database searches with icontains instead."))
+            return
+        updated = update_search_vectors(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Updated the search vectors of {updated} projects."))
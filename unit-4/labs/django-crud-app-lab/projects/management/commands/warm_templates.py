@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from myportfolio.template_cache import warm_templates
+
+# Run with: python manage.py warm_templates
+# Parses every template under projects/templates, pages/templates and templates/ (see myportfolio/template_cache.py) and reports how long each took.
+# Run it as a deploy step: it fails, and so stops the deploy, if any template has a syntax error or uses an unknown tag.
+# The parsed templates only live in this command's memory; each server process warms its own cache on start when WARM_TEMPLATES is on.
+class Command(BaseCommand):
+    help = "Parse every template of the site, reporting the time taken and any template errors"
+
+    def handle(self, *args, **options):
+        errors = []
+        timings = warm_templates(errors)
+        if options["verbosity"] > 1:
+            for name, ms in sorted(timings.items(), key=lambda item: -item[1]):
+                self.stdout.write(f"{ms:8.2f} ms  {name}")
+        for name, error in errors:
+            self.stderr.write(self.style.ERROR(f"{name}: {error}"))
+        if errors:
+            raise CommandError(f"{len(errors)} template(s) failed to load")
+        self.stdout.write(self.style.SUCCESS(f"Loaded {len(timings)} templates in {sum(timings.values()):.1f} ms."))
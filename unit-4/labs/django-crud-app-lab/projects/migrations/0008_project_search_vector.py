@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:09
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# The GIN index that makes full-text search fast (see projects/search.py), and the search vectors of the projects that already exist.
+# Postgres only: on other databases search_vector stays empty and searching falls back to icontains.
+CREATE_SEARCH_INDEX = "CREATE INDEX project_search_vector_idx ON projects_project USING gin (search_vector)"
+DROP_SEARCH_INDEX = "DROP INDEX IF EXISTS project_search_vector_idx"
+# The same vector as projects.search.search_vector(), written out in SQL because migrations must not depend on the current models
+FILL_SEARCH_VECTORS = """
+UPDATE projects_project SET search_vector =
+    setweight(to_tsvector('english', title), 'A')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(technology.name, ' ')
+        FROM projects_technology technology
+        JOIN projects_project_technologies link ON link.technology_id = technology.id
+        WHERE link.project_id = projects_project.id
+    ), '')), 'B')
+    || setweight(to_tsvector('english', description), 'C')
+"""
+
+def add_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_SEARCH_INDEX)
+        schema_editor.execute(FILL_SEARCH_VECTORS)
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_SEARCH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
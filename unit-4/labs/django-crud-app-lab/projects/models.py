@@ -1,4 +1,8 @@
-from django.db import models
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db import connections, models
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Q
+from django.db.models.functions import Left
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.models import User
 
@@ -8,6 +12,65 @@ class Technology(models.Model):
     def __str__(self):
         return self.name
 
+# NOTES ON QUERYSETS FOR PAGES:
+# Project.objects.for_listing(user) fetches exactly what the project list shows, in two queries however many projects there are:
+# - only() the columns the cards use. The description can be very long, so instead of loading it the database cuts it down to an `excerpt`.
+# - The technologies of all the projects at once (prefetch_related), rather than one query per card when the template reads project.technologies.all.
+# Project.objects.with_technologies() is the prefetch alone, for the detail page, which shows the whole description.
+# Only read the fields listed here in the list template: reading a deferred one (such as project.description) runs an extra query per project.
+EXCERPT_LENGTH = 200
+# The Postgres text search configuration: how text is split into words and which words count as the same ("projects" and "project")
+SEARCH_CONFIG = "english"
+
+class ProjectQuerySet(models.QuerySet):
+    def with_technologies(self):
+        # Only the columns the templates show for each technology
+        return self.prefetch_related(Prefetch("technologies", queryset=Technology.objects.only("id", "name").order_by("name")))
+
+    def for_listing(self, user):
+        return (
+            self.filter(user=user)
+            .only("id", "title", "image", "image_variants", "user_id")
+            # One character more than is shown, so the template's truncatechars can tell whether to add "…"
+            .annotate(excerpt=Left("description", EXCERPT_LENGTH + 1))
+            .with_technologies()
+        )
+
+    # Projects using every one (match="all") or at least one (match="any") of the given technologies
+    def with_technology_ids(self, technology_ids, match="all"):
+        technology_ids = set(technology_ids)
+        if not technology_ids:
+            return self
+        links = self.model.technologies.through.objects.filter(technology_id__in=technology_ids)
+        if match == "any":
+            return self.filter(Exists(links.filter(project_id=OuterRef("pk"))))
+        # One GROUP BY over the link table, keeping the projects linked to all of them, rather than a join per technology
+        matching = links.values("project_id").annotate(found=Count("technology_id")).filter(found=len(technology_ids)).values("project_id")
+        return self.filter(pk__in=matching)
+
+    # How many of these projects use each technology, as {"technology_id", "technology__name", "count"} rows, most used first.
+    # One grouped query over the link table, however many technologies there are.
+    def technology_counts(self):
+        links = self.model.technologies.through.objects.filter(project_id__in=self.order_by().values("pk"))
+        return (
+            links.values("technology_id", "technology__name")
+            .annotate(count=Count("project_id"))
+            .order_by("-count", "technology__name")
+        )
+
+    # Projects matching the search text, best matches first (see projects/search.py)
+    def search(self, text):
+        if connections[self.db].vendor == "postgresql":
+            # websearch understands what people type into search boxes: "quoted phrases", or, -excluded words
+            query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+            return self.filter(search_vector=query).annotate(rank=SearchRank(F("search_vector"), query)).order_by("-rank", "-id")
+        # Other databases: every word has to appear in the title, the description or one of the technology names
+        matches = self
+        for word in text.split():
+            technology_matches = Technology.objects.filter(projects=OuterRef("pk"), name__icontains=word)
+            matches = matches.filter(Q(title__icontains=word) | Q(description__icontains=word) | Exists(technology_matches))
+        return matches.order_by("-id")
+
 class Project(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField()
@@ -16,10 +79,20 @@ class Project(models.Model):
     # You also set blank to True. That way, it’s okay if a project doesn’t contain a picture.
     # You could be even more explicit and use an ImageField for your images. If you do so, then you need to install pillow into your development environment first.
     image = models.FileField(upload_to="project_images/", blank=True)
+    # SHA-256 of the image's content and the smaller WebP copies made from it when it was uploaded, e.g. {"thumb": "project_images/variants/ab/ab12...-300w.webp"}.
+    # Filled in by projects/images.py, never by the form. Templates pick a variant with {% image_variant project "thumb" %}.
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     # Django constructs the path to your upload folder using the MEDIA_ROOT setting and the upload_to value. To collect all the images in an uploads/ folder and serve them with a media/ URL, add two lines to settings.py.
     # Every project is associated with a user. If the user is deleted, all their projects will be deleted as well. Every project record must hold the PK of a user.
     # Since we already have projects when we create and make migrations we will need to provide a default user id for existing records.
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # The words of the title, technologies and description, ready for full-text search on Postgres (kept up to date by projects/search.py, empty on other databases)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # When the project was last changed, which the project list's ETag is made from (see projects/conditional.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProjectQuerySet.as_manager()
 
     def __str__(self):
         return self.title
@@ -30,4 +103,38 @@ class Project(models.Model):
         return reverse("project_detail", kwargs={"pk": self.pk})
 
     # With related_name set to "projects", you can access all projects associated with a technology instance using technology.projects.all().
-    technologies = models.ManyToManyField(Technology, related_name="projects")
\ No newline at end of file
+    technologies = models.ManyToManyField(Technology, related_name="projects")
+# NOTES ON THE TASK QUEUE:
+# A row per piece of background work (such as resizing an uploaded image), so requests can hand slow work to `python manage.py run_worker` instead of doing it themselves.
+# The database is the queue, so no extra services (Redis, RabbitMQ...) are needed. See projects/tasks.py for how tasks are queued, claimed and retried.
+class Task(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUSES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (FAILED, "Failed"),
+    ]
+
+    # The registered name of the function to run, e.g. "projects.tasks.process_project_image", and the arguments to call it with
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    # Not to be run before this time; pushed back after each failed attempt
+    run_after = models.DateTimeField(default=timezone.now)
+    # While a worker runs the task nobody else may take it until this time (the visibility timeout); if the worker dies, another one picks the task up after it.
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Workers look for the oldest task that is due in a given status
+            models.Index(fields=["status", "run_after"], name="task_status_run_after_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name}{tuple(self.args)} ({self.status})"
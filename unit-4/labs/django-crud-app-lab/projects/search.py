@@ -0,0 +1,44 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connections, router
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+from projects.models import SEARCH_CONFIG, Project, Technology
+
+# NOTES ON SEARCH:
+# On Postgres each project's title, technology names and description are stored, already split into words, in Project.search_vector,
+# and a GIN index on that column (see migration 0008) finds the projects containing the searched words without reading every row.
+# Project.objects.search(text) (see models.py) queries that index and ranks the matches: a word in the title counts most, then technologies, then the description.
+# The stored vector has to be rebuilt whenever something it is made from changes. The signal handlers in signals.py do that for saves made through the ORM;
+# bulk_create and queryset.update() send no signals, so code using them calls update_search_vectors() itself (see seeding.py),
+# and `python manage.py update_search_vectors` rebuilds every project's vector.
+# Other databases (SQLite in the tests) have no search_vector to maintain: search falls back to icontains there.
+
+def search_enabled():
+    return connections[router.db_for_write(Project)].vendor == "postgresql"
+
+def search_vector():
+    # All of a project's technology names in one string, worked out inside the UPDATE
+    technology_names = (
+        Technology.objects.filter(projects=OuterRef("pk"))
+        .values("projects")
+        .annotate(names=StringAgg("name", " "))
+        .values("names")
+    )
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(Coalesce(Subquery(technology_names), Value(""), output_field=TextField()), weight="B", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+    )
+
+# Rebuild the search vectors of the given projects (or of every project), one UPDATE per batch
+def update_search_vectors(project_ids=None, batch_size=1000):
+    if not search_enabled():
+        return 0
+    if project_ids is None:
+        project_ids = Project.objects.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=batch_size)
+    project_ids = iter(project_ids)
+    updated = 0
+    while batch := [project_id for _, project_id in zip(range(batch_size), project_ids)]:
+        updated += Project.objects.filter(pk__in=batch).update(search_vector=search_vector())
+    return updated
@@ -0,0 +1,89 @@
+import itertools
+import random
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from projects.models import Project, Technology
+from projects.search import update_search_vectors
+
+# Deterministic fake data for benchmarks, load tests and `python manage.py seed`.
+# Everything is drawn from a random.Random seeded with `seed`, so the same arguments always produce the same rows,
+# and everything is written with bulk_create in batches instead of one INSERT per row.
+# Projects are generated and written one batch at a time (with their project-technology rows), so memory use stays flat even for millions of rows.
+
+TECHNOLOGY_NAMES = ["Python", "Django", "JavaScript", "React", "HTML", "CSS", "PostgreSQL", "Docker", "Node", "Express"]
+WORDS = ["portfolio", "app", "api", "dashboard", "tracker", "game", "clone", "blog", "store", "planner", "chat", "quiz"]
+
+# Password shared by every seeded user, so benchmark clients can also log in for real
+SEED_PASSWORD = "seeded-password"
+
+# Split `total` items between `buckets` owners following a Zipf-like curve: owner n gets a share proportional to 1 / (n + 1) ** skew.
+# skew=0 shares everything evenly; skew=1 is the classic Zipf curve (the first owner gets twice as many as the second and three times as many as the third); skew=2 or more hands nearly everything to the first few.
+# Leftovers from rounding go to the owners with the largest remainders, so the counts always add up to `total`.
+def skewed_counts(total, buckets, skew=0.0):
+    if buckets <= 0:
+        return []
+    weights = [1 / (rank + 1) ** skew for rank in range(buckets)]
+    scale = total / sum(weights)
+    shares = [weight * scale for weight in weights]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(range(buckets), key=lambda rank: (counts[rank] - shares[rank], rank))
+    for rank in by_remainder[:total - sum(counts)]:
+        counts[rank] += 1
+    return counts
+
+# Yield lists of up to `size` items from any iterable
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+def seed_projects(users=10, projects_per_user=20, technologies=10, technologies_per_project=3, skew=0.0,
+                  seed=0, batch_size=1000, username_prefix="seed-user", progress=None):
+    rng = random.Random(seed)
+    # Hashing a password is deliberately slow, so hash it once and share the result
+    password = make_password(SEED_PASSWORD)
+    user_ids = []
+    for numbers in batched(range(users), batch_size):
+        created = User.objects.bulk_create([User(username=f"{username_prefix}-{n}", password=password) for n in numbers])
+        user_ids.extend(user.id for user in created)
+    # Technology.name is max 20 characters, so number the names past the built in list
+    technology_ids = [
+        technology.id
+        for technology in Technology.objects.bulk_create(
+            [Technology(name=TECHNOLOGY_NAMES[n] if n < len(TECHNOLOGY_NAMES) else f"Tech {n}") for n in range(technologies)],
+            batch_size=batch_size,
+        )
+    ]
+    ProjectTechnology = Project.technologies.through
+
+    # users * projects_per_user projects in total, shared out between the users according to `skew`
+    project_counts = skewed_counts(users * projects_per_user, len(user_ids), skew)
+    owners = itertools.chain.from_iterable(itertools.repeat(user_id, count) for user_id, count in zip(user_ids, project_counts))
+    totals = {"users": len(user_ids), "projects": 0, "technologies": len(technology_ids), "project_technologies": 0}
+    for batch in batched(owners, batch_size):
+        projects = [
+            Project(
+                title=" ".join(rng.choices(WORDS, k=rng.randint(1, 4))).title(),
+                # Vary the description length from one sentence to a few paragraphs, like real projects
+                description=" ".join(rng.choices(WORDS, k=rng.randint(5, 400))),
+                user_id=user_id,
+            )
+            for user_id in batch
+        ]
+        Project.objects.bulk_create(projects)
+
+        # Write the many-to-many rows straight into the through table instead of calling project.technologies.add() once per project
+        project_technologies = [
+            ProjectTechnology(project_id=project.id, technology_id=technology_id)
+            for project in projects
+            for technology_id in rng.sample(technology_ids, min(technologies_per_project, len(technology_ids)))
+        ]
+        ProjectTechnology.objects.bulk_create(project_technologies, batch_size=batch_size)
+        # bulk_create sends no signals, so build the batch's search vectors here (does nothing outside Postgres)
+        update_search_vectors([project.id for project in projects], batch_size=batch_size)
+
+        totals["projects"] += len(projects)
+        totals["project_technologies"] += len(project_technologies)
+        if progress:
+            progress(totals)
+    return totals
@@ -0,0 +1,54 @@
+from django.db.models.functions import Now
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from projects.models import Project, Technology
+from projects.search import update_search_vectors
+
+# Signal receivers that keep what is stored on each project in step with the data it is made from.
+# They are connected when the app loads, in ProjectsConfig.ready().
+# A project's technology names show up in two things that the technologies table cannot update by itself:
+# - its search vector (see search.py)
+# - its updated_at, which the project list's ETag is made from (see conditional.py), since the cards show the names
+# So whenever technologies are added to or removed from a project, renamed or deleted, projects_changed() refreshes both for the projects involved.
+
+def projects_changed(project_ids):
+    project_ids = list(project_ids)
+    if project_ids:
+        # update() skips auto_now, so set updated_at here
+        Project.objects.filter(pk__in=project_ids).update(updated_at=Now())
+        update_search_vectors(project_ids)
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, raw=False, **kwargs):
+    # raw is True while loaddata loads fixtures. updated_at is already set by auto_now.
+    if not raw:
+        update_search_vectors([instance.pk])
+
+@receiver(post_save, sender=Technology)
+def technology_saved(sender, instance, created, raw=False, **kwargs):
+    # A new technology belongs to no projects yet; a renamed one changes all of its projects
+    if not created and not raw:
+        projects_changed(instance.projects.values_list("pk", flat=True))
+
+@receiver(m2m_changed, sender=Project.technologies.through)
+def technologies_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # project.technologies.add(...) / remove(...) / clear() / set(...)
+        if action in ("post_add", "post_remove", "post_clear"):
+            projects_changed([instance.pk])
+    elif action == "pre_clear":
+        # technology.projects.clear(): remember the projects before the links are gone
+        instance._changed_project_ids = list(instance.projects.values_list("pk", flat=True))
+    elif action == "post_clear":
+        projects_changed(getattr(instance, "_changed_project_ids", []))
+    elif action in ("post_add", "post_remove"):
+        projects_changed(pk_set)
+
+@receiver(pre_delete, sender=Technology)
+def technology_deleting(sender, instance, **kwargs):
+    # Deleting a technology removes its project links without an m2m_changed signal
+    instance._changed_project_ids = list(instance.projects.values_list("pk", flat=True))
+
+@receiver(post_delete, sender=Technology)
+def technology_deleted(sender, instance, **kwargs):
+    projects_changed(getattr(instance, "_changed_project_ids", []))
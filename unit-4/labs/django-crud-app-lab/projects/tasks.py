@@ -0,0 +1,108 @@
+import logging
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from projects.images import generate_variants
+from projects.models import Project, Task
+
+# NOTES ON THE TASK QUEUE:
+# enqueue("projects.tasks.process_project_image", project.pk) adds a Task row; `python manage.py run_worker` takes due tasks one at a time and runs them.
+# - The row is written in the caller's transaction, so a task is only ever seen by a worker together with the data it is about (and disappears with it if the request fails).
+# - A worker claims a task with a single conditional UPDATE, so two workers can never both get it, on any database.
+# - A claimed task is hidden for TASK_VISIBILITY_TIMEOUT seconds. If the worker crashes, the task becomes visible again and another worker retries it.
+# - A task that raises is retried later, waiting 2, 4, 8... seconds, until max_attempts; then it is kept as "failed" with its error for a person to look at.
+# - Tasks that succeed are deleted, so the table only holds outstanding and failed work.
+# Task functions must be safe to run twice, because a task whose worker died after finishing it (but before deleting it) runs again.
+# With TASK_QUEUE_EAGER = True (handy with runserver when no worker is running) tasks run in the request instead, right after its transaction commits.
+
+logger = logging.getLogger(__name__)
+
+# Registered task functions by name
+registry = {}
+
+def task(function):
+    registry[f"{function.__module__}.{function.__name__}"] = function
+    return function
+
+def enqueue(name, *args, max_attempts=5, delay=0):
+    if name not in registry:
+        raise ValueError(f"Unknown task: {name}")
+    if settings.TASK_QUEUE_EAGER:
+        transaction.on_commit(lambda: registry[name](*args))
+        return None
+    return Task.objects.create(
+        name=name,
+        args=list(args),
+        max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+def _due(now):
+    # Queued tasks whose time has come, and running tasks whose worker has not finished within the visibility timeout
+    return Q(status=Task.QUEUED, run_after__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+
+# Claim the next due task for this worker, or return None when there is nothing to do
+def claim_next(visibility_timeout=None):
+    visibility_timeout = visibility_timeout or settings.TASK_VISIBILITY_TIMEOUT
+    # Another worker may claim the same candidate first; then the UPDATE below matches nothing and we try the next one
+    for _ in range(5):
+        now = timezone.now()
+        candidate = Task.objects.filter(_due(now)).order_by("run_after", "id").values_list("id", flat=True).first()
+        if candidate is None:
+            return None
+        claimed = Task.objects.filter(_due(now), id=candidate).update(
+            status=Task.RUNNING,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Task.objects.get(id=candidate)
+    return None
+
+def run_task(job):
+    function = registry.get(job.name)
+    # Only touch the row while we still hold it: if our visibility timeout ran out, another worker may have taken the task over
+    ours = Task.objects.filter(id=job.id, locked_until=job.locked_until)
+    try:
+        if function is None:
+            raise LookupError(f"Unknown task: {job.name}")
+        function(*job.args)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Task %s failed (attempt %s of %s)", job, job.attempts, job.max_attempts)
+        if job.attempts >= job.max_attempts:
+            ours.update(status=Task.FAILED, locked_until=None, last_error=error)
+        else:
+            ours.update(
+                status=Task.QUEUED,
+                locked_until=None,
+                run_after=timezone.now() + timedelta(seconds=2 ** job.attempts),
+                last_error=error,
+            )
+        return False
+    ours.delete()
+    return True
+
+# Run due tasks until none are left (or `limit` have run). Returns how many ran and how many of those failed.
+def run_pending(limit=None, visibility_timeout=None):
+    ran = failed = 0
+    while limit is None or ran < limit:
+        job = claim_next(visibility_timeout)
+        if job is None:
+            break
+        ran += 1
+        if not run_task(job):
+            failed += 1
+    return ran, failed
+
+# The tasks
+
+@task
+def process_project_image(project_id):
+    project = Project.objects.filter(pk=project_id).first()
+    # The project may have been deleted since the task was queued; then there is nothing to do
+    if project is not None:
+        generate_variants(project)
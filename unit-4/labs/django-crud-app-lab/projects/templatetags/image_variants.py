@@ -0,0 +1,13 @@
+from django import template
+from django.core.files.storage import default_storage
+
+register = template.Library()
+
+# Usage: {% load image_variants %} then <img src="{% image_variant project "thumb" %}">
+# Gives the URL of the project's resized copy of its image (see projects/images.py), or the original image's URL if that variant was never made.
+@register.simple_tag
+def image_variant(project, variant):
+    name = (project.image_variants or {}).get(variant)
+    if name:
+        return default_storage.url(name)
+    return project.image.url if project.image else ""
@@ -1,3 +1,786 @@
-from django.test import TestCase
+import gzip
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models.sql import UpdateQuery
+from django.db.utils import load_backend
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import include, path, re_path, reverse
+from django.utils import timezone
+from myportfolio.db_routers import ReadReplicaRouter
+from myportfolio.media import IMMUTABLE_CACHE_CONTROL, serve_media
+from myportfolio.middleware import CompressionMiddleware
+from myportfolio.storage import CHUNK_SIZE, ContentAddressedStorage
+from myportfolio.template_cache import django_engines, template_names
+from projects import views
+from projects.images import Image
+from projects.management.commands.benchmark_connections import Command as BenchmarkConnectionsCommand
+from projects.models import Project, Task, Technology
+from projects.search import search_vector, update_search_vectors
+from projects.seeding import SEED_PASSWORD, skewed_counts
+from projects.tasks import claim_next, enqueue, run_pending, run_task, task
 
 # Create your tests here.
+
+# Run a settings file again as a new module, with the given environment variables set
+def load_settings(name, **environ):
+    spec = importlib.util.find_spec(name)
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(os.environ, environ):
+        spec.loader.exec_module(module)
+    return module
+
+production_settings = load_settings("myportfolio.production_settings", DJANGO_SECRET_KEY="not-the-real-key")
+
+class SeedCommandTests(TestCase):
+    def seed(self, *args):
+        out = StringIO()
+        call_command("seed", "--technologies", "12", "--batch-size", "7", *args, stdout=out)
+        return out.getvalue()
+
+    def test_skewed_counts_add_up(self):
+        self.assertEqual(skewed_counts(10, 5), [2, 2, 2, 2, 2])
+        counts = skewed_counts(1000, 10, skew=1.5)
+        self.assertEqual(sum(counts), 1000)
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+    def test_seed_writes_skewed_projects_with_technologies(self):
+        out = self.seed("--users", "4", "--projects-per-user", "5", "--skew", "2")
+        self.assertIn("Seeded 4 users, 20 projects, 12 technologies and 60 project-technology links", out)
+        projects_per_user = [Project.objects.filter(user__username=f"seed-user-{n}").count() for n in range(4)]
+        self.assertEqual(sum(projects_per_user), 20)
+        self.assertGreater(projects_per_user[0], projects_per_user[3])
+        self.assertTrue(all(project.technologies.count() == 3 for project in Project.objects.all()))
+        self.assertTrue(self.client.login(username="seed-user-0", password=SEED_PASSWORD))
+
+    def test_same_seed_gives_the_same_data(self):
+        self.seed("--users", "2", "--projects-per-user", "3", "--username-prefix", "first")
+        self.seed("--users", "2", "--projects-per-user", "3", "--username-prefix", "second")
+        first = list(Project.objects.filter(user__username__startswith="first-").order_by("id").values_list("title", "description"))
+        second = list(Project.objects.filter(user__username__startswith="second-").order_by("id").values_list("title", "description"))
+        self.assertEqual(first, second)
+
+    def test_existing_prefix_is_refused(self):
+        self.seed("--users", "1", "--projects-per-user", "1")
+        with self.assertRaises(CommandError):
+            self.seed("--users", "1", "--projects-per-user", "1")
+
+class ProjectQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="tester", password="not-a-real-password")
+        cls.technologies = [Technology.objects.create(name=name) for name in ["Python", "Django", "CSS"]]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def add_projects(self, count):
+        for number in range(count):
+            project = Project.objects.create(title=f"Project {number}", description="Long text. " * 100, user=self.user)
+            project.technologies.set(self.technologies)
+
+    def test_list_queries_do_not_grow_with_the_projects(self):
+        self.add_projects(2)
+        # The session, the logged in user, the projects, all their technologies and the technology counts
+        with self.assertNumQueries(5):
+            self.client.get(reverse("project_list"))
+        self.add_projects(8)
+        # Once the first visit has set the CSRF cookie, also the ETag query (see projects/conditional.py)
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse("project_list"))
+        self.assertContains(response, '<span class="badge bg-primary">CSS</span>', count=10)
+
+    def test_list_loads_only_a_description_excerpt(self):
+        self.add_projects(1)
+        project = Project.objects.for_listing(self.user).get()
+        self.assertEqual(project.get_deferred_fields(), {"description", "image_hash", "search_vector", "updated_at"})
+        self.assertEqual(len(project.excerpt), 201)
+        self.assertEqual([tech.name for tech in project.technologies.all()], ["CSS", "Django", "Python"])
+        response = self.client.get(reverse("project_list"))
+        self.assertContains(response, project.excerpt[:199] + "…")
+        self.assertNotContains(response, "Long text. " * 100)
+
+    def test_detail_prefetches_technologies(self):
+        self.add_projects(1)
+        project = Project.objects.get()
+        # The session, the logged in user, the project and its technologies
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("project_detail", kwargs={"pk": project.pk}))
+        self.assertContains(response, "Long text. " * 100)
+
+class TechnologyFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="tester", password="not-a-real-password")
+        other_user = User.objects.create_user(username="other", password="not-a-real-password")
+        cls.python, cls.django, cls.css = [Technology.objects.create(name=name) for name in ["Python", "Django", "CSS"]]
+        cls.backend = Project.objects.create(title="Backend", description="Server.", user=cls.user)
+        cls.backend.technologies.set([cls.python, cls.django])
+        cls.script = Project.objects.create(title="Script", description="Tool.", user=cls.user)
+        cls.script.technologies.set([cls.python])
+        cls.site = Project.objects.create(title="Site", description="Pages.", user=cls.user)
+        cls.site.technologies.set([cls.css])
+        # Someone else's projects are never listed or counted
+        Project.objects.create(title="Theirs", description="Not mine.", user=other_user).technologies.set([cls.python, cls.css])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def listed(self, query):
+        response = self.client.get(reverse("project_list") + query)
+        return response, {project.title for project in response.context["object_list"]}
+
+    def counts(self, response):
+        return {facet["name"]: facet["count"] for facet in response.context["facets"]}
+
+    def test_unfiltered_list_counts_every_technology(self):
+        response, titles = self.listed("")
+        self.assertEqual(titles, {"Backend", "Script", "Site"})
+        self.assertEqual(self.counts(response), {"Python": 2, "Django": 1, "CSS": 1})
+        self.assertEqual([facet["name"] for facet in response.context["facets"]], ["Python", "CSS", "Django"])
+
+    def test_match_all_and_any(self):
+        query = f"?tech={self.python.pk}&tech={self.django.pk}"
+        response, titles = self.listed(query)
+        self.assertEqual(titles, {"Backend"})
+        self.assertEqual(self.counts(response), {"Python": 1, "Django": 1})
+        response, titles = self.listed(f"?tech={self.django.pk}&tech={self.css.pk}&match=any")
+        self.assertEqual(titles, {"Backend", "Site"})
+        self.assertEqual(self.counts(response), {"Python": 1, "Django": 1, "CSS": 1})
+
+    def test_facet_links_toggle_technologies(self):
+        response, titles = self.listed(f"?tech={self.python.pk}&tech=oops")
+        self.assertEqual(titles, {"Backend", "Script"})
+        links = {facet["name"]: facet["url"] for facet in response.context["facets"]}
+        self.assertEqual(links["Python"], "?")
+        self.assertEqual(links["Django"], f"?tech={min(self.python.pk, self.django.pk)}&tech={max(self.python.pk, self.django.pk)}")
+        self.assertContains(response, "Clear filters")
+
+    def test_counts_take_one_query_however_many_technologies(self):
+        for number in range(10):
+            self.backend.technologies.add(Technology.objects.create(name=f"Tech {number}"))
+        # The session, the logged in user, the projects, their technologies and the technology counts
+        with self.assertNumQueries(5):
+            response, titles = self.listed(f"?tech={self.python.pk}")
+        self.assertEqual(len(response.context["facets"]), 12)
+
+class ProjectSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="tester", password="not-a-real-password")
+        other_user = User.objects.create_user(username="other", password="not-a-real-password")
+        django = Technology.objects.create(name="Django")
+        cls.api = Project.objects.create(title="Cat API", description="A REST service for cats.", user=cls.user)
+        cls.api.technologies.add(django)
+        cls.game = Project.objects.create(title="Space Game", description="Shoot the asteroids.", user=cls.user)
+        Project.objects.create(title="Their API", description="Not mine.", user=other_user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def search(self, query, **params):
+        return self.client.get(reverse("project_search"), {"q": query, **params})
+
+    def test_matches_title_description_and_technologies(self):
+        for query, expected in [("api", [self.api]), ("asteroids", [self.game]), ("django", [self.api]), ("cat rest", [self.api]), ("cat game", [])]:
+            with self.subTest(query):
+                self.assertEqual(list(self.search(query).context["object_list"]), expected)
+
+    def test_results_are_paginated(self):
+        Project.objects.bulk_create(Project(title=f"API {number}", description="More.", user=self.user) for number in range(24))
+        first_page = self.search("api")
+        self.assertEqual(len(first_page.context["object_list"]), 20)
+        self.assertContains(first_page, "25 projects found")
+        self.assertContains(first_page, "page=2")
+        self.assertEqual(len(self.search("api", page=2).context["object_list"]), 5)
+
+    def test_empty_search_finds_nothing(self):
+        response = self.search("  ")
+        self.assertEqual(list(response.context["object_list"]), [])
+        self.assertNotContains(response, "found for")
+
+    def test_vectors_are_only_kept_on_postgres(self):
+        self.assertEqual(update_search_vectors(), 0)
+        self.assertIsNone(Project.objects.values_list("search_vector", flat=True).first())
+
+    def test_postgres_queries_use_the_search_vector(self):
+        postgres = load_backend("django.db.backends.postgresql").DatabaseWrapper(
+            {**connection.settings_dict, "ENGINE": "django.db.backends.postgresql", "NAME": "portfolio"}, alias="postgres",
+        )
+        with mock.patch("projects.models.connections", {"default": postgres}):
+            sql, params = Project.objects.for_listing(self.user).search("cat api").query.get_compiler(connection=postgres).as_sql()
+        self.assertIn('"projects_project"."search_vector" @@ (websearch_to_tsquery(', sql)
+        self.assertIn("ts_rank(", sql)
+        update = Project.objects.filter(pk=self.api.pk).query.chain(UpdateQuery)
+        update.add_update_values({"search_vector": search_vector()})
+        sql, params = update.get_compiler(connection=postgres).as_sql()
+        self.assertIn("STRING_AGG", sql)
+        self.assertEqual([param for param in params if param in ("A", "B", "C")], ["A", "B", "C"])
+
+# The site's URLs with the async project views swapped in, as projects/urls.py does when ASYNC_READ_VIEWS is on
+class AsyncReadUrls:
+    urlpatterns = [
+        path("projects/", views.project_list_async, name="project_list"),
+        path("projects/<int:pk>/", views.project_detail_async, name="project_detail"),
+        path("", include("myportfolio.urls")),
+    ]
+
+@override_settings(ROOT_URLCONF=AsyncReadUrls)
+class AsyncReadViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="tester", password="not-a-real-password")
+        other_user = User.objects.create_user(username="other", password="not-a-real-password")
+        cls.project = Project.objects.create(title="Cat Collector", description="Collect cats.", user=cls.user)
+        cls.project.technologies.add(Technology.objects.create(name="Django"), Technology.objects.create(name="Python"))
+        Project.objects.create(title="Not mine", description="Someone else's.", user=other_user)
+
+    def setUp(self):
+        self.async_client.force_login(self.user)
+
+    # Run the async client's request from this (sync) test so assertNumQueries sees its queries:
+    # the async ORM sends them back to this thread, on the test's own connection.
+    def get(self, url):
+        return async_to_sync(self.async_client.get)(url)
+
+    def test_list_shows_only_the_users_projects(self):
+        # The session, the logged in user, the projects, their technologies and the technology counts
+        with self.assertNumQueries(5):
+            response = self.get(reverse("project_list"))
+        self.assertContains(response, "Cat Collector")
+        self.assertNotContains(response, "Not mine")
+        self.assertContains(response, "Log out")
+
+    def test_detail_prefetches_technologies(self):
+        # The session, the logged in user, the project and its technologies
+        with self.assertNumQueries(4):
+            response = self.get(reverse("project_detail", kwargs={"pk": self.project.pk}))
+        self.assertContains(response, "Django")
+        self.assertContains(response, "Python")
+
+    def test_missing_project_is_a_404(self):
+        self.assertEqual(self.get(reverse("project_detail", kwargs={"pk": 999999})).status_code, 404)
+
+class BenchmarkConnectionsCommandTests(TestCase):
+    # The test database lives in memory and Django never really closes those connections, so benchmark against a throwaway file instead
+    def test_only_new_connection_reconnects_every_request(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_dict = {**connection.settings_dict, "NAME": os.path.join(directory, "benchmark.sqlite3")}
+        command = BenchmarkConnectionsCommand()
+        setup = command.build_connection("setup", settings_dict)
+        setup.cursor().execute(*setup.SchemaEditorClass(setup).table_sql(Project))
+        setup.close()
+        new_connection = command.run_strategy("new-connection", {**settings_dict, "CONN_MAX_AGE": 0}, 5)
+        persistent = command.run_strategy("persistent", {**settings_dict, "CONN_MAX_AGE": None}, 5)
+        self.assertEqual(new_connection["connects"], 5)
+        self.assertEqual(persistent["connects"], 1)
+        self.assertEqual(persistent["requests"], 5)
+
+    def test_async_servers_never_keep_connections(self):
+        environ = {"DB_POOL": "", "DB_CONN_MAX_AGE": "60", "DJANGO_ASGI": "", "ASYNC_READ_VIEWS": ""}
+        self.assertEqual(load_settings("myportfolio.settings", **environ).DATABASES["default"]["CONN_MAX_AGE"], 60)
+        for variable in ["DJANGO_ASGI", "ASYNC_READ_VIEWS"]:
+            with self.subTest(variable):
+                settings_module = load_settings("myportfolio.settings", **{**environ, variable: "1"})
+                self.assertEqual(settings_module.DATABASES["default"]["CONN_MAX_AGE"], 0)
+
+# Pretend 'default' is also the read replica, so the routing decisions can be seen without a second database:
+# the router returns the replica alias ("default") for reads it sends to the replica and None for everything else.
+@override_settings(REPLICA_DATABASE_ALIAS="default")
+class ReadReplicaRoutingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="tester", password="not-a-real-password")
+        cls.technology = Technology.objects.create(name="Django")
+        cls.project = Project.objects.create(title="Cat Collector", description="Collect cats.", user=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    # Make the request and return {model label: set of databases the router chose for its reads}
+    def routed_reads(self, url):
+        decisions = {}
+        db_for_read = ReadReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            database = db_for_read(router, model, **hints)
+            decisions.setdefault(model._meta.label, set()).add(database)
+            return database
+
+        with mock.patch.object(ReadReplicaRouter, "db_for_read", autospec=True, side_effect=record):
+            self.client.get(url)
+        return decisions
+
+    def test_read_views_use_the_replica_for_app_tables_only(self):
+        decisions = self.routed_reads(reverse("project_detail", kwargs={"pk": self.project.pk}))
+        self.assertEqual(decisions["projects.Project"], {"default"})
+        self.assertEqual(decisions["auth.User"], {None})
+        self.assertEqual(decisions["sessions.Session"], {None})
+
+    def test_other_views_use_the_primary(self):
+        decisions = self.routed_reads(reverse("project_update", kwargs={"pk": self.project.pk}))
+        self.assertEqual(decisions["projects.Project"], {None})
+
+    def test_reads_stick_to_the_primary_after_a_change(self):
+        self.client.post(
+            reverse("project_update", kwargs={"pk": self.project.pk}),
+            {"title": "Cat Collector 2", "description": "Collect more cats.", "technologies": [self.technology.pk]},
+        )
+        self.assertEqual(self.routed_reads(reverse("project_list"))["projects.Project"], {None})
+        # Once REPLICA_STICKY_SECONDS have passed, reads go back to the replica
+        with mock.patch("myportfolio.db_routers.time.time", return_value=time.time() + 60):
+            self.assertEqual(self.routed_reads(reverse("project_list"))["projects.Project"], {"default"})
+
+    def test_writes_always_go_to_the_primary(self):
+        self.assertEqual(ReadReplicaRouter().db_for_write(Project, instance=self.project), "default")
+        self.assertIsNone(ReadReplicaRouter().db_for_write(User))
+
+class MediaUrls:
+    urlpatterns = [re_path(r"^media/(?P<path>.*)$", serve_media)]
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def test_same_content_is_stored_once(self):
+        # Bigger than one chunk, to check the hash covers all of it
+        content = os.urandom(CHUNK_SIZE * 2 + 10)
+        first = self.storage.save("project_images/First.PNG", ContentFile(content))
+        self.assertRegex(first, r"^project_images/[0-9a-f]{64}\.png$")
+        self.assertEqual(self.storage.save("project_images/again.png", ContentFile(content)), first)
+        elsewhere = self.storage.save("archive/copy.png", ContentFile(content))
+        self.assertNotEqual(elsewhere, first)
+        self.assertTrue(os.path.samefile(self.storage.path(first), self.storage.path(elsewhere)))
+        self.assertEqual(self.storage.references(first), 2)
+        with self.storage.open(elsewhere) as stored:
+            self.assertEqual(stored.read(), content)
+        # No temporary files are left behind
+        self.assertEqual(os.listdir(os.path.join(self.location, ".blobs")), [first.split("/")[-1][:2]])
+
+    def test_blob_is_removed_with_its_last_name(self):
+        first = self.storage.save("a/one.txt", ContentFile(b"shared"))
+        second = self.storage.save("b/two.txt", ContentFile(b"shared"))
+        blob = self.storage.blob_path(self.storage.digest(first))
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertEqual(self.storage.references(second), 1)
+        self.storage.delete(second)
+        self.assertFalse(os.path.exists(blob))
+        # The same content can be stored again afterwards
+        self.assertEqual(self.storage.save("a/one.txt", ContentFile(b"shared")), first)
+
+    def test_only_content_names_are_cached_forever(self):
+        name = self.storage.save("project_images/logo.png", ContentFile(b"logo"))
+        self.assertTrue(self.storage.is_immutable(name))
+        self.assertFalse(self.storage.is_immutable("project_images/project1.png"))
+        with open(self.storage.path("project_images/project1.png"), "wb") as legacy:
+            legacy.write(b"old upload")
+        with override_settings(MEDIA_ROOT=self.location, ROOT_URLCONF=MediaUrls, MEDIA_SENDFILE=""), mock.patch("myportfolio.media.default_storage", self.storage):
+            response = self.client.get(f"/media/{name}")
+            self.assertEqual(response["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+            self.assertEqual(response["ETag"], f'"{self.storage.digest(name)}"')
+            self.assertEqual(b"".join(response.streaming_content), b"logo")
+            self.assertEqual(self.client.get("/media/project_images/project1.png")["Cache-Control"], "no-cache")
+
+@override_settings(ROOT_URLCONF=MediaUrls, MEDIA_SENDFILE="")
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        settings_override = override_settings(MEDIA_ROOT=self.location)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        os.makedirs(os.path.join(self.location, "project_images"))
+        with open(os.path.join(self.location, "project_images", "notes.txt"), "wb") as notes:
+            notes.write(b"0123456789")
+        self.url = "/media/project_images/notes.txt"
+
+    def test_whole_file_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertTrue(response["ETag"])
+        self.assertTrue(response["Last-Modified"])
+
+    def test_unchanged_files_are_not_sent_again(self):
+        first = self.client.get(self.url)
+        response = self.client.get(self.url, headers={"If-None-Match": first["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], first["ETag"])
+        self.assertEqual(response.content, b"")
+        response = self.client.get(self.url, headers={"If-Modified-Since": first["Last-Modified"]})
+        self.assertEqual(response.status_code, 304)
+        # A file that changed is sent again
+        with open(os.path.join(self.location, "project_images", "notes.txt"), "ab") as notes:
+            notes.write(b"!")
+        self.assertEqual(self.client.get(self.url, headers={"If-None-Match": first["ETag"]}).status_code, 200)
+
+    def test_byte_ranges(self):
+        cases = {"bytes=2-5": b"2345", "bytes=7-": b"789", "bytes=-3": b"789", "bytes=8-100": b"89"}
+        for header, expected in cases.items():
+            with self.subTest(header):
+                response = self.client.get(self.url, headers={"Range": header})
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(b"".join(response.streaming_content), expected)
+                self.assertEqual(response["Content-Length"], str(len(expected)))
+        self.assertEqual(self.client.get(self.url, headers={"Range": "bytes=2-5"})["Content-Range"], "bytes 2-5/10")
+        response = self.client.get(self.url, headers={"Range": "bytes=10-"})
+        self.assertEqual((response.status_code, response["Content-Range"]), (416, "bytes */10"))
+        # Several ranges, or a range for a file that has changed since, get the whole file
+        self.assertEqual(self.client.get(self.url, headers={"Range": "bytes=0-1,4-5"}).status_code, 200)
+        self.assertEqual(self.client.get(self.url, headers={"Range": "bytes=2-5", "If-Range": '"stale"'}).status_code, 200)
+        etag = self.client.get(self.url)["ETag"]
+        self.assertEqual(self.client.get(self.url, headers={"Range": "bytes=2-5", "If-Range": etag}).status_code, 206)
+
+    def test_head_sends_no_body(self):
+        response = self.client.head(self.url)
+        self.assertEqual((response.status_code, response["Content-Length"]), (200, "10"))
+        self.assertEqual(response.content, b"")
+
+    def test_web_server_offload(self):
+        with self.settings(MEDIA_SENDFILE="X-Accel-Redirect", MEDIA_ACCEL_REDIRECT_PREFIX="/internal-media/"):
+            response = self.client.get(self.url)
+            self.assertEqual(response["X-Accel-Redirect"], "/internal-media/project_images/notes.txt")
+            self.assertEqual((response["Content-Type"], response.content), ("text/plain", b""))
+            # Conditional requests are still answered by Django
+            self.assertEqual(self.client.get(self.url, headers={"If-None-Match": response["ETag"]}).status_code, 304)
+        with self.settings(MEDIA_SENDFILE="X-Sendfile"):
+            self.assertEqual(self.client.get(self.url)["X-Sendfile"], os.path.join(self.location, "project_images", "notes.txt"))
+
+    def test_only_files_inside_media_root_are_served(self):
+        os.makedirs(os.path.join(self.location, ".blobs"))
+        with open(os.path.join(self.location, ".blobs", "secret"), "wb") as hidden:
+            hidden.write(b"hidden")
+        for url in ["/media/project_images/../../etc/passwd", "/media/.blobs/secret", "/media/project_images/", "/media/missing.png"]:
+            with self.subTest(url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+@skipUnless(Image, "Pillow is not installed")
+class ImageVariantTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="tester", password="not-a-real-password")
+        cls.technology = Technology.objects.create(name="Django")
+
+    def setUp(self):
+        # Keep uploads and variants out of the real uploads/ folder
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(self.user)
+
+    def png(self, name, size=(1200, 900)):
+        output = BytesIO()
+        Image.new("RGB", size, "orange").save(output, format="PNG")
+        return SimpleUploadedFile(name, output.getvalue(), content_type="image/png")
+
+    # Upload through the create page, then let a worker make the variants
+    def create_project(self, title, image):
+        self.client.post(reverse("project_create"), {
+            "title": title, "description": "A project.", "technologies": [self.technology.pk], "image": image,
+        })
+        run_pending()
+        return Project.objects.get(title=title)
+
+    def test_upload_queues_the_resizing(self):
+        self.client.post(reverse("project_create"), {
+            "title": "Queued", "description": "A project.", "technologies": [self.technology.pk], "image": self.png("queued.png"),
+        })
+        project = Project.objects.get(title="Queued")
+        self.assertEqual(project.image_variants, {})
+        self.assertEqual(Task.objects.get().args, [project.pk])
+        # Until a worker gets to it the page shows the original
+        self.assertContains(self.client.get(reverse("project_list")), project.image.url)
+        call_command("run_worker", "--once", stdout=StringIO())
+        project.refresh_from_db()
+        self.assertEqual(set(project.image_variants), {"thumb", "medium"})
+        self.assertFalse(Task.objects.exists())
+
+    def test_upload_creates_webp_variants_used_by_the_list(self):
+        project = self.create_project("Big picture", self.png("big.png"))
+        self.assertEqual(len(project.image_hash), 64)
+        self.assertEqual(set(project.image_variants), {"thumb", "medium"})
+        with default_storage.open(project.image_variants["thumb"]) as thumb:
+            image = Image.open(thumb)
+            self.assertEqual((image.format, image.size), ("WEBP", (300, 225)))
+        response = self.client.get(reverse("project_list"))
+        self.assertContains(response, default_storage.url(project.image_variants["thumb"]))
+        self.assertNotContains(response, project.image.url)
+
+    def test_replaced_image_stops_showing_the_old_variants(self):
+        project = self.create_project("Replaced", self.png("old.png"))
+        old_thumb = default_storage.url(project.image_variants["thumb"])
+        self.assertContains(self.client.get(reverse("project_list")), old_thumb)
+        # A different picture, so it gets different variants
+        self.client.post(reverse("project_update", kwargs={"pk": project.pk}), {
+            "title": "Replaced", "description": "A project.", "technologies": [self.technology.pk], "image": self.png("new.png", size=(640, 480)),
+        })
+        project.refresh_from_db()
+        self.assertEqual((project.image_variants, project.image_hash), ({}, ""))
+        # Until a worker has made the new variants the pages show the new original, never the old thumbnail
+        for url in [reverse("project_list"), reverse("project_detail", kwargs={"pk": project.pk})]:
+            response = self.client.get(url)
+            self.assertNotContains(response, old_thumb)
+            self.assertContains(response, project.image.url)
+        run_pending()
+        project.refresh_from_db()
+        self.assertNotEqual(default_storage.url(project.image_variants["thumb"]), old_thumb)
+
+    def test_same_content_reuses_variants(self):
+        first = self.create_project("First", self.png("one.png"))
+        # The second upload of the picture is not resized again
+        with mock.patch("projects.images.resize_to_webp") as resize:
+            second = self.create_project("Second", self.png("two.png"))
+        resize.assert_not_called()
+        # The same picture is stored once, under the hash of its content
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image.name, f"project_images/{first.image_hash}.png")
+        self.assertEqual(first.image_variants, second.image_variants)
+
+    def test_shared_files_survive_deleting_one_project(self):
+        first = self.create_project("First", self.png("one.png"))
+        second = self.create_project("Second", self.png("two.png"))
+        names = [first.image.name, *first.image_variants.values()]
+        first.delete()
+        for name in names:
+            default_storage.delete(name)
+        # The second project still uses the same image and variants
+        for name in names:
+            self.assertTrue(default_storage.exists(name))
+        self.assertContains(self.client.get(reverse("project_list")), default_storage.url(second.image_variants["thumb"]))
+        # Once no project uses them they are deleted
+        second.delete()
+        for name in names:
+            default_storage.delete(name)
+            self.assertFalse(default_storage.exists(name))
+
+    def test_small_images_are_not_enlarged_and_non_images_fall_back(self):
+        small = self.create_project("Small", self.png("small.png", size=(100, 50)))
+        with default_storage.open(small.image_variants["medium"]) as medium:
+            self.assertEqual(Image.open(medium).size, (100, 50))
+        document = self.create_project("Document", SimpleUploadedFile("notes.txt", b"not an image"))
+        self.assertEqual(document.image_variants, {})
+        response = self.client.get(reverse("project_detail", kwargs={"pk": document.pk}))
+        self.assertContains(response, document.image.url)
+
+    def test_backfill_command(self):
+        project = Project.objects.create(title="Old", description="Uploaded long ago.", user=self.user)
+        project.image.save("old.png", self.png("old.png"))
+        call_command("generate_image_variants", stdout=StringIO())
+        project.refresh_from_db()
+        self.assertEqual(set(project.image_variants), {"thumb", "medium"})
+
+# Test tasks: fail the first `failures` times they are called with a given key
+calls = {}
+
+@task
+def flaky(key, failures):
+    calls[key] = calls.get(key, 0) + 1
+    if calls[key] <= failures:
+        raise RuntimeError("Not yet")
+
+class TaskQueueTests(TestCase):
+    def make_due(self):
+        Task.objects.update(run_after=timezone.now())
+
+    def test_failed_tasks_are_retried_later(self):
+        enqueue("projects.tests.flaky", "retry", 1)
+        self.assertEqual(run_pending(), (1, 1))
+        queued = Task.objects.get()
+        self.assertEqual((queued.status, queued.attempts), (Task.QUEUED, 1))
+        self.assertIn("Not yet", queued.last_error)
+        # It waits out its back off before running again
+        self.assertEqual(run_pending(), (0, 0))
+        self.make_due()
+        self.assertEqual(run_pending(), (1, 0))
+        self.assertFalse(Task.objects.exists())
+
+    def test_tasks_fail_for_good_after_max_attempts(self):
+        enqueue("projects.tests.flaky", "give-up", 10, max_attempts=2)
+        run_pending()
+        self.make_due()
+        run_pending()
+        self.make_due()
+        self.assertEqual(run_pending(), (0, 0))
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_claimed_tasks_are_hidden_until_the_visibility_timeout(self):
+        enqueue("projects.tests.flaky", "timeout", 0)
+        claimed = claim_next(visibility_timeout=60)
+        self.assertIsNotNone(claimed)
+        self.assertIsNone(claim_next())
+        # The worker died: once its lock has run out another worker gets the task
+        Task.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim_next()
+        self.assertEqual((reclaimed.id, reclaimed.attempts), (claimed.id, 2))
+        # The first worker no longer owns the task, so finishing late changes nothing
+        self.assertTrue(run_task(claimed))
+        self.assertTrue(Task.objects.filter(id=claimed.id).exists())
+
+    def test_unknown_tasks_are_rejected(self):
+        with self.assertRaises(ValueError):
+            enqueue("projects.tests.missing")
+
+    @override_settings(TASK_QUEUE_EAGER=True)
+    def test_eager_mode_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue("projects.tests.flaky", "eager", 0)
+            self.assertNotIn("eager", calls)
+        self.assertEqual(calls["eager"], 1)
+        self.assertFalse(Task.objects.exists())
+
+class TemplateCacheTests(TestCase):
+    def test_production_settings_refuse_the_repository_key(self):
+        with self.assertRaises(ImproperlyConfigured):
+            load_settings("myportfolio.production_settings", DJANGO_SECRET_KEY="")
+        self.assertEqual(production_settings.SECRET_KEY, "not-the-real-key")
+        self.assertFalse(production_settings.SERVE_MEDIA)
+        self.assertTrue(load_settings("myportfolio.production_settings", DJANGO_SECRET_KEY="key", SERVE_MEDIA="1").SERVE_MEDIA)
+
+    def test_production_settings_use_the_cached_loader(self):
+        self.assertFalse(production_settings.DEBUG)
+        self.assertTrue(production_settings.WARM_TEMPLATES)
+        engine = production_settings.TEMPLATES[0]
+        self.assertFalse(engine["APP_DIRS"])
+        self.assertFalse(engine["OPTIONS"]["debug"])
+        self.assertEqual(engine["OPTIONS"]["loaders"][0][0], "django.template.loaders.cached.Loader")
+        with override_settings(TEMPLATES=production_settings.TEMPLATES):
+            self.assertContains(self.client.get(reverse("home")), "My Personal Portfolio")
+
+    def test_warm_templates_loads_every_site_template(self):
+        names = template_names(django_engines()[0])
+        # The project-wide templates/ folder as well as the apps' folders, but none of Django's own
+        self.assertIn("base.html", names)
+        self.assertIn("projects/project_card.html", names)
+        self.assertIn("pages/home.html", names)
+        self.assertFalse(any(name.startswith("admin/") for name in names))
+        out = StringIO()
+        call_command("warm_templates", stdout=out)
+        self.assertIn(f"Loaded {len(names)} templates", out.getvalue())
+
+    def test_warm_templates_fails_on_a_broken_template(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, "broken.html"), "w") as broken:
+            broken.write("{% if %}")
+        templates = [{"BACKEND": "django.template.backends.django.DjangoTemplates", "DIRS": [directory]}]
+        with override_settings(TEMPLATES=templates, BASE_DIR=directory):
+            with self.assertRaises(CommandError):
+                call_command("warm_templates", stdout=StringIO(), stderr=StringIO())
+
+    def test_benchmark_compares_the_loaders(self):
+        out = StringIO()
+        call_command("benchmark_templates", "--renders", "2", "--template", "pages/home.html", stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report["strategies"]), {"uncached", "cached-debug", "cached"})
+        self.assertEqual(report["strategies"]["cached"]["renders"], 2)
+
+class ConditionalPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="tester", password="not-a-real-password")
+        cls.django = Technology.objects.create(name="Django")
+        cls.project = Project.objects.create(title="Cat Collector", description="Collect cats.", user=cls.user)
+        cls.project.technologies.add(cls.django)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        # The first visit sets the CSRF cookie the ETags are made from
+        self.client.get(reverse("project_list"))
+
+    def etag(self, query=""):
+        response = self.client.get(reverse("project_list") + query)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("no-cache", response["Cache-Control"])
+        return response["ETag"]
+
+    def test_unchanged_list_is_not_rendered_again(self):
+        etag = self.etag()
+        # The session, the user and the ETag query; no project queries and no rendering
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("project_list"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        # A filter that lists other projects gets its own ETag
+        self.assertNotEqual(self.etag(f"?tech={self.django.pk + 1}"), etag)
+
+    def test_async_list_answers_with_a_304(self):
+        with override_settings(ROOT_URLCONF=AsyncReadUrls):
+            self.async_client.force_login(self.user)
+            async_to_sync(self.async_client.get)(reverse("project_list"))
+            etag = async_to_sync(self.async_client.get)(reverse("project_list"))["ETag"]
+            response = async_to_sync(self.async_client.get)(reverse("project_list"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_give_a_new_etag(self):
+        changes = [
+            lambda: Project.objects.filter(pk=self.project.pk).get().save(),
+            lambda: self.project.technologies.add(Technology.objects.create(name="Python")),
+            lambda: Technology.objects.filter(name="Python").get().save(),
+            lambda: self.django.projects.clear(),
+            lambda: Technology.objects.filter(name="Python").delete(),
+            lambda: Project.objects.create(title="Weather App", description="Forecasts.", user=self.user),
+        ]
+        etag = self.etag()
+        for change in changes:
+            # updated_at is stored to the millisecond on SQLite
+            time.sleep(0.002)
+            change()
+            new_etag = self.etag()
+            self.assertNotEqual(new_etag, etag)
+            etag = new_etag
+
+    def test_other_users_and_logged_out_visitors(self):
+        etag = self.etag()
+        self.client.force_login(User.objects.create_user(username="other", password="not-a-real-password"))
+        self.assertNotEqual(self.etag(), etag)
+        self.client.logout()
+        response = self.client.get(reverse("project_list"))
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn("ETag", response)
+
+    def test_compressed_pages_keep_matching(self):
+        response = self.client.get(reverse("project_list"), headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn(b"Cat Collector", gzip.decompress(response.content))
+        # Compressing makes the ETag weak, which If-None-Match still matches
+        self.assertTrue(response["ETag"].startswith("W/"))
+        response = self.client.get(reverse("project_list"), headers={"Accept-Encoding": "gzip", "If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    def test_images_and_ranges_are_not_compressed(self):
+        request = RequestFactory().get("/", headers={"Accept-Encoding": "gzip"})
+        middleware = CompressionMiddleware(lambda request: None)
+        for response in [
+            HttpResponse(b"x" * 1000, content_type="image/png"),
+            HttpResponse(b"x" * 1000, content_type="text/plain", status=206, headers={"Content-Range": "bytes 0-999/5000"}),
+        ]:
+            self.assertNotIn("Content-Encoding", middleware.process_response(request, response))
+        response = middleware.process_response(request, HttpResponse(b"x" * 1000, content_type="text/html; charset=utf-8"))
+        self.assertEqual(response["Content-Encoding"], "gzip")
@@ -4,30 +4,99 @@
 # The reasoning: Single-object views (Create/Update/Delete) know they're working with one instance, so Django names it after the model. List views work with querysets of multiple objects, so Django uses object_list for clarity.
 # If you wanted ListView to use projects instead of object_list, you'd add context_object_name = "projects" to ProjectList—but using defaults means less code to maintain.
 
-from django.shortcuts import render
+from urllib.parse import urlencode
+from django.shortcuts import render, aget_object_or_404
 # Import Project class from models.py
 from projects.models import Project
 # Import the custom form
 from projects.forms import ProjectForm
+# Import the background task queue, which makes the resized copies of uploaded images
+from projects.tasks import enqueue
+# and clears the variants of a replaced image
+from projects.images import forget_variants
 # In order to add class based views, you need to import the generic views module from Django and the model itself.
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 # Import the login_required decorator
 # ? from django.contrib.auth.decorators import login_required
+# The async views below use it, since LoginRequiredMixin cannot wrap an async view
+from django.contrib.auth.decorators import login_required
 # Import the mixin for class-based views
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.utils.decorators import method_decorator
+# Import the ETag helpers that let an unchanged project list answer with a 304
+from projects.conditional import achanges, can_etag, changes, conditional_page, page_etag
 
 # * You can test the below queries using the Django shell:
 # ? python manage.py shell
 # ? from projects.models import Project
 # ? Project.objects.all()
 
+# NOTES ON TECHNOLOGY FILTERS:
+# /projects/?tech=2&tech=5 lists the projects that use both technologies; add &match=any for the projects that use either.
+# Above the cards, each technology shows how many of the listed projects use it, and clicking it adds it to (or removes it from) the filter.
+# Those counts come from one grouped query (Project.objects.technology_counts()), not a technology.projects.count() per technology.
+def technology_filter(request):
+    selected = {int(value) for value in request.GET.getlist("tech") if value.isdigit()}
+    match = "any" if request.GET.get("match") == "any" else "all"
+    return selected, match
+
+def filter_url(selected, match):
+    params = [("tech", technology_id) for technology_id in sorted(selected)]
+    if match == "any":
+        params.append(("match", "any"))
+    return f"?{urlencode(params)}"
+
+# The template context for the filter bar, from the evaluated technology_counts() rows
+def technology_facets(counts, selected, match):
+    facets = [
+        {
+            "name": row["technology__name"],
+            "count": row["count"],
+            "selected": row["technology_id"] in selected,
+            "url": filter_url(selected ^ {row["technology_id"]}, match),
+        }
+        for row in counts
+    ]
+    return {
+        "facets": facets,
+        "match": match,
+        "filtered": bool(selected),
+        "match_all_url": filter_url(selected, "all"),
+        "match_any_url": filter_url(selected, "any"),
+    }
+
+# The project list's ETag covers the listed projects, with the same filter as the page, but only needs one cheap query (see projects/conditional.py)
+def project_list_etag(request, *args, **kwargs):
+    if not can_etag(request):
+        return None
+    selected, match = technology_filter(request)
+    return page_etag(request, *changes(Project.objects.filter(user=request.user).with_technology_ids(selected, match)))
+
+async def aproject_list_etag(request):
+    request.user = await request.auser()
+    if not can_etag(request):
+        return None
+    selected, match = technology_filter(request)
+    return page_etag(request, *await achanges(Project.objects.filter(user=request.user).with_technology_ids(selected, match)))
+
+# Runs before LoginRequiredMixin's check, so project_list_etag gives logged out visitors no ETag and they are redirected as before
+@method_decorator(conditional_page(project_list_etag), name="dispatch")
 class ProjectList(LoginRequiredMixin, ListView):
     model = Project
     # Uses default template projects/project_list.html and context object_list/project_list
 
     def get_queryset(self):
         # Override to only return projects belonging to the logged-in user
-        return Project.objects.filter(user=self.request.user)
+        # ? return Project.objects.filter(user=self.request.user)
+        # for_listing() also prefetches their technologies and leaves out the full descriptions (see projects/models.py)
+        self.selected, self.match = technology_filter(self.request)
+        return Project.objects.for_listing(self.request.user).with_technology_ids(self.selected, self.match)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        counts = list(self.object_list.technology_counts())
+        context.update(technology_facets(counts, self.selected, self.match))
+        return context
 
 # ? def project_index(request):
     # Query database to retrieve all objects in the projects table.
@@ -40,10 +109,32 @@ class ProjectList(LoginRequiredMixin, ListView):
     # You also add the path to a template named project_index.html to render(). We will have to create this template later.
     # ? return render(request, "projects/project_index.html", context)
 
+# Search the logged in user's projects: /projects/search/?q=django+api
+# Results come best match first, 20 to a page (?page=2), from the full-text search index on Postgres (see projects/search.py)
+class ProjectSearch(LoginRequiredMixin, ListView):
+    model = Project
+    template_name = "projects/project_search.html"
+    paginate_by = 20
+
+    def get_queryset(self):
+        self.query = self.request.GET.get("q", "").strip()
+        if not self.query:
+            return Project.objects.none()
+        return Project.objects.for_listing(self.request.user).search(self.query)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["query"] = self.query
+        return context
+
 class ProjectDetail(LoginRequiredMixin, DetailView):
     model = Project
     # Uses default template projects/project_detail.html and context object/project
 
+    def get_queryset(self):
+        # Fetch the technologies the page lists in one query
+        return Project.objects.with_technologies()
+
 # ? def project_detail(request, pk):
     # Another query to retrieve the project with a primary key, pk, equal to the function’s argument. The primary key is the unique identifier of a database entry.
     # ? project = Project.objects.get(pk=pk)
@@ -53,6 +144,31 @@ class ProjectDetail(LoginRequiredMixin, DetailView):
     # You pass in a template named project_detail.html. We will have to create this template later.
     # ? return render(request, "projects/project_detail.html", context)
 
+# NOTES ON ASYNC VIEWS:
+# Async versions of ProjectList and ProjectDetail, used instead of them when ASYNC_READ_VIEWS is on (see projects/urls.py).
+# Under an ASGI server (uvicorn, daphne) an async view gives the thread back to the event loop while it waits for the database, so one worker process can serve many slow clients at once.
+# They are plain functions because the generic class-based views and LoginRequiredMixin are sync only; the login_required decorator supports async views.
+# Nothing may touch the database lazily inside an async view, so the user is loaded with request.auser() and everything the template reads is fetched (or prefetched) before rendering.
+@login_required
+@conditional_page(aproject_list_etag)
+async def project_list_async(request):
+    # login_required already loaded the user with await request.auser(); put it on request.user so the templates can read it without a query
+    request.user = user = await request.auser()
+    selected, match = technology_filter(request)
+    listed = Project.objects.for_listing(user).with_technology_ids(selected, match)
+    projects = [project async for project in listed]
+    counts = [row async for row in listed.technology_counts()]
+    # Same template and context names as ProjectList
+    context = {"object_list": projects, "project_list": projects, **technology_facets(counts, selected, match)}
+    return render(request, "projects/project_list.html", context)
+
+@login_required
+async def project_detail_async(request, pk):
+    request.user = await request.auser()
+    # Prefetch the technologies so the template's project.technologies.all does not run a query while rendering
+    project = await aget_object_or_404(Project.objects.with_technologies(), pk=pk)
+    return render(request, "projects/project_detail.html", {"object": project, "project": project})
+
 class ProjectCreate(LoginRequiredMixin, CreateView):
     model = Project
     form_class = ProjectForm
@@ -67,16 +183,32 @@ class ProjectCreate(LoginRequiredMixin, CreateView):
         # Assign the logged in user (self.request.user).
         # form.instance is the project.
         form.instance.user = self.request.user
+        if "image" in form.changed_data:
+            forget_variants(form.instance)
         # Override the CreateView's form_valid() method to set the logged in user (self.request.user) before saving.
         # In Python, methods inherited by the superclass can be invoked by prefacing the method name with super().
         # Accordingly, after updating the form to include the user, we’re calling super().form_valid(form) to let the CreateView do its usual job of creating the model in the database and redirecting.
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        # Queue the making of the small copies of a newly uploaded image for the list and detail pages (see projects/images.py), so the upload does not wait for the resizing.
+        # The pages show the original image until a worker (python manage.py run_worker) has made them: forget_variants() above cleared any old ones in the same save.
+        if "image" in form.changed_data:
+            enqueue("projects.tasks.process_project_image", self.object.pk)
+        return response
 
 class ProjectUpdate(LoginRequiredMixin, UpdateView):
     model = Project
     form_class = ProjectForm
     # fields = ['title', 'description', 'technologies', 'image']
 
+    # Same as ProjectCreate: a replaced (or cleared) image needs new variants, and the old picture's must not be shown in the meantime
+    def form_valid(self, form):
+        if "image" in form.changed_data:
+            forget_variants(form.instance)
+        response = super().form_valid(form)
+        if "image" in form.changed_data:
+            enqueue("projects.tasks.process_project_image", self.object.pk)
+        return response
+
 class ProjectDelete(LoginRequiredMixin, DeleteView):
     model = Project
     # After deleting a project, redirect to the project index page.
@@ -9,8 +9,17 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'catcollector.settings')
+# Tells settings.py it is running under ASGI, where persistent database connections must stay off
+os.environ.setdefault('DJANGO_ASGI', '1')
 
 application = get_asgi_application()
+
+# Parse all the templates now, before the first request needs them (production_settings.py turns this on)
+if settings.WARM_TEMPLATES:
+    from catcollector.template_cache import warm_templates
+
+    warm_templates()
@@ -0,0 +1,53 @@
+import os
+from django.core.exceptions import ImproperlyConfigured
+from catcollector.settings import *  # noqa: F401,F403
+from catcollector.settings import TEMPLATES
+
+# NOTES ON PRODUCTION SETTINGS:
+# Start the server with DJANGO_SETTINGS_MODULE=catcollector.production_settings (e.g. `DJANGO_SETTINGS_MODULE=catcollector.production_settings gunicorn catcollector.wsgi`).
+# Everything comes from settings.py except what is changed below.
+# Deploy steps: `python manage.py check --deploy` (fails while the vendored static files are missing, see main_app/vendor.py), `python manage.py migrate`, `python manage.py collectstatic --noinput`, then `python manage.py warm_templates` (stops the deploy if a template is broken).
+
+DEBUG = False
+
+# The key in settings.py is in the repository, so production must set its own: refuse to start without it rather than quietly use the public one
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Set the DJANGO_SECRET_KEY environment variable to a long random value (see production_settings.py)')
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost').split(',')
+
+# The cached template loader, spelled out: templates are parsed once per process and never checked for changes (restart to pick up new ones).
+# APP_DIRS has to be off when loaders are listed; the app_directories loader does the same job.
+# Template debug off skips the bookkeeping used for the yellow error pages, which DEBUG = False never shows anyway.
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'debug': False,
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
+
+# Parse every template when a server process starts (see catcollector/template_cache.py)
+WARM_TEMPLATES = True
+
+# Hashed, minified and pre-compressed static files (see catcollector/static_storage.py); run collectstatic on every deploy
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'catcollector.static_storage.CompressedManifestStaticFilesStorage',
+    },
+}
+# Let Django serve the collected static files with year-long caching (see catcollector/static_serving.py).
+# Set SERVE_STATIC=0 when the web server in front serves STATIC_ROOT itself.
+SERVE_STATIC = os.environ.get('SERVE_STATIC', '1') == '1'
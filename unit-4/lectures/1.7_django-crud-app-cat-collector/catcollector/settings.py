@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,11 +42,21 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Listed first so its timings cover all the other middleware too
+    'main_app.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Gzips the pages on their way out (see main_app/middleware.py). Listed above everything that reads or changes the response body, so it runs last on the way out.
+    'main_app.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # Answers "has it changed?" (If-None-Match / If-Modified-Since) with an empty 304 for any response with an ETag or Last-Modified date,
+    # and gives the others an ETag made from their content. Below CompressionMiddleware so that ETag is taken of the uncompressed page.
+    # That still renders the page first; the cat and toy lists answer with a 304 before rendering anything (see main_app/conditional.py).
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Sends the read-only pages' queries to the read replica, if there is one (see catcollector/db_routers.py)
+    'catcollector.db_routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -69,19 +80,120 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'catcollector.wsgi.application'
 
+# Parse every template when the server starts instead of on first use (see catcollector/template_cache.py). production_settings.py turns it on.
+WARM_TEMPLATES = False
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection reuse
+# Without CONN_MAX_AGE Django opens a new connection to Postgres at the start of every request and closes it at the end.
+# Connecting (TCP, authentication, backend process start up) usually takes longer than all of a page's queries together.
+# CONN_MAX_AGE keeps a connection open for that many seconds and reuses it for the following requests of the same thread (None keeps it forever).
+# CONN_HEALTH_CHECKS makes sure a reused connection still works before a request uses it, so a database restart does not turn into errors.
+# Instead of that, DB_POOL=1 turns on Django's connection pool, shared by every thread of a process, which also suits ASGI where each request may run in a new thread.
+# The pool needs psycopg 3 (pipenv install "psycopg[binary,pool]" in place of psycopg2-binary), and CONN_MAX_AGE must be 0 with it because the pool does the reusing.
+# Check the effect with `python manage.py benchmark_connections`.
+# Persistent connections only suit WSGI. Under ASGI (asgi.py sets DJANGO_ASGI=1) or with ASYNC_READ_VIEWS on, the sync ORM code runs in sync_to_async threads, each with its own connection,
+# and CONN_MAX_AGE would keep every one of them open until they pile up (https://docs.djangoproject.com/en/5.2/ref/databases/#persistent-connections).
+# There CONN_MAX_AGE is always 0, whatever DB_CONN_MAX_AGE says: turn on DB_POOL=1 to reuse connections instead.
+# Environment variables: DB_CONN_MAX_AGE (seconds, or none for no limit; default 60), DB_POOL (1 to turn the pool on), DB_POOL_MIN_SIZE and DB_POOL_MAX_SIZE.
+
+DB_POOL = os.environ.get('DB_POOL') == '1'
+DB_CONN_MAX_AGE = os.environ.get('DB_CONN_MAX_AGE', '60')
+ASYNC_SERVER = os.environ.get('DJANGO_ASGI') == '1' or os.environ.get('ASYNC_READ_VIEWS') == '1'
+
 DATABASES = {
     'default': {
         # 'ENGINE': 'django.db.backends.sqlite3',
         # 'NAME': BASE_DIR / 'db.sqlite3',
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': 'catcollector',
+        'CONN_MAX_AGE': 0 if DB_POOL or ASYNC_SERVER else (None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            },
+        } if DB_POOL else {},
     }
 }
 
+# Read replica
+# Set DB_REPLICA_HOST (and DB_REPLICA_NAME if it differs) to send the read-only pages below to a streaming replica of the primary database (see catcollector/db_routers.py).
+# The replica uses the same settings as 'default' otherwise. In tests it mirrors 'default', so no second test database is created.
+
+REPLICA_DATABASE_ALIAS = 'replica'
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES[REPLICA_DATABASE_ALIAS] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['catcollector.db_routers.ReadReplicaRouter']
+
+# URL names of the pages whose main_app queries may be answered by the replica
+REPLICA_READ_VIEWS = ['cat-index', 'cat-detail', 'toy-index', 'toy-detail']
+
+# How long after a change a user's pages are read from the primary, so they see their own writes despite replication lag
+REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The cached cat pages (see main_app/cache.py) are invalidated by writing new version numbers into this cache, so every server process must share it.
+# The local-memory cache lives inside each server process: a change handled by one process never reaches the others, which keep serving their stale copies for up to CAT_PAGE_CACHE_TIMEOUT.
+# It needs no extra services, so it is fine for runserver and a single process, but as soon as there is more than one (gunicorn --workers 2, several servers)
+# set the CACHE_URL environment variable to a shared cache:
+#     CACHE_URL=redis://127.0.0.1:6379        -> django.core.cache.backends.redis.RedisCache (needs the redis package)
+#     CACHE_URL=memcached://127.0.0.1:11211   -> django.core.cache.backends.memcached.PyMemcacheCache (needs the pymemcache package)
+
+CACHE_URL = os.environ.get('CACHE_URL', '')
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith('memcached://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_URL.removeprefix('memcached://'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'catcollector',
+        }
+    }
+
+# Which entry in CACHES holds the cached cat pages (see main_app/cache.py), and for how many seconds
+CAT_PAGE_CACHE_ALIAS = 'default'
+CAT_PAGE_CACHE_TIMEOUT = 300
+
+
+# Async views
+# Turn this on when the site is served by an ASGI server (e.g. `uvicorn catcollector.asgi:application`) to use the async versions of the cat index and detail pages.
+# Leave it off under WSGI (runserver, gunicorn), where every async view would need its own event loop.
+# Set the ASYNC_READ_VIEWS environment variable to 1 to turn it on without editing this file.
+
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS') == '1'
+
+
+# Request metrics
+# Where RequestMetricsMiddleware writes each server process's metrics (read by `python manage.py dump_request_metrics`), and how often
+
+REQUEST_METRICS_DIR = BASE_DIR / 'metrics'
+REQUEST_METRICS_FLUSH_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -119,6 +231,10 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+# Where `python manage.py collectstatic` gathers the static files for production (see catcollector/static_storage.py)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+# Serve STATIC_ROOT from Django (see catcollector/static_serving.py). Not needed with DEBUG on, when runserver serves the static files itself.
+SERVE_STATIC = False
 
 # Add this variable to specify where decorators and mixins should redirect to
 LOGIN_URL = 'home'
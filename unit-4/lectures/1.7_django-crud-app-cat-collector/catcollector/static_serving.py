@@ -0,0 +1,71 @@
+import mimetypes
+import os
+import posixpath
+import re
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# Serves the collected static files (STATIC_ROOT) when no web server sits in front of Django; production_settings.py turns it on with SERVE_STATIC.
+# - Hashed names (css/base.5d41402abc4b.css, see catcollector/static_storage.py) never change, so browsers may keep them for a year without asking again.
+#   Anything else is sent with "no-cache", so browsers check back (cheaply: an unchanged file gets an empty 304 thanks to the ETag).
+# - When the browser accepts brotli or gzip and collectstatic made a .br or .gz copy, that copy is sent instead, with no compressing per request.
+# Behind nginx, let it serve STATIC_ROOT itself instead, e.g.:
+#   location /static/ { alias /path/to/staticfiles/; gzip_static on; brotli_static on; }
+#   location ~ "^/static/.+\.[0-9a-f]{12}\.\w+$" { ...; expires max; add_header Cache-Control "public, immutable"; }
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+# ManifestStaticFilesStorage puts the first 12 characters of the MD5 of the content before the extension
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+# Best first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+def accepted_encodings(request):
+    header = request.headers.get('Accept-Encoding', '')
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+@require_safe
+def serve_static(request, path):
+    path = posixpath.normpath(path).lstrip('/')
+    if path.startswith('.') or path.endswith(('.gz', '.br')):
+        raise Http404('Not found')
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Not found')
+    if not os.path.isfile(full_path):
+        raise Http404('Not found')
+
+    # Send the smallest version the browser can read
+    accepted = accepted_encodings(request)
+    encoding, send_path = None, full_path
+    for coding, extension in ENCODINGS:
+        if coding in accepted and os.path.isfile(full_path + extension):
+            encoding, send_path = coding, full_path + extension
+            break
+
+    stat = os.stat(send_path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    content_type, _ = mimetypes.guess_type(full_path)
+    response = FileResponse(open(send_path, 'rb'), content_type=content_type or 'application/octet-stream')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(path) else REVALIDATE_CACHE_CONTROL
+    if encoding:
+        response['Content-Encoding'] = encoding
+    # Caches in between must keep the compressed and uncompressed versions apart
+    patch_vary_headers(response, ['Accept-Encoding'])
+    conditional = get_conditional_response(request, etag, int(stat.st_mtime), response)
+    if conditional is not response:
+        response.close()
+    return conditional
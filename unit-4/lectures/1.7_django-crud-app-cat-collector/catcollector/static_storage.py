@@ -0,0 +1,71 @@
+import gzip
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+# NOTES ON THE STATIC FILE PIPELINE:
+# `python manage.py collectstatic` copies every static file into STATIC_ROOT. With this storage (the "staticfiles" entry in production_settings.py) it also:
+# 1. Minifies CSS and JavaScript as they are copied (needs `pipenv install rcssmin rjsmin`; without them the files are copied as they are).
+# 2. Saves a copy of every file with a hash of its content in the name (css/base.css -> css/base.5d41402abc4b.css) and writes
+#    staticfiles.json, the manifest {% static %} reads to put the hashed names in the pages (ManifestStaticFilesStorage does this part).
+# 3. Writes gzip (.gz) and, if `brotli` is installed, brotli (.br) compressed copies of the hashed text files next to them,
+#    so the server can send them compressed without compressing them on every request.
+# A hashed name always holds the same bytes, so browsers may keep these files for a year (see catcollector/static_serving.py);
+# a changed file gets a new name, which the pages start using as soon as they are rendered with the new manifest.
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Files worth compressing: text formats. Images such as PNG and WebP are compressed already.
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.xml', '.ico')
+# Below this size the compressed copy saves too little to matter
+MIN_COMPRESS_SIZE = 256
+
+def minify(name, content):
+    if name.endswith('.css') and not name.endswith('.min.css') and rcssmin is not None:
+        return rcssmin.cssmin(content.decode()).encode()
+    if name.endswith('.js') and not name.endswith('.min.js') and rjsmin is not None:
+        return rjsmin.jsmin(content.decode()).encode()
+    return content
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def _save(self, name, content):
+        # collectstatic copies each file with save(); minify it on the way in, so the hash is taken of the minified file
+        if name.endswith(('.css', '.js')):
+            # The hashed copy is saved from a file that has just been read to work out its hash, so start from the beginning again
+            content.seek(0)
+            content = ContentFile(minify(name, content.read()))
+        return super()._save(name, content)
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = set()
+        for original_name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield original_name, hashed_name, processed
+        if not dry_run:
+            for name in sorted(hashed_names):
+                if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                    self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as file:
+            content = file.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        compressed = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['.br'] = brotli.compress(content, quality=11)
+        for extension, data in compressed.items():
+            # Only keep a compressed copy that is actually smaller
+            if len(data) < len(content):
+                with open(self.path(name + extension), 'wb') as output:
+                    output.write(data)
@@ -14,8 +14,10 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+from catcollector.static_serving import serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -23,3 +25,9 @@ urlpatterns = [
     # include the built-in auth urls for the built-in views
     path('accounts/', include('django.contrib.auth.urls')),
 ]
+
+# Serve the collected static files with year-long caching when there is no web server in front to do it (production_settings.py turns this on)
+if settings.SERVE_STATIC:
+    urlpatterns += [
+        re_path(rf"^{settings.STATIC_URL.lstrip('/')}(?P<path>.*)$", serve_static),
+    ]
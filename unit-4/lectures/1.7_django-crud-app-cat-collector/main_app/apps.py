@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class MainAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main_app'
+
+    def ready(self):
+        # Connect the signal receivers that keep the cat page cache up to date
+        from . import signals  # noqa: F401
+        # and the deploy check for the vendored static files
+        from . import vendor  # noqa: F401
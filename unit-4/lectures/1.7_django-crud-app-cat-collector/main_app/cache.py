@@ -0,0 +1,98 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+from catcollector.db_routers import read_from_primary
+
+# Caching for the cat pages.
+# The views cache the data they load from the database (the page of cats, the cat with its feedings and toys) rather than the rendered HTML, because the pages contain forms with per-session CSRF tokens.
+# Each cache key ends with one or more version numbers:
+#   user:<id>  changes whenever one of the user's cats (or their feedings) changes -> cat index pages
+#   cat:<id>   changes whenever that cat, its feedings or its toys change          -> cat detail page
+#   toys       changes whenever any toy is created, edited or deleted             -> cat detail pages ("Available Toys")
+# Invalidating is just writing a new version number (see signals.py): old entries are never read again and simply expire.
+# Versions are nanosecond timestamps rather than counters, so a version that gets evicted from the cache can never come back as an old number and revive stale entries.
+# They also tell when a page was last invalidated. A page refilled within REPLICA_STICKY_SECONDS of that is read from the primary database:
+# a lagging read replica (see catcollector/db_routers.py) could still return the old rows, which would then be cached under the new version for the whole timeout.
+
+KEY_PREFIX = 'catcollector'
+TOYS_SCOPE = 'toys'
+
+def get_cache():
+    return caches[settings.CAT_PAGE_CACHE_ALIAS]
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+def cat_scope(cat_id):
+    return f'cat:{cat_id}'
+
+def _version_key(scope):
+    return f'{KEY_PREFIX}:version:{scope}'
+
+# Look up the current version of each scope in one cache round trip, starting a version for any scope that has none yet
+def get_versions(scopes):
+    cache = get_cache()
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+# Invalidate everything cached under these scopes
+def bump(*scopes):
+    if scopes:
+        now = time.time_ns()
+        get_cache().set_many({_version_key(scope): now for scope in scopes}, timeout=None)
+
+# Read from the primary if any of these scopes changed less than REPLICA_STICKY_SECONDS ago (a version that was missing has just been started, so it counts as recent too)
+def route_fill(versions):
+    if versions and time.time_ns() - max(versions) < settings.REPLICA_STICKY_SECONDS * 1_000_000_000:
+        read_from_primary()
+
+# Build the key for one cached page: its name, what identifies it (user, cat, cursor...) and the versions of the scopes it depends on.
+# Call it before loading the page, so a fill right after an invalidation reads from the primary.
+def page_key(name, scopes, *parts):
+    versions = get_versions(scopes)
+    route_fill(versions)
+    return ':'.join([KEY_PREFIX, name, *map(str, parts), *map(str, versions)])
+
+def get_page(key):
+    return get_cache().get(key)
+
+def set_page(key, value):
+    get_cache().set(key, value, timeout=settings.CAT_PAGE_CACHE_TIMEOUT)
+
+# Async versions of the helpers above for the async views.
+# They use the cache's a-prefixed methods (aget, aset_many...), which backends with native async support run without a thread.
+async def aget_versions(scopes):
+    cache = get_cache()
+    keys = [_version_key(scope) for scope in scopes]
+    versions = await cache.aget_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        await cache.aset_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+async def apage_key(name, scopes, *parts):
+    versions = await aget_versions(scopes)
+    route_fill(versions)
+    return ':'.join([KEY_PREFIX, name, *map(str, parts), *map(str, versions)])
+
+async def aget_page(key):
+    return await get_cache().aget(key)
+
+async def aset_page(key, value):
+    await get_cache().aset(key, value, timeout=settings.CAT_PAGE_CACHE_TIMEOUT)
+
+# Invalidate the detail pages of these cats and the index pages of their owners.
+# Used after bulk writes (bulk_create, queryset.update) that do not send model signals.
+def invalidate_cats(cat_ids):
+    from .models import Cat
+    cat_ids = list(cat_ids)
+    if not cat_ids:
+        return
+    user_ids = Cat.objects.filter(id__in=cat_ids).values_list('user_id', flat=True).distinct()
+    bump(*[cat_scope(cat_id) for cat_id in cat_ids], *[user_scope(user_id) for user_id in user_ids])
@@ -0,0 +1,76 @@
+import csv
+import json
+from .models import Cat, Feeding
+
+# Streaming exports of a user's cats, feedings and cat/toy pairings.
+# Every query is read with .iterator(chunk_size=...), so Django fetches rows from the database a chunk at a time instead of caching the whole result, and each row is turned into text and handed to the StreamingHttpResponse as soon as it arrives.
+# Memory use stays constant however long a user's history is, and the first bytes reach the browser right away.
+
+# How many rows to fetch from the database per round trip
+CHUNK_SIZE = 2000
+
+# Every export row has the same columns; the record column says which kind of row it is and the other columns are left blank when they do not apply.
+COLUMNS = [
+    'record', 'cat_id', 'cat_name', 'breed', 'age', 'description',
+    'feeding_date', 'meal', 'toy_id', 'toy_name', 'toy_color',
+]
+
+def export_records(user):
+    cats = (
+        Cat.objects.filter(user=user)
+        .order_by('id')
+        .values_list('id', 'name', 'breed', 'age', 'description')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for cat_id, name, breed, age, description in cats:
+        yield {
+            'record': 'cat', 'cat_id': cat_id, 'cat_name': name,
+            'breed': breed, 'age': age, 'description': description,
+        }
+
+    feedings = (
+        Feeding.objects.filter(cat__user=user)
+        .order_by('cat_id', 'date', 'meal')
+        .values_list('cat_id', 'cat__name', 'date', 'meal')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for cat_id, cat_name, feeding_date, meal in feedings:
+        yield {
+            'record': 'feeding', 'cat_id': cat_id, 'cat_name': cat_name,
+            'feeding_date': feeding_date.isoformat(), 'meal': meal,
+        }
+
+    # Read the cat/toy pairs straight from the ManyToMany "through" table (main_app_cat_toys)
+    cat_toys = (
+        Cat.toys.through.objects.filter(cat__user=user)
+        .order_by('cat_id', 'toy_id')
+        .values_list('cat_id', 'cat__name', 'toy_id', 'toy__name', 'toy__color')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for cat_id, cat_name, toy_id, toy_name, toy_color in cat_toys:
+        yield {
+            'record': 'toy', 'cat_id': cat_id, 'cat_name': cat_name,
+            'toy_id': toy_id, 'toy_name': toy_name, 'toy_color': toy_color,
+        }
+
+# csv.writer needs a file to write to. This "file" just hands each formatted line back so it can be yielded to the response.
+class Echo:
+    def write(self, value):
+        return value
+
+def stream_csv(user):
+    writer = csv.DictWriter(Echo(), fieldnames=COLUMNS)
+    yield writer.writerow(dict(zip(COLUMNS, COLUMNS)))
+    for record in export_records(user):
+        yield writer.writerow(record)
+
+# JSON Lines: one JSON object per line, which (unlike one big JSON array) can be written and read a row at a time.
+def stream_jsonl(user):
+    for record in export_records(user):
+        yield json.dumps(record) + '\n'
+
+# format name -> (row generator, content type, file extension)
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv', 'csv'),
+    'jsonl': (stream_jsonl, 'application/x-ndjson', 'jsonl'),
+}
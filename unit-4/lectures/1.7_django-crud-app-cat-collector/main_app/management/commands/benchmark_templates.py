@@ -0,0 +1,97 @@
+import json
+import time
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Engine, RequestContext, TemplateDoesNotExist
+from django.test import RequestFactory
+from catcollector.template_cache import django_engines
+from main_app.management.commands.benchmark import percentile
+
+# Run with: python manage.py benchmark_templates
+# Times loading and rendering templates the way a view does (get_template, then render with the request's context processors) under three setups:
+#   uncached      every render reads and parses the template files again (what each edit costs under runserver, and what Django before 4.1 did whenever DEBUG was on)
+#   cached-debug  the cached loader with template debug on: settings.py, with DEBUG = True
+#   cached        the cached loader with template debug off: production_settings.py
+# The default templates render without any data, so no database is needed; add --template to time others.
+
+DEFAULT_TEMPLATES = ['home.html', 'about.html', 'cats/index.html', 'main_app/toy_list.html']
+FILE_LOADERS = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+STRATEGIES = {
+    'uncached': {'cached': False, 'debug': True},
+    'cached-debug': {'cached': True, 'debug': True},
+    'cached': {'cached': True, 'debug': False},
+}
+
+# A copy of the site's template engine with the given loader and debug setting
+def build_engine(configured, cached, debug):
+    return Engine(
+        dirs=configured.dirs,
+        loaders=[('django.template.loaders.cached.Loader', FILE_LOADERS)] if cached else FILE_LOADERS,
+        context_processors=configured.context_processors,
+        debug=debug,
+        libraries=configured.libraries,
+        builtins=[builtin for builtin in configured.builtins if builtin not in Engine.default_builtins],
+        string_if_invalid=configured.string_if_invalid,
+        autoescape=configured.autoescape,
+    )
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    return {
+        'renders': len(latencies),
+        'mean_ms': round(sum(latencies) / len(latencies), 4),
+        'p50_ms': round(percentile(latencies, 50), 4),
+        'p95_ms': round(percentile(latencies, 95), 4),
+        'max_ms': round(latencies[-1], 4),
+    }
+
+class Command(BaseCommand):
+    help = 'Compare template render times without the cached loader, with it, and with it and template debug off'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=200, help='Renders of each template per setup (default: 200)')
+        parser.add_argument('--template', action='append', dest='templates', help='Template to render (repeat for several; default: pages that need no data)')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of standard output')
+
+    def handle(self, *args, **options):
+        if options['renders'] < 1:
+            raise CommandError('--renders must be at least 1')
+        templates = options['templates'] or DEFAULT_TEMPLATES
+        configured = django_engines()[0]
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+
+        report = {'templates': templates, 'strategies': {}}
+        for name, strategy in STRATEGIES.items():
+            engine = build_engine(configured, **strategy)
+            report['strategies'][name] = self.run_strategy(engine, templates, request, options['renders'])
+        uncached = report['strategies']['uncached']['mean_ms']
+        report['speedup'] = {
+            name: round(uncached / result['mean_ms'], 1) for name, result in report['strategies'].items() if name != 'uncached'
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Template benchmark written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def run_strategy(self, engine, templates, request, renders):
+        def render(name):
+            engine.get_template(name).render(RequestContext(request, {}))
+
+        try:
+            # One render of each first, so the cached setups are timed warm, as a server that has been running a while
+            for name in templates:
+                render(name)
+        except TemplateDoesNotExist as error:
+            raise CommandError(f'Unknown template: {error}')
+        latencies = []
+        for _ in range(renders):
+            for name in templates:
+                started = time.perf_counter()
+                render(name)
+                latencies.append((time.perf_counter() - started) * 1000)
+        return summarize(latencies)
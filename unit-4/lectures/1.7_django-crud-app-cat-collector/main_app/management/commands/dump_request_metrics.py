@@ -0,0 +1,48 @@
+import json
+from django.core.management.base import BaseCommand
+from main_app.metrics import (
+    DURATION_BUCKETS_MS,
+    clear_snapshots,
+    histogram_percentile,
+    load_snapshots,
+)
+
+# Run with: python manage.py dump_request_metrics
+# Prints the per-view request metrics that RequestMetricsMiddleware has collected in every server process (see main_app/metrics.py).
+# Views with many queries per request are the first place to look for N+1 query regressions.
+class Command(BaseCommand):
+    help = 'Print per-view latency and query count metrics collected by RequestMetricsMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the raw merged metrics as JSON')
+        parser.add_argument('--reset', action='store_true', help='Reset the metrics of every server process after printing them')
+
+    def handle(self, *args, **options):
+        views = load_snapshots()
+        if options['json']:
+            self.stdout.write(json.dumps(views, indent=2))
+        elif not views:
+            self.stdout.write('No request metrics have been recorded yet.')
+        else:
+            self.print_table(views)
+        if options['reset']:
+            clear_snapshots()
+            self.stdout.write(self.style.SUCCESS('Request metrics reset.'))
+
+    def print_table(self, views):
+        header = f"{'view':<28} {'reqs':>7} {'avg ms':>8} {'p50':>6} {'p95':>6} {'p99':>6} {'max ms':>8} {'avg q':>6} {'max q':>6} {'sql ms':>8}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        # Slowest views (by total time spent) first
+        for view_name, stats in sorted(views.items(), key=lambda item: -item[1]['total_ms']):
+            requests = stats['requests']
+            percentiles = [
+                histogram_percentile(DURATION_BUCKETS_MS, stats['duration_histogram'], p) for p in (50, 95, 99)
+            ]
+            self.stdout.write(
+                f"{view_name[:28]:<28} {requests:>7} {stats['total_ms'] / requests:>8.1f} "
+                + ' '.join(f'{"<=" + str(p) if p != float("inf") else ">5000":>6}' for p in percentiles)
+                + f" {stats['max_ms']:>8.1f} {stats['queries'] / requests:>6.1f} {stats['max_queries']:>6} "
+                f"{stats['sql_ms'] / requests:>8.1f}"
+            )
+        self.stdout.write('Percentiles are histogram bucket upper bounds in ms; q = database queries per request.')
@@ -0,0 +1,156 @@
+import csv
+import json
+import sys
+import time
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from main_app.cache import invalidate_cats
+from main_app.forms import FeedingForm
+from main_app.models import Cat, Feeding, MEALS
+
+# Run with: python manage.py import_feedings feedings.csv
+# Loads historical feedings from a CSV file (with a cat,date,meal header row) or a JSON Lines file (one {"cat": 1, "date": "2026-01-01", "meal": "B"} object per line).
+# Use - as the path to read from standard input.
+# The file is read one row at a time and written with bulk_create one batch at a time, so memory use stays flat no matter how big the file is.
+
+# Allow meals to be given either as the stored code ('B') or the display name ('Breakfast'), in any case
+MEAL_CODES = {code: code for code, _ in MEALS}
+MEAL_LABELS = {label.casefold(): code for code, label in MEALS}
+
+def meal_code(value):
+    value = str(value).strip()
+    return MEAL_CODES.get(value.upper()) or MEAL_LABELS.get(value.casefold(), value)
+
+# How many invalid rows to print before only counting them
+MAX_REPORTED_ERRORS = 20
+
+class Command(BaseCommand):
+    help = 'Bulk import feedings from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON Lines file to import, or - for standard input')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='File format (default: guessed from the file extension, csv for standard input)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='How many feedings to insert per transaction (default: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        # Reuse the FeedingForm's own fields so imported rows follow the same rules as the add feeding form.
+        self.date_field = FeedingForm.base_fields['date']
+        self.meal_field = FeedingForm.base_fields['meal']
+
+        self.imported = 0
+        self.duplicates = 0
+        self.invalid = 0
+        started = time.perf_counter()
+        try:
+            source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as error:
+            raise CommandError(f'Could not open {path}: {error}')
+        with source:
+            batch = []
+            for line_number, row in self.read_rows(source, file_format):
+                feeding = self.build_feeding(line_number, row)
+                if feeding is None:
+                    continue
+                batch.append((line_number, feeding))
+                if len(batch) >= batch_size:
+                    self.write_batch(batch)
+                    batch = []
+            if batch:
+                self.write_batch(batch)
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        # Only rows actually inserted count towards the import and its speed; meals that were already on record are reported separately
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported} feedings in {elapsed:.2f}s '
+            f'({self.imported / elapsed:,.0f} rows/sec); skipped {self.duplicates} meals already recorded and {self.invalid} invalid rows.'
+        ))
+
+    # Yield (line number, dict) pairs without reading the whole file into memory
+    def read_rows(self, source, file_format):
+        if file_format == 'csv':
+            # Line 1 is the header row
+            for line_number, row in enumerate(csv.DictReader(source), start=2):
+                yield line_number, row
+            return
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as error:
+                self.report(line_number, f'invalid JSON ({error.msg})')
+                continue
+            if not isinstance(row, dict):
+                self.report(line_number, 'expected a JSON object')
+                continue
+            yield line_number, row
+
+    def build_feeding(self, line_number, row):
+        cat_id = row.get('cat', row.get('cat_id'))
+        meal = meal_code(row.get('meal', ''))
+        try:
+            cat_id = int(cat_id)
+            feeding_date = self.date_field.clean(row.get('date'))
+            meal = self.meal_field.clean(meal)
+        except (TypeError, ValueError):
+            self.report(line_number, f'invalid cat id {cat_id!r}')
+            return None
+        except ValidationError as error:
+            self.report(line_number, '; '.join(error.messages))
+            return None
+        return Feeding(cat_id=cat_id, date=feeding_date, meal=meal)
+
+    def write_batch(self, batch):
+        # One query per batch to drop rows that point at cats that do not exist
+        cat_ids = {feeding.cat_id for _, feeding in batch}
+        existing = set(Cat.objects.filter(id__in=cat_ids).values_list('id', flat=True))
+        # and one more to find the meals already on record (the unique (cat, date, meal) constraint would silently drop them), so they are not counted as imported
+        recorded = set(
+            Feeding.objects.filter(cat_id__in=existing, date__in={feeding.date for _, feeding in batch})
+            .values_list('cat_id', 'date', 'meal')
+        )
+        feedings = []
+        for line_number, feeding in batch:
+            key = (feeding.cat_id, feeding.date, feeding.meal)
+            if feeding.cat_id not in existing:
+                self.report(line_number, f'cat {feeding.cat_id} does not exist')
+            elif key in recorded:
+                # Already in the database, or earlier in this file
+                self.duplicates += 1
+            else:
+                recorded.add(key)
+                feedings.append(feeding)
+        if not feedings:
+            return
+        with transaction.atomic():
+            # bulk_create skips Feeding.save(), so the feeding counters of the touched cats are recomputed in the same transaction.
+            # ignore_conflicts still covers a meal recorded by someone else since the check above, instead of failing the whole batch.
+            Feeding.objects.bulk_create(feedings, ignore_conflicts=True)
+            Cat.objects.filter(id__in=existing).reconcile_feeding_counters()
+        # bulk_create does not send signals either, so drop the touched cats' cached pages by hand
+        invalidate_cats(existing)
+        self.imported += len(feedings)
+        self.stdout.write(f'  {self.imported} rows written...')
+
+    def report(self, line_number, message):
+        self.invalid += 1
+        if self.invalid <= MAX_REPORTED_ERRORS:
+            self.stderr.write(f'Line {line_number}: {message}')
+        elif self.invalid == MAX_REPORTED_ERRORS + 1:
+            self.stderr.write('Too many invalid rows; only counting from now on.')
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from main_app.cache import invalidate_cats
+from main_app.models import Cat
+
+# Run with: python manage.py reconcile_feeding_counters
+# Cat.last_fed_date and Cat.meals_today are updated whenever a Feeding is saved or deleted one at a time.
+# Bulk operations (bulk_create, queryset.update/delete) and data loaded outside Django skip that, so this command recomputes the counters from the feedings table and repairs any cat that has drifted.
+class Command(BaseCommand):
+    help = "Recompute every cat's feeding counters (last_fed_date, meals_today) from its feedings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='How many cats to check per batch (default: 5000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many cats are out of sync without fixing them',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = 0
+        stale = 0
+        last_id = 0
+        # Walk the cats in id order one batch at a time so each UPDATE stays small, even with millions of cats.
+        while True:
+            batch_ids = list(
+                Cat.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not batch_ids:
+                break
+            last_id = batch_ids[-1]
+            checked += len(batch_ids)
+            stale_ids = list(
+                Cat.objects.filter(id__in=batch_ids).with_stale_feeding_counters().values_list('id', flat=True)
+            )
+            stale += len(stale_ids)
+            if stale_ids and not options['dry_run']:
+                Cat.objects.filter(id__in=stale_ids).reconcile_feeding_counters()
+                # The counters were fixed with UPDATE statements, which do not send signals, so drop the cached pages by hand
+                invalidate_cats(stale_ids)
+
+        action = 'would be repaired' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} cats: {stale} {action}.'))
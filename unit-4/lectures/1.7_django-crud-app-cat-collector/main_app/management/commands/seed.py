@@ -0,0 +1,70 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from main_app.cache import TOYS_SCOPE, bump
+from main_app.seeding import SEED_PASSWORD, seed_catcollector
+
+# Run with: python manage.py seed --users 1000 --cats-per-user 100 --feedings-per-cat 60 --skew 1.2
+# Fills the database with deterministic fake users, cats, feedings and toys (see main_app/seeding.py) so pages, query plans and pagination can be tried at production scale.
+# The same --seed always produces the same data. Run it again with a different --username-prefix to add another batch of users.
+class Command(BaseCommand):
+    help = 'Generate a large, reproducible set of fake users, cats, feedings and toys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--cats-per-user', type=int, default=20, help='Average cats per user; --skew decides how they are shared out (default: 20)')
+        parser.add_argument('--feedings-per-cat', type=int, default=30)
+        parser.add_argument('--toys', type=int, default=500)
+        parser.add_argument('--toys-per-cat', type=int, default=3)
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=0.0,
+            help='How unevenly cats are shared between users: 0 is even, 1 is Zipf-like, higher gives the first few users nearly all of them (default: 0)',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='How many cats to write per batch (default: 1000)')
+        parser.add_argument('--username-prefix', default='seed-user', help='Seeded users are named <prefix>-0, <prefix>-1, ... (default: seed-user)')
+
+    def handle(self, *args, **options):
+        for name in ('users', 'cats_per_user', 'feedings_per_cat', 'toys', 'toys_per_cat'):
+            if options[name] < 0:
+                raise CommandError(f"--{name.replace('_', '-')} cannot be negative")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['skew'] < 0:
+            raise CommandError('--skew cannot be negative')
+        prefix = options['username_prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f'Users named {prefix}-... already exist; pass a different --username-prefix')
+
+        started = time.perf_counter()
+
+        def progress(totals):
+            self.stdout.write(f"  {totals['cats']} cats, {totals['feedings']} feedings written...")
+
+        # One transaction for the whole run: it is faster than committing every batch, and a failed run leaves nothing half seeded behind.
+        with transaction.atomic():
+            totals = seed_catcollector(
+                users=options['users'],
+                cats_per_user=options['cats_per_user'],
+                feedings_per_cat=options['feedings_per_cat'],
+                toys=options['toys'],
+                toys_per_cat=options['toys_per_cat'],
+                skew=options['skew'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                username_prefix=prefix,
+                progress=progress,
+            )
+        # bulk_create sends no signals. The new users' pages were never cached, but the new toys show up under "Available Toys" on every cat page.
+        bump(TOYS_SCOPE)
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        rows = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {totals['users']} users, {totals['cats']} cats, {totals['feedings']} feedings, "
+            f"{totals['toys']} toys and {totals['cat_toys']} cat-toy links in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/sec). "
+            f"Log in as {prefix}-0 with the password {SEED_PASSWORD!r}."
+        ))
@@ -0,0 +1,25 @@
+from pathlib import Path
+from urllib.request import urlopen
+from django.core.management.base import BaseCommand, CommandError
+from main_app.vendor import VENDOR_ASSETS, VENDOR_DIRECTORY
+
+# Run with: python manage.py vendor_assets
+# Downloads the third-party static files listed in main_app/vendor.py into main_app/static/vendor/. Commit the downloaded files.
+class Command(BaseCommand):
+    help = 'Download the third-party static files the pages use (see main_app/vendor.py) into main_app/static'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default=str(VENDOR_DIRECTORY), help='Static folder to write into (default: main_app/static)')
+
+    def handle(self, *args, **options):
+        for path, url in VENDOR_ASSETS.items():
+            try:
+                with urlopen(url, timeout=30) as response:
+                    content = response.read()
+            except OSError as error:
+                raise CommandError(f'Could not download {url}: {error}')
+            target = Path(options['directory']) / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(content)
+            self.stdout.write(f'{path}: {len(content)} bytes from {url}')
+        self.stdout.write(self.style.SUCCESS(f'Vendored {len(VENDOR_ASSETS)} files. Commit them, then run collectstatic.'))
@@ -0,0 +1,177 @@
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from django.conf import settings
+
+# In-process request metrics collected by RequestMetricsMiddleware (see middleware.py).
+# For every view (by URL name) we keep a request count, totals and maxima, and histograms of wall time and DB query count.
+# Each server process keeps its own numbers in memory and writes a snapshot to REQUEST_METRICS_DIR/<pid>.json every REQUEST_METRICS_FLUSH_SECONDS,
+# so the dump_request_metrics command (a separate process) can read and merge them.
+# A process that is shutting down writes whatever it has counted since its last snapshot too, so the last requests before traffic stops are not lost
+# (on a normal exit, e.g. a gunicorn worker stopped with SIGTERM; a process that is killed outright loses up to REQUEST_METRICS_FLUSH_SECONDS).
+# `dump_request_metrics --reset` cannot reach into the running processes' memory, so it writes a new reset epoch (a random id) to REQUEST_METRICS_DIR/reset-epoch.
+# Each process checks it before writing its next snapshot and starts counting from zero when it has changed,
+# and snapshots written under an older epoch are ignored when merging, so old totals never come back.
+RESET_EPOCH_FILE = 'reset-epoch'
+
+# Upper bounds of the histogram buckets; anything above the last bound lands in a final "+inf" bucket
+DURATION_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+QUERY_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100]
+
+def _bucket_index(bounds, value):
+    for index, bound in enumerate(bounds):
+        if value <= bound:
+            return index
+    return len(bounds)
+
+def empty_view_stats():
+    return {
+        'requests': 0,
+        'total_ms': 0.0,
+        'max_ms': 0.0,
+        'queries': 0,
+        'max_queries': 0,
+        'sql_ms': 0.0,
+        'duration_histogram': [0] * (len(DURATION_BUCKETS_MS) + 1),
+        'query_histogram': [0] * (len(QUERY_BUCKETS) + 1),
+    }
+
+def merge_view_stats(into, other):
+    into['requests'] += other['requests']
+    into['total_ms'] += other['total_ms']
+    into['max_ms'] = max(into['max_ms'], other['max_ms'])
+    into['queries'] += other['queries']
+    into['max_queries'] = max(into['max_queries'], other['max_queries'])
+    into['sql_ms'] += other['sql_ms']
+    for name in ('duration_histogram', 'query_histogram'):
+        into[name] = [a + b for a, b in zip(into[name], other[name])]
+    return into
+
+class MetricsRegistry:
+    def __init__(self):
+        # Several threads can finish requests at the same time, so every update happens under this lock
+        self._lock = threading.Lock()
+        self._views = {}
+        self._last_flush = time.monotonic()
+        # The reset epoch the numbers in _views were counted under; read when the first request is recorded
+        self._epoch = None
+        # Whether requests were recorded since the last snapshot was written
+        self._pending = False
+
+    def record(self, view_name, duration_ms, queries, sql_ms):
+        with self._lock:
+            if self._epoch is None:
+                self._epoch = read_epoch()
+            stats = self._views.setdefault(view_name, empty_view_stats())
+            stats['requests'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['queries'] += queries
+            stats['max_queries'] = max(stats['max_queries'], queries)
+            stats['sql_ms'] += sql_ms
+            stats['duration_histogram'][_bucket_index(DURATION_BUCKETS_MS, duration_ms)] += 1
+            stats['query_histogram'][_bucket_index(QUERY_BUCKETS, queries)] += 1
+            self._pending = True
+            due = time.monotonic() - self._last_flush >= settings.REQUEST_METRICS_FLUSH_SECONDS
+            if due:
+                self._last_flush = time.monotonic()
+        if due:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._views))
+
+    def flush(self):
+        epoch = read_epoch()
+        with self._lock:
+            if epoch != self._epoch:
+                # The metrics were reset since this process last wrote them (or it has recorded nothing yet): drop what it counted before
+                # (including any requests since the reset; a few lost requests are better than old totals coming back)
+                self._views = {}
+                self._epoch = epoch
+            snapshot = json.loads(json.dumps(self._views))
+            self._pending = False
+        write_snapshot(snapshot, epoch)
+
+    # Write a snapshot if anything was recorded since the last one; called when the process exits
+    def flush_pending(self):
+        if self._pending:
+            self.flush()
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+            self._epoch = None
+            self._pending = False
+
+# The registry for this process
+registry = MetricsRegistry()
+atexit.register(registry.flush_pending)
+
+def metrics_dir():
+    return Path(settings.REQUEST_METRICS_DIR)
+
+def read_epoch():
+    try:
+        return (metrics_dir() / RESET_EPOCH_FILE).read_text().strip()
+    except OSError:
+        # Never reset
+        return ''
+
+def write_snapshot(views, epoch):
+    directory = metrics_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{os.getpid()}.json'
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(json.dumps({'pid': os.getpid(), 'written_at': time.time(), 'epoch': epoch, 'views': views}))
+    # Replace the old snapshot in one step so a reader never sees a half-written file
+    os.replace(temporary, path)
+
+# Merge the snapshots of every process into one {view name: stats} dict
+def load_snapshots():
+    merged = {}
+    directory = metrics_dir()
+    if not directory.exists():
+        return merged
+    epoch = read_epoch()
+    for path in sorted(directory.glob('*.json')):
+        try:
+            snapshot = json.loads(path.read_text())
+            views = snapshot['views']
+        except (OSError, ValueError, KeyError):
+            continue
+        # Written before the last reset by a process that had not noticed it yet
+        if snapshot.get('epoch', '') != epoch:
+            continue
+        for view_name, stats in views.items():
+            merge_view_stats(merged.setdefault(view_name, empty_view_stats()), stats)
+    return merged
+
+# Reset the metrics of every process: start a new epoch, then delete the snapshots of the old one
+def clear_snapshots():
+    directory = metrics_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / RESET_EPOCH_FILE
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(uuid.uuid4().hex)
+    os.replace(temporary, path)
+    for path in directory.glob('*.json'):
+        path.unlink(missing_ok=True)
+
+# Estimate a percentile from a histogram: the upper bound of the bucket the percentile falls in
+def histogram_percentile(bounds, histogram, percentile):
+    total = sum(histogram)
+    if not total:
+        return None
+    threshold = total * percentile / 100
+    running = 0
+    for index, count in enumerate(histogram):
+        running += count
+        if running >= threshold:
+            return bounds[index] if index < len(bounds) else float('inf')
+    return float('inf')
@@ -0,0 +1,93 @@
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from .metrics import registry
+
+# Counts the SQL queries run while a request is handled and how long they took.
+# Django calls an execute wrapper around every query sent on a connection (https://docs.djangoproject.com/en/5.2/topics/db/instrumentation/).
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+# Records the wall time, number of queries and total SQL time of every request,
+# sends them back in a Server-Timing header (visible in the browser dev tools' network tab)
+# and adds them to the per-view histograms in metrics.py, which `python manage.py dump_request_metrics` prints.
+# List it first in MIDDLEWARE so the time spent in the other middleware is included.
+class RequestMetricsMiddleware:
+    # Works under both WSGI and ASGI. A sync-only middleware would make Django run async views (see ASYNC_READ_VIEWS) in a thread, which throws away the point of them.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            self.wrap_connections(stack, stats)
+            response = self.get_response(request)
+        return self.record(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        # Django's connections belong to a thread, and the async ORM does not run its queries on the event loop's thread:
+        # it runs them through sync_to_async(thread_sensitive=True), in the thread Django keeps for this request.
+        # So the wrappers are put on (and later taken off) that thread's connections, with the same kind of call.
+        stack = ExitStack()
+        await sync_to_async(self.wrap_connections, thread_sensitive=True)(stack, stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close, thread_sensitive=True)()
+        return self.record(request, response, stats, started)
+
+    def wrap_connections(self, stack, stats):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+
+    def record(self, request, response, stats, started):
+        duration_ms = (time.perf_counter() - started) * 1000
+        sql_ms = stats.duration * 1000
+
+        # resolver_match is only set once URL routing has found a view; 404s for unknown URLs have none.
+        # Note that a streaming response's queries run after this point and are not counted.
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name or match._func_path) if match else '<unresolved>'
+        response['Server-Timing'] = (
+            f'app;dur={duration_ms:.1f}, '
+            f'db;dur={sql_ms:.1f};desc="{stats.count} queries"'
+        )
+        registry.record(view_name, duration_ms, stats.count, sql_ms)
+        return response
+
+# Content types worth compressing. Images (other than SVG), video, fonts and zip files are compressed already, and gzipping them again only costs CPU.
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+# GZipMiddleware compresses every response of 200 bytes or more the browser accepts gzip for. This version leaves alone:
+# - responses whose content is compressed already (see COMPRESSIBLE_TYPES)
+# - partial responses (206 and Range answers): Content-Range counts bytes of the file, so the bytes sent must not change
+# Like GZipMiddleware it adds up to 100 random bytes to each compressed response, which defeats the BREACH attack on the CSRF token in the pages.
+# Hashed static files arrive with their .gz/.br copy and a Content-Encoding already (see catcollector/static_serving.py), so they are never compressed twice.
+class CompressionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if response.status_code == 206 or response.has_header('Content-Range') or not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        return super().process_response(request, response)
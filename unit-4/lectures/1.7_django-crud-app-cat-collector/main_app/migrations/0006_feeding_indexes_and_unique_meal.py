@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+# Existing databases may already hold the same meal twice for a cat on one day.
+# Keep the oldest row of each duplicate group so the unique constraint below can be created.
+def remove_duplicate_meals(apps, schema_editor):
+    Feeding = apps.get_model('main_app', 'Feeding')
+    duplicates = (
+        Feeding.objects.values('cat', 'date', 'meal')
+        .annotate(keep_id=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    for group in duplicates.iterator():
+        Feeding.objects.filter(
+            cat=group['cat'], date=group['date'], meal=group['meal']
+        ).exclude(id=group['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0005_cat_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feeding',
+            index=models.Index(fields=['cat', '-date'], name='feeding_cat_date_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_meals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='feeding',
+            constraint=models.UniqueConstraint(fields=('cat', 'date', 'meal'), name='unique_feeding_cat_date_meal'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:42
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+# Fill in the new counters for cats that already have feedings.
+def populate_feeding_counters(apps, schema_editor):
+    Cat = apps.get_model('main_app', 'Cat')
+    Feeding = apps.get_model('main_app', 'Feeding')
+    latest_date = Feeding.objects.filter(cat=OuterRef('pk')).order_by('-date').values('date')[:1]
+    meals_on_latest_date = (
+        Feeding.objects.filter(cat=OuterRef('pk'), date=OuterRef('last_fed_date'))
+        .values('cat')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Cat.objects.update(last_fed_date=Subquery(latest_date))
+    Cat.objects.update(meals_today=Coalesce(Subquery(meals_on_latest_date), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0006_feeding_indexes_and_unique_meal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cat',
+            name='last_fed_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='cat',
+            name='meals_today',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_feeding_counters, migrations.RunPython.noop),
+    ]
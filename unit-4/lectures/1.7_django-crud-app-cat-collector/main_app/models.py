@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Now
 from django.urls import reverse
 from datetime import date
 # Import the User
 from django.contrib.auth.models import User
+# Import the page cache helpers so bulk writes can invalidate cached pages
+from . import cache
 
 # A tuple of 2-tuples added above our models because it could be used in the Cat model as well as in the Feeding model.
 MEALS = (
@@ -15,6 +19,8 @@ MEALS = (
 class Toy(models.Model):
     name = models.CharField(max_length=50)
     color = models.CharField(max_length=20)
+    # When the toy was last changed, which the toy list's ETag is made from (see conditional.py)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -22,6 +28,91 @@ class Toy(models.Model):
     def get_absolute_url(self):
         return reverse('toy-detail', kwargs={'pk': self.id})
 
+# A custom QuerySet lets us add reusable, chainable queries to Cat.objects
+class CatQuerySet(models.QuerySet):
+    # Return the user's cats ready to show their hunger status.
+    # ? return self.filter(user=user).annotate(meals_fed_today=Count('feeding', filter=Q(feeding__date=date.today())))
+    # Every cat row now carries its own last_fed_date/meals_today counters, so the status comes along with the cats for free - no JOIN or GROUP BY over the feedings table.
+    def with_feeding_status(self, user):
+        return self.filter(user=user)
+
+    # Bump the feeding counters of the cats in this queryset for a new feeding on feeding_date.
+    # This is a single UPDATE using F() expressions, so the database does the arithmetic atomically and two feedings saved at the same time cannot overwrite each other's count.
+    # A feeding for the counted day adds one meal, a feeding for a later day starts a new count, and a back-dated feeding leaves the counters alone.
+    def record_feeding(self, feeding_date):
+        return self.filter(
+            Q(last_fed_date__isnull=True) | Q(last_fed_date__lte=feeding_date)
+        ).update(
+            meals_today=Case(
+                When(last_fed_date=feeding_date, then=F('meals_today') + 1),
+                default=Value(1),
+            ),
+            last_fed_date=feeding_date,
+            # update() skips auto_now, so set it here: the cat list shows whether the cat was fed
+            updated_at=Now(),
+        )
+
+    # Give every cat in this queryset each of the toys, with one INSERT into the ManyToMany "through" table (main_app_cat_toys).
+    # Pairs that already exist are skipped by the table's unique (cat, toy) constraint instead of being looked up first.
+    # Bulk writes on the through table do not send m2m_changed, so the cached pages of these cats are invalidated here.
+    def add_toys(self, toy_ids):
+        CatToy = Cat.toys.through
+        cat_ids = list(self.values_list('id', flat=True))
+        created = CatToy.objects.bulk_create(
+            [CatToy(cat_id=cat_id, toy_id=toy_id) for cat_id in cat_ids for toy_id in toy_ids],
+            ignore_conflicts=True,
+        )
+        cache.bump(*[cache.cat_scope(cat_id) for cat_id in cat_ids])
+        return created
+
+    # Take the toys away from every cat in this queryset with one DELETE on the through table.
+    def remove_toys(self, toy_ids):
+        cat_ids = list(self.values_list('id', flat=True))
+        deleted = Cat.toys.through.objects.filter(cat_id__in=cat_ids, toy_id__in=toy_ids).delete()
+        cache.bump(*[cache.cat_scope(cat_id) for cat_id in cat_ids])
+        return deleted
+
+    # Recompute the feeding counters of the cats in this queryset from the feedings table.
+    # Used by Feeding.save() when a feeding is moved to another day or cat, and by the reconcile_feeding_counters command to repair counters after bulk imports.
+    def reconcile_feeding_counters(self):
+        latest_date = Feeding.objects.filter(cat=OuterRef('pk')).order_by('-date').values('date')[:1]
+        meals_on_latest_date = (
+            Feeding.objects.filter(cat=OuterRef('pk'), date=OuterRef('last_fed_date'))
+            .values('cat')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        with transaction.atomic():
+            self.update(last_fed_date=Subquery(latest_date))
+            return self.update(meals_today=Coalesce(Subquery(meals_on_latest_date), 0), updated_at=Now())
+
+    # Cats whose stored counters disagree with the feedings table.
+    def with_stale_feeding_counters(self):
+        latest_date = Feeding.objects.filter(cat=OuterRef('pk')).order_by('-date').values('date')[:1]
+        meals_on_latest_date = (
+            Feeding.objects.filter(cat=OuterRef('pk'), date=OuterRef('expected_last_fed_date'))
+            .values('cat')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return self.annotate(
+            expected_last_fed_date=Subquery(latest_date),
+        ).annotate(
+            expected_meals=Coalesce(Subquery(meals_on_latest_date), 0),
+        ).annotate(
+            # Written as a positive match so that NULL dates (cats never fed) compare as equal.
+            counters_in_sync=Case(
+                When(
+                    Q(last_fed_date=F('expected_last_fed_date'))
+                    | Q(last_fed_date__isnull=True, expected_last_fed_date__isnull=True),
+                    meals_today=F('expected_meals'),
+                    then=Value(True),
+                ),
+                default=Value(False),
+                output_field=models.BooleanField(),
+            ),
+        ).filter(counters_in_sync=False)
+
 class Cat(models.Model):
     name = models.CharField(max_length=100)
     breed = models.CharField(max_length=100)
@@ -31,6 +122,15 @@ class Cat(models.Model):
     toys = models.ManyToManyField(Toy)
     # Add the foreign key linking to a user instance
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Denormalized feeding counters: the most recent day this cat was fed and how many meals it had on that day.
+    # They are kept up to date when a Feeding is saved or deleted so that fed_for_today is a field read instead of a COUNT query.
+    last_fed_date = models.DateField(null=True, blank=True, editable=False)
+    meals_today = models.PositiveSmallIntegerField(default=0, editable=False)
+    # When the cat or its feeding counters last changed, which the cat list's ETag is made from (see conditional.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Use the custom QuerySet as the manager so Cat.objects.with_feeding_status(user) is available
+    objects = CatQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -42,7 +142,9 @@ class Cat(models.Model):
 
     # add this new method
     def fed_for_today(self):
-        return self.feeding_set.filter(date=date.today()).count() >= len(MEALS)
+        # ? return self.feeding_set.filter(date=date.today()).count() >= len(MEALS)
+        # Read the counters stored on the cat instead of counting feedings. If the last feeding was on an earlier day, the cat has not eaten today.
+        return self.last_fed_date == date.today() and self.meals_today >= len(MEALS)
 
 class Feeding(models.Model):
     # The first optional positional argument overrides the label
@@ -62,6 +164,44 @@ class Feeding(models.Model):
         # Nice method for obtaining the friendly value of a Field.choice
         return f"{self.get_meal_display()} on {self.date}"
 
+    # Remember the cat and date the feeding was loaded with, so save() can tell when an edit (e.g. in the admin) moves it to another day or cat
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_cat_date = (instance.__dict__.get('cat_id'), instance.__dict__.get('date'))
+        return instance
+
+    # Keep the cat's feeding counters in step with new and edited feedings.
+    # Both writes share one transaction, so a feeding is never saved without its counter update (or the other way around).
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        saved = getattr(self, '_saved_cat_date', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                Cat.objects.filter(id=self.cat_id).record_feeding(self.date)
+            elif saved != (self.cat_id, self.date):
+                # An edited date can change which day is counted and how many meals it had, so recount from the feedings table.
+                # Changing only the meal leaves the counts as they are. A feeding saved without being loaded first (saved is None) is recounted to be safe.
+                cat_ids = {self.cat_id, saved[0]} if saved else {self.cat_id}
+                Cat.objects.filter(id__in=cat_ids).reconcile_feeding_counters()
+                # The post_save signal only invalidates the cat the feeding belongs to now, not the one it was moved from
+                cache.invalidate_cats(cat_ids - {self.cat_id})
+        self._saved_cat_date = (self.cat_id, self.date)
+
+    # Deleted feedings are taken off the counters by the post_delete receiver in signals.py rather than by a delete() override here:
+    # queryset deletes (including the admin's "delete selected" action) never call delete() on each feeding, but they do send post_delete for every row.
+
     # Define the default order of feedings
     class Meta:
-        ordering = ['-date']  # This line makes the newest feedings appear first
\ No newline at end of file
+        ordering = ['-date']  # This line makes the newest feedings appear first
+        indexes = [
+            # fed_for_today looks up one cat's feedings for one date, and every feeding list is sorted newest first.
+            # A composite (cat, date DESC) index serves both without a sort step.
+            models.Index(fields=['cat', '-date'], name='feeding_cat_date_idx'),
+        ]
+        constraints = [
+            # A cat can only have each meal once per day, so the database rejects duplicate meals.
+            # This index also covers (cat, date) lookups, letting the daily COUNT be answered from the index alone.
+            models.UniqueConstraint(fields=['cat', 'date', 'meal'], name='unique_feeding_cat_date_meal'),
+        ]
@@ -0,0 +1,89 @@
+# Keyset (a.k.a. cursor) pagination on the primary key.
+# OFFSET pagination makes the database read and throw away every row before the requested page, so deep pages get slower as the table grows.
+# Keyset pagination asks for "WHERE id > <last id on the previous page> ORDER BY id LIMIT n" instead, which jumps straight to the page through the primary key index, so every page costs the same no matter how many rows there are.
+
+# How many rows a page shows when the request does not ask for a size
+DEFAULT_PAGE_SIZE = 24
+# The largest page a client may ask for with ?page_size=
+MAX_PAGE_SIZE = 100
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, page_size, request):
+        self.items = items
+        # The id to pass as ?after= to get the next page, or None on the last page
+        self.next_cursor = next_cursor
+        self.page_size = page_size
+        self.request = request
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    # True when this is not the first page, so templates can offer a link back to the start
+    @property
+    def has_previous(self):
+        return get_cursor(self.request) is not None
+
+    # Build the link to the next page, keeping any other query string parameters (such as page_size)
+    @property
+    def next_url(self):
+        if not self.has_next:
+            return None
+        query = self.request.GET.copy()
+        query['after'] = self.next_cursor
+        return f'?{query.urlencode()}'
+
+    @property
+    def first_url(self):
+        query = self.request.GET.copy()
+        query.pop('after', None)
+        return f'?{query.urlencode()}' if query else '?'
+
+def _parse_positive_int(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+# The id from ?after=, or None for the first page
+def get_cursor(request):
+    return _parse_positive_int(request.GET.get('after'))
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    page_size = _parse_positive_int(request.GET.get('page_size')) or default
+    return min(page_size, maximum)
+
+def paginate_by_id(queryset, request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    page_size = get_page_size(request, default, maximum)
+    queryset = queryset.order_by('id')
+    after = get_cursor(request)
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    # Ask for one extra row: if it comes back there is another page, and we avoid a separate COUNT query.
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = items[-1].id
+    return KeysetPage(items, next_cursor, page_size, request)
+
+# The same as paginate_by_id for async views, reading the rows with async iteration
+async def apaginate_by_id(queryset, request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    page_size = get_page_size(request, default, maximum)
+    queryset = queryset.order_by('id')
+    after = get_cursor(request)
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    items = [item async for item in queryset[:page_size + 1]]
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = items[-1].id
+    return KeysetPage(items, next_cursor, page_size, request)
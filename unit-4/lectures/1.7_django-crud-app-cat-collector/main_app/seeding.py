@@ -0,0 +1,114 @@
+import itertools
+import random
+from datetime import date, timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from .models import Cat, Feeding, Toy, MEALS
+
+# Deterministic fake data for benchmarks, load tests and `python manage.py seed`.
+# Everything is drawn from a random.Random seeded with `seed`, so the same arguments always produce the same rows,
+# and everything is written with bulk_create in batches instead of one INSERT per row.
+# Cats are generated and written one batch at a time (with their feedings and cat-toy rows), so memory use stays flat even for millions of rows.
+
+BREEDS = ['tabby', 'tortoiseshell', 'bombay', 'selkirk rex', 'siamese', 'maine coon', 'sphynx', 'ragdoll']
+DESCRIPTIONS = ['Kinda rude.', 'Looks like a turtle.', 'Happy fluff ball.', 'Meows loudly.', 'Sleeps all day.']
+TOY_NAMES = ['mouse', 'string', 'fish', 'ball', 'feather', 'laser', 'box', 'scratching post']
+COLORS = ['red', 'blue', 'green', 'orange', 'purple', 'grey', 'yellow', 'pink']
+
+# Password shared by every seeded user, so benchmark clients can also log in for real
+SEED_PASSWORD = 'seeded-password'
+
+# Split `total` items between `buckets` owners following a Zipf-like curve: owner n gets a share proportional to 1 / (n + 1) ** skew.
+# skew=0 shares everything evenly; skew=1 is the classic Zipf curve (the first owner gets twice as many as the second and three times as many as the third); skew=2 or more hands nearly everything to the first few.
+# Leftovers from rounding go to the owners with the largest remainders, so the counts always add up to `total`.
+def skewed_counts(total, buckets, skew=0.0):
+    if buckets <= 0:
+        return []
+    weights = [1 / (rank + 1) ** skew for rank in range(buckets)]
+    scale = total / sum(weights)
+    shares = [weight * scale for weight in weights]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(range(buckets), key=lambda rank: (counts[rank] - shares[rank], rank))
+    for rank in by_remainder[:total - sum(counts)]:
+        counts[rank] += 1
+    return counts
+
+# Yield lists of up to `size` items from any iterable
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+def seed_users(count, username_prefix, batch_size):
+    # Hashing a password is deliberately slow, so hash it once and share the result
+    password = make_password(SEED_PASSWORD)
+    user_ids = []
+    for numbers in batched(range(count), batch_size):
+        users = User.objects.bulk_create([User(username=f'{username_prefix}-{n}', password=password) for n in numbers])
+        user_ids.extend(user.id for user in users)
+    return user_ids
+
+def seed_catcollector(users=10, cats_per_user=10, feedings_per_cat=30, toys=50, toys_per_cat=3, skew=0.0,
+                      seed=0, batch_size=1000, username_prefix='seed-user', progress=None):
+    rng = random.Random(seed)
+    user_ids = seed_users(users, username_prefix, batch_size)
+    toy_ids = []
+    for numbers in batched(range(toys), batch_size):
+        created = Toy.objects.bulk_create([Toy(name=rng.choice(TOY_NAMES), color=rng.choice(COLORS)) for _ in numbers])
+        toy_ids.extend(toy.id for toy in created)
+
+    today = date.today()
+    meal_codes = [code for code, _ in MEALS]
+    # Enough days of history to fit feedings_per_cat distinct (day, meal) slots
+    days = max(1, -(-feedings_per_cat // len(meal_codes)))
+    slots = range(days * len(meal_codes))
+    CatToy = Cat.toys.through
+
+    # users * cats_per_user cats in total, shared out between the users according to `skew`
+    cat_counts = skewed_counts(users * cats_per_user, len(user_ids), skew)
+    owners = itertools.chain.from_iterable(itertools.repeat(user_id, count) for user_id, count in zip(user_ids, cat_counts))
+    totals = {'users': len(user_ids), 'cats': 0, 'feedings': 0, 'toys': len(toy_ids), 'cat_toys': 0}
+    for batch in batched(owners, batch_size):
+        cats = []
+        feeding_plans = []
+        for user_id in batch:
+            # Pick distinct (day, meal) slots so the unique (cat, date, meal) constraint is never hit
+            plan = [
+                (today - timedelta(days=slot // len(meal_codes)), meal_codes[slot % len(meal_codes)])
+                for slot in rng.sample(slots, min(feedings_per_cat, len(slots)))
+            ]
+            # Fill in the denormalized feeding counters up front so no reconciliation pass is needed
+            last_fed_date = max((feeding_date for feeding_date, _ in plan), default=None)
+            cats.append(Cat(
+                name=f"Cat {totals['cats'] + len(cats)}",
+                breed=rng.choice(BREEDS),
+                description=rng.choice(DESCRIPTIONS),
+                age=rng.randint(0, 20),
+                user_id=user_id,
+                last_fed_date=last_fed_date,
+                meals_today=sum(1 for feeding_date, _ in plan if feeding_date == last_fed_date),
+            ))
+            feeding_plans.append(plan)
+        Cat.objects.bulk_create(cats)
+
+        feedings = [
+            Feeding(cat_id=cat.id, date=feeding_date, meal=meal)
+            for cat, plan in zip(cats, feeding_plans)
+            for feeding_date, meal in plan
+        ]
+        Feeding.objects.bulk_create(feedings, batch_size=batch_size)
+
+        # Write the many-to-many rows straight into the through table instead of calling cat.toys.add() once per cat
+        cat_toys = [
+            CatToy(cat_id=cat.id, toy_id=toy_id)
+            for cat in cats
+            for toy_id in rng.sample(toy_ids, min(toys_per_cat, len(toy_ids)))
+        ]
+        CatToy.objects.bulk_create(cat_toys, batch_size=batch_size)
+
+        totals['cats'] += len(cats)
+        totals['feedings'] += len(feedings)
+        totals['cat_toys'] += len(cat_toys)
+        if progress:
+            progress(totals)
+    return totals
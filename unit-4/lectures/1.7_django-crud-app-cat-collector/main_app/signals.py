@@ -0,0 +1,50 @@
+from django.db.models import F
+from django.db.models.functions import Now
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from . import cache
+from .models import Cat, Feeding, Toy
+
+# Signal receivers that invalidate the cached cat pages (see cache.py) whenever the data behind them changes, and keep the cats' feeding counters right when feedings are deleted.
+# They are connected when the app loads, in MainAppConfig.ready().
+
+@receiver([post_save, post_delete], sender=Cat)
+def cat_changed(sender, instance, **kwargs):
+    cache.bump(cache.cat_scope(instance.id), cache.user_scope(instance.user_id))
+
+@receiver(post_delete, sender=Feeding)
+def feeding_deleted(sender, instance, **kwargs):
+    # Take the feeding off its cat's counters (see Feeding.save() for the other side), for feeding.delete() and queryset deletes alike.
+    # Django runs a delete and its post_delete signals in one transaction, so the feeding is never gone without its counter update.
+    Cat.objects.filter(
+        id=instance.cat_id, last_fed_date=instance.date, meals_today__gt=0
+    ).update(meals_today=F('meals_today') - 1, updated_at=Now())
+
+@receiver([post_save, post_delete], sender=Feeding)
+def feeding_changed(sender, instance, **kwargs):
+    # The index shows each cat's fed status, so the owner's index pages are stale too.
+    # Use the cat already loaded on the feeding if there is one, otherwise look up just the owner's id.
+    if Feeding.cat.is_cached(instance):
+        user_id = instance.cat.user_id
+    else:
+        user_id = Cat.objects.filter(id=instance.cat_id).values_list('user_id', flat=True).first()
+    cache.bump(cache.cat_scope(instance.cat_id), cache.user_scope(user_id))
+
+@receiver([post_save, post_delete], sender=Toy)
+def toy_changed(sender, instance, **kwargs):
+    # Any toy can show up in any cat's "Available Toys" list
+    cache.bump(cache.TOYS_SCOPE)
+
+@receiver(m2m_changed, sender=Cat.toys.through)
+def cat_toys_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        # cat.toys.add(...) / remove(...) / clear(): instance is the cat
+        cache.bump(cache.cat_scope(instance.id))
+    elif pk_set:
+        # toy.cat_set.add(...) / remove(...): pk_set holds the cats
+        cache.bump(*[cache.cat_scope(cat_id) for cat_id in pk_set])
+    else:
+        # toy.cat_set.clear() does not say which cats lost the toy
+        cache.bump(cache.TOYS_SCOPE)
@@ -1,14 +1,17 @@
 const dateInput = document.getElementById('id_date'); // Select the date input by ID
 
-// Create a date picker instance
-const picker = MCDatepicker.create({
-  el: '#id_date',
-  dateFormat: 'yyyy-mm-dd', // Set the desired date format
-  closeOnBlur: true, // Close picker when clicking outside
-  selectedDate: new Date(), // Default to today's date
-});
+// Use the date picker when its vendored files are there (see main_app/vendor.py); otherwise the input stays the browser's own date picker
+if (window.MCDatepicker) {
+  // Create a date picker instance
+  const picker = MCDatepicker.create({
+    el: '#id_date',
+    dateFormat: 'yyyy-mm-dd', // Set the desired date format
+    closeOnBlur: true, // Close picker when clicking outside
+    selectedDate: new Date(), // Default to today's date
+  });
 
-// Open the date picker when the input is clicked
-dateInput.addEventListener('click', () => {
-  picker.open();
-});
+  // Open the date picker when the input is clicked
+  dateInput.addEventListener('click', () => {
+    picker.open();
+  });
+}
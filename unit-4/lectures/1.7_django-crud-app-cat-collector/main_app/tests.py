@@ -1,3 +1,974 @@
-from django.test import TestCase
+from datetime import date, timedelta
+import csv
+import gzip
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+from io import StringIO
+from pathlib import Path
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, re_path, reverse
+from catcollector.db_routers import ReadReplicaRouter
+from catcollector.static_serving import IMMUTABLE_CACHE_CONTROL, serve_static
+from catcollector.static_storage import minify
+from catcollector.template_cache import django_engines, template_names
+from . import cache, views
+from .management.commands.benchmark_connections import Command as BenchmarkConnectionsCommand
+from .metrics import load_snapshots, read_epoch, registry, write_snapshot
+from .middleware import CompressionMiddleware
+from .models import Cat, Feeding, Toy, MEALS
+from .seeding import SEED_PASSWORD, skewed_counts
+from .vendor import MC_DATEPICKER_VERSION, VENDOR_ASSETS, check_vendor_assets
 
 # Create your tests here.
+
+# Run a settings file again as a new module, with the given environment variables set
+def load_settings(name, **environ):
+    spec = importlib.util.find_spec(name)
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(os.environ, environ):
+        spec.loader.exec_module(module)
+    return module
+
+production_settings = load_settings('catcollector.production_settings', DJANGO_SECRET_KEY='not-the-real-key')
+
+# Keep request metrics snapshots written during the tests out of the project folder
+@override_settings(REQUEST_METRICS_DIR=Path(tempfile.mkdtemp()) / 'metrics')
+class CatCollectorTestCase(TestCase):
+    # Cached cat pages live in the local-memory cache for the whole test run, so every test starts with an empty cache.
+    def setUp(self):
+        super().setUp()
+        cache.get_cache().clear()
+
+class CatDetailQueryBudgetTests(CatCollectorTestCase):
+    # The detail page costs: the session, the logged in user, the cat (joined to its user), its feedings, its toys and the toys it does not have.
+    QUERY_BUDGET = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+        cls.cat = Cat.objects.create(name='Lolo', breed='tabby', description='Kinda rude.', age=3, user=cls.user)
+        toys = [Toy.objects.create(name=f'Toy {n}', color='red') for n in range(5)]
+        cls.cat.toys.add(*toys[:2])
+        for meal, _ in MEALS:
+            Feeding.objects.create(cat=cls.cat, date=date.today(), meal=meal)
+        for days_ago in range(1, 10):
+            Feeding.objects.create(cat=cls.cat, date=date.today() - timedelta(days=days_ago))
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_detail_page_stays_within_query_budget(self):
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get(reverse('cat-detail', kwargs={'cat_id': self.cat.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'has been fed all their meals for today!')
+        self.assertEqual(len(response.context['toys']), 3)
+
+    def test_query_budget_does_not_grow_with_feedings_or_toys(self):
+        for days_ago in range(10, 40):
+            Feeding.objects.create(cat=self.cat, date=date.today() - timedelta(days=days_ago))
+        self.cat.toys.add(*[Toy.objects.create(name=f'Extra {n}', color='blue') for n in range(10)])
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            self.client.get(reverse('cat-detail', kwargs={'cat_id': self.cat.id}))
+
+    def test_fed_for_today_follows_bulk_deletes(self):
+        cat = Cat.objects.get(id=self.cat.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(cat.fed_for_today())
+        Feeding.objects.filter(cat=self.cat, date=date.today(), meal='D').delete()
+        self.assertFalse(Cat.objects.get(id=self.cat.id).fed_for_today())
+
+class CatIndexFeedingStatusTests(CatCollectorTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+        other_user = User.objects.create_user(username='other', password='not-a-real-password')
+        cls.fed_cat = Cat.objects.create(name='Fancy', breed='bombay', description='Happy fluff ball.', age=4, user=cls.user)
+        for meal, _ in MEALS:
+            Feeding.objects.create(cat=cls.fed_cat, date=date.today(), meal=meal)
+        for n in range(20):
+            cat = Cat.objects.create(name=f'Hungry {n}', breed='selkirk rex', description='Meows loudly.', age=n, user=cls.user)
+            Feeding.objects.create(cat=cat, date=date.today())
+        Cat.objects.create(name='Not mine', breed='tabby', description='Someone else.', age=1, user=other_user)
+
+    def test_with_feeding_status_carries_todays_meals(self):
+        cats = {cat.name: cat for cat in Cat.objects.with_feeding_status(self.user)}
+        self.assertNotIn('Not mine', cats)
+        self.assertEqual(cats['Fancy'].meals_today, len(MEALS))
+        self.assertEqual(cats['Hungry 0'].meals_today, 1)
+        with self.assertNumQueries(0):
+            self.assertTrue(cats['Fancy'].fed_for_today())
+            self.assertFalse(cats['Hungry 0'].fed_for_today())
+
+    def test_index_shows_status_for_every_cat_in_one_query(self):
+        self.client.force_login(self.user)
+        # The session, the logged in user and the annotated cats.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('cat-index'))
+        self.assertContains(response, 'Fed for today', count=1)
+        self.assertContains(response, 'Might be hungry!', count=20)
+
+class KeysetPaginationTests(CatCollectorTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+        Toy.objects.bulk_create([Toy(name=f'Toy {n}', color='red') for n in range(25)])
+        Cat.objects.bulk_create([
+            Cat(name=f'Cat {n}', breed='tabby', description='Kinda rude.', age=n, user=cls.user)
+            for n in range(7)
+        ])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_toy_list_walks_every_toy_once_with_next_cursor(self):
+        seen = []
+        url = reverse('toy-index') + '?page_size=10'
+        while url:
+            response = self.client.get(url)
+            page = response.context['page']
+            seen.extend(toy.id for toy in response.context['toy_list'])
+            url = reverse('toy-index') + page.next_url if page.has_next else None
+        self.assertEqual(seen, list(Toy.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_page_size_is_clamped(self):
+        response = self.client.get(reverse('toy-index'), {'page_size': 100000})
+        self.assertEqual(response.context['page'].page_size, 100)
+        response = self.client.get(reverse('toy-index'), {'page_size': 'lots', 'after': 'nope'})
+        self.assertEqual(len(response.context['toy_list']), 24)
+
+    def test_deep_pages_cost_the_same_queries_as_the_first(self):
+        last_id = Toy.objects.order_by('-id').values_list('id', flat=True)[3]
+        # The first visit sets the CSRF cookie; from then on the list also works out its ETag (see conditional.py)
+        self.client.get(reverse('toy-index'))
+        with self.assertNumQueries(4):
+            self.client.get(reverse('toy-index'), {'page_size': 2})
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('toy-index'), {'page_size': 2, 'after': last_id})
+        self.assertTrue(response.context['page'].has_next)
+
+    def test_cat_index_is_paginated(self):
+        response = self.client.get(reverse('cat-index'), {'page_size': 5})
+        self.assertEqual(len(response.context['cats']), 5)
+        self.assertContains(response, 'Next page')
+        response = self.client.get(reverse('cat-index') + response.context['page'].next_url)
+        self.assertEqual(len(response.context['cats']), 2)
+        self.assertNotContains(response, 'Next page')
+
+class FeedingConstraintTests(CatCollectorTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+        cls.cat = Cat.objects.create(name='Sachi', breed='tortoiseshell', description='Looks like a turtle.', age=0, user=cls.user)
+
+    def test_duplicate_meal_is_rejected_by_the_database(self):
+        Feeding.objects.create(cat=self.cat, date=date.today(), meal='B')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Feeding.objects.create(cat=self.cat, date=date.today(), meal='B')
+
+    def test_add_feeding_ignores_a_duplicate_meal(self):
+        self.client.force_login(self.user)
+        url = reverse('add-feeding', kwargs={'cat_id': self.cat.id})
+        for _ in range(2):
+            response = self.client.post(url, {'date': date.today().isoformat(), 'meal': 'L'})
+            self.assertRedirects(response, reverse('cat-detail', kwargs={'cat_id': self.cat.id}))
+        self.assertEqual(self.cat.feeding_set.count(), 1)
+
+class FeedingCounterTests(CatCollectorTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+
+    def setUp(self):
+        super().setUp()
+        self.cat = Cat.objects.create(name='Bonk', breed='selkirk rex', description='Meows loudly.', age=6, user=self.user)
+
+    def refresh(self):
+        self.cat.refresh_from_db()
+        return self.cat.last_fed_date, self.cat.meals_today
+
+    def test_counters_follow_new_and_deleted_feedings(self):
+        yesterday = date.today() - timedelta(days=1)
+        Feeding.objects.create(cat=self.cat, date=yesterday, meal='B')
+        self.assertEqual(self.refresh(), (yesterday, 1))
+        Feeding.objects.create(cat=self.cat, date=date.today(), meal='B')
+        lunch = Feeding.objects.create(cat=self.cat, date=date.today(), meal='L')
+        self.assertEqual(self.refresh(), (date.today(), 2))
+        # A back-dated feeding does not touch today's count
+        Feeding.objects.create(cat=self.cat, date=yesterday, meal='L')
+        self.assertEqual(self.refresh(), (date.today(), 2))
+        lunch.delete()
+        self.assertEqual(self.refresh(), (date.today(), 1))
+
+    def test_counters_follow_edited_feedings(self):
+        yesterday = date.today() - timedelta(days=1)
+        breakfast = Feeding.objects.create(cat=self.cat, date=date.today(), meal='B')
+        Feeding.objects.create(cat=self.cat, date=date.today(), meal='L')
+        # Moving a feeding back a day takes it out of today's count
+        breakfast = Feeding.objects.get(id=breakfast.id)
+        breakfast.date = yesterday
+        breakfast.save()
+        self.assertEqual(self.refresh(), (date.today(), 1))
+        # Changing only the meal does not need a recount
+        breakfast.meal = 'D'
+        with CaptureQueriesContext(connection) as queries:
+            breakfast.save()
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "main_app_cat"')])
+        self.assertEqual(self.refresh(), (date.today(), 1))
+        # Moving a feeding to another cat updates both cats
+        other = Cat.objects.create(name='Lolo', breed='tabby', description='Kinda rude.', age=3, user=self.user)
+        breakfast.cat = other
+        breakfast.date = date.today()
+        breakfast.save()
+        other.refresh_from_db()
+        self.assertEqual((other.last_fed_date, other.meals_today), (date.today(), 1))
+        self.assertEqual(self.refresh(), (date.today(), 1))
+        Feeding.objects.filter(cat=self.cat).get().delete()
+        self.assertEqual(self.refresh(), (date.today(), 0))
+
+    def test_queryset_deletes_update_the_counters(self):
+        for meal, _ in MEALS:
+            Feeding.objects.create(cat=self.cat, date=date.today(), meal=meal)
+        Feeding.objects.filter(cat=self.cat, meal__in=['B', 'L']).delete()
+        self.assertEqual(self.refresh(), (date.today(), 1))
+        Feeding.objects.filter(cat=self.cat).delete()
+        self.assertEqual(self.refresh(), (date.today(), 0))
+        self.assertFalse(self.cat.fed_for_today())
+
+    def test_fed_for_today_is_a_field_read(self):
+        for meal, _ in MEALS:
+            Feeding.objects.create(cat=self.cat, date=date.today(), meal=meal)
+        cat = Cat.objects.get(id=self.cat.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(cat.fed_for_today())
+
+    def test_duplicate_meal_does_not_bump_the_counter(self):
+        self.client.force_login(self.user)
+        url = reverse('add-feeding', kwargs={'cat_id': self.cat.id})
+        for _ in range(2):
+            self.client.post(url, {'date': date.today().isoformat(), 'meal': 'D'})
+        self.assertEqual(self.refresh(), (date.today(), 1))
+
+    def test_reconcile_command_repairs_drifted_counters(self):
+        Feeding.objects.bulk_create([
+            Feeding(cat=self.cat, date=date.today(), meal=meal) for meal, _ in MEALS
+        ])
+        untouched = Cat.objects.create(name='Lolo', breed='tabby', description='Kinda rude.', age=3, user=self.user)
+        self.assertEqual(self.refresh(), (None, 0))
+        out = StringIO()
+        call_command('reconcile_feeding_counters', '--dry-run', stdout=out)
+        self.assertIn('1 would be repaired', out.getvalue())
+        self.assertEqual(self.refresh(), (None, 0))
+        call_command('reconcile_feeding_counters', stdout=out)
+        self.assertEqual(self.refresh(), (date.today(), 3))
+        untouched.refresh_from_db()
+        self.assertEqual((untouched.last_fed_date, untouched.meals_today), (None, 0))
+        out = StringIO()
+        call_command('reconcile_feeding_counters', stdout=out)
+        self.assertIn('0 repaired', out.getvalue())
+
+class ImportFeedingsCommandTests(CatCollectorTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+        cls.cat = Cat.objects.create(name='Lolo', breed='tabby', description='Kinda rude.', age=3, user=cls.user)
+
+    def import_file(self, suffix, contents, *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as source:
+            source.write(contents)
+        self.addCleanup(os.remove, source.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_feedings', source.name, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_validates_rows_and_updates_counters(self):
+        today = date.today().isoformat()
+        rows = [
+            'cat,date,meal',
+            f'{self.cat.id},{today},B',
+            f'{self.cat.id},{today},Lunch',
+            f'{self.cat.id},{today},D',
+            f'{self.cat.id},2026-01-01,B',
+            f'{self.cat.id},not-a-date,B',
+            f'{self.cat.id},{today},Brunch',
+            f'999999,{today},B',
+        ]
+        out, err = self.import_file('.csv', '\n'.join(rows), '--batch-size', '2')
+        self.assertEqual(self.cat.feeding_set.count(), 4)
+        self.assertIn('Imported 4 feedings', out)
+        self.assertIn('rows/sec', out)
+        self.assertIn('Line 6', err)
+        self.assertIn('Line 7', err)
+        self.assertIn('cat 999999 does not exist', err)
+        self.cat.refresh_from_db()
+        self.assertTrue(self.cat.fed_for_today())
+
+    def test_meals_are_matched_in_any_case(self):
+        rows = ['cat,date,meal', f'{self.cat.id},2026-01-01, b ', f'{self.cat.id},2026-01-01,LUNCH', f'{self.cat.id},2026-01-01,dinner']
+        out, err = self.import_file('.csv', '\n'.join(rows))
+        self.assertEqual(err, '')
+        self.assertEqual(sorted(self.cat.feeding_set.values_list('meal', flat=True)), ['B', 'D', 'L'])
+
+    def test_jsonl_import_skips_meals_already_recorded(self):
+        Feeding.objects.create(cat=self.cat, date=date(2026, 1, 1), meal='B')
+        lines = [
+            json.dumps({'cat': self.cat.id, 'date': '2026-01-01', 'meal': 'B'}),
+            json.dumps({'cat_id': self.cat.id, 'date': '2026-01-02', 'meal': 'D'}),
+            '[1, 2, 3]',
+        ]
+        out, err = self.import_file('.jsonl', '\n'.join(lines))
+        self.assertEqual(self.cat.feeding_set.count(), 2)
+        self.assertIn('expected a JSON object', err)
+        self.assertIn('Imported 1 feedings', out)
+        self.assertIn('skipped 1 meals already recorded and 1 invalid rows', out)
+        # Running the same file again imports nothing, and a meal repeated within the file is only counted once
+        out, err = self.import_file('.jsonl', '\n'.join(lines + lines[1:2]))
+        self.assertIn('Imported 0 feedings', out)
+        self.assertIn('skipped 3 meals already recorded', out)
+
+class SeedCommandTests(CatCollectorTestCase):
+    def seed(self, *args):
+        out = StringIO()
+        call_command('seed', '--toys', '10', '--feedings-per-cat', '5', '--batch-size', '7', *args, stdout=out)
+        return out.getvalue()
+
+    def test_skewed_counts_add_up(self):
+        self.assertEqual(skewed_counts(10, 5), [2, 2, 2, 2, 2])
+        counts = skewed_counts(1000, 10, skew=1.5)
+        self.assertEqual(sum(counts), 1000)
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertGreater(counts[0], counts[1] * 2)
+
+    def test_seed_writes_consistent_skewed_data(self):
+        out = self.seed('--users', '4', '--cats-per-user', '5', '--skew', '2')
+        self.assertIn('Seeded 4 users, 20 cats, 100 feedings, 10 toys and 60 cat-toy links', out)
+        cats_per_user = [
+            Cat.objects.filter(user__username=f'seed-user-{n}').count()
+            for n in range(4)
+        ]
+        self.assertEqual(sum(cats_per_user), 20)
+        self.assertGreater(cats_per_user[0], cats_per_user[3])
+        # The counters were written with the cats, so nothing needs reconciling
+        self.assertFalse(Cat.objects.with_stale_feeding_counters().exists())
+        self.assertTrue(self.client.login(username='seed-user-0', password=SEED_PASSWORD))
+
+    def test_same_seed_gives_the_same_data(self):
+        self.seed('--users', '2', '--cats-per-user', '3', '--username-prefix', 'first')
+        self.seed('--users', '2', '--cats-per-user', '3', '--username-prefix', 'second')
+        first = list(Cat.objects.filter(user__username__startswith='first-').order_by('id').values_list('breed', 'age', 'last_fed_date'))
+        second = list(Cat.objects.filter(user__username__startswith='second-').order_by('id').values_list('breed', 'age', 'last_fed_date'))
+        self.assertEqual(first, second)
+
+    def test_existing_prefix_is_refused(self):
+        self.seed('--users', '1', '--cats-per-user', '1')
+        with self.assertRaises(CommandError):
+            self.seed('--users', '1', '--cats-per-user', '1')
+
+class ExportTests(CatCollectorTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+        other_user = User.objects.create_user(username='other', password='not-a-real-password')
+        cls.cat = Cat.objects.create(name='Lolo', breed='tabby', description='Kinda, rude.', age=3, user=cls.user)
+        Cat.objects.create(name='Not mine', breed='tabby', description='Someone else.', age=1, user=other_user)
+        Feeding.objects.create(cat=cls.cat, date=date(2026, 1, 1), meal='B')
+        cls.cat.toys.add(Toy.objects.create(name='Mouse', color='grey'))
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_csv_export_streams_the_users_records(self):
+        response = self.client.get(reverse('export'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row['record'] for row in rows], ['cat', 'feeding', 'toy'])
+        self.assertEqual(rows[0]['description'], 'Kinda, rude.')
+        self.assertEqual(rows[1]['feeding_date'], '2026-01-01')
+        self.assertEqual(rows[2]['toy_name'], 'Mouse')
+
+    def test_jsonl_export(self):
+        response = self.client.get(reverse('export'), {'format': 'jsonl'})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]['cat_name'], 'Lolo')
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(reverse('export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+class BulkToyTests(CatCollectorTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+        other_user = User.objects.create_user(username='other', password='not-a-real-password')
+        cls.cats = [
+            Cat.objects.create(name=f'Cat {n}', breed='tabby', description='Kinda rude.', age=n, user=cls.user)
+            for n in range(3)
+        ]
+        cls.other_cat = Cat.objects.create(name='Not mine', breed='tabby', description='Someone else.', age=1, user=other_user)
+        cls.toys = [Toy.objects.create(name=f'Toy {n}', color='red') for n in range(6)]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def post(self, data):
+        return self.client.post(reverse('bulk-update-toys'), data)
+
+    def test_adds_and_removes_for_many_cats_in_constant_queries(self):
+        self.cats[0].toys.add(self.toys[5])
+        data = {
+            'cat': [cat.id for cat in self.cats] + [self.other_cat.id],
+            'add': [toy.id for toy in self.toys[:4]] + [999999],
+            'remove': [self.toys[5].id],
+        }
+        # session, user, toy id check, then savepoint, cat ids + DELETE, cat ids + INSERT, release savepoint
+        with self.assertNumQueries(9):
+            response = self.post(data)
+        self.assertRedirects(response, reverse('cat-index'), fetch_redirect_response=False)
+        for cat in self.cats:
+            self.assertEqual(set(cat.toys.all()), set(self.toys[:4]))
+        self.assertFalse(self.other_cat.toys.exists())
+
+    def test_adding_existing_pairs_is_harmless(self):
+        self.cats[0].toys.add(self.toys[0])
+        response = self.post({'cat': self.cats[0].id, 'add': [self.toys[0].id, self.toys[1].id]})
+        self.assertRedirects(response, reverse('cat-detail', kwargs={'cat_id': self.cats[0].id}), fetch_redirect_response=False)
+        self.assertEqual(self.cats[0].toys.count(), 2)
+
+    def test_a_toys_own_button_ignores_the_ticked_boxes(self):
+        self.cats[0].toys.add(*self.toys[:3])
+        # Toys 0 and 1 are ticked, but the button of toy 2 was pressed
+        self.post({'cat': self.cats[0].id, 'remove': [self.toys[0].id, self.toys[1].id], 'remove_one': self.toys[2].id})
+        self.assertEqual(set(self.cats[0].toys.all()), set(self.toys[:2]))
+        self.post({'cat': self.cats[0].id, 'add': [self.toys[3].id], 'add_one': self.toys[4].id})
+        self.assertEqual(set(self.cats[0].toys.all()), {*self.toys[:2], self.toys[4]})
+
+    def test_someone_elses_cat_redirects_to_the_index(self):
+        for cat_id in [self.other_cat.id, 999999]:
+            response = self.post({'cat': cat_id, 'add': [self.toys[0].id]})
+            self.assertRedirects(response, reverse('cat-index'), fetch_redirect_response=False)
+        self.assertFalse(self.other_cat.toys.exists())
+
+    def test_get_is_not_allowed(self):
+        self.assertEqual(self.client.get(reverse('bulk-update-toys')).status_code, 405)
+
+class CatPageCacheTests(CatCollectorTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+        cls.cat = Cat.objects.create(name='Lolo', breed='tabby', description='Kinda rude.', age=3, user=cls.user)
+        cls.toy = Toy.objects.create(name='Mouse', color='grey')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.detail_url = reverse('cat-detail', kwargs={'cat_id': self.cat.id})
+
+    def test_repeat_visits_skip_the_database(self):
+        self.client.get(self.detail_url)
+        self.client.get(reverse('cat-index'))
+        # Only the session and the logged in user are loaded
+        with self.assertNumQueries(2):
+            response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Lolo')
+        # The index still checks whether the user's cats changed, for its ETag
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('cat-index'))
+        self.assertContains(response, 'Lolo')
+
+    def test_feeding_invalidates_detail_and_index(self):
+        self.client.get(self.detail_url)
+        self.client.get(reverse('cat-index'))
+        for meal, _ in MEALS:
+            self.client.post(reverse('add-feeding', kwargs={'cat_id': self.cat.id}), {'date': date.today().isoformat(), 'meal': meal})
+        self.assertContains(self.client.get(self.detail_url), 'has been fed all their meals for today!')
+        self.assertContains(self.client.get(reverse('cat-index')), 'Fed for today')
+
+    def test_cat_edit_invalidates_pages(self):
+        self.client.get(reverse('cat-index'))
+        self.client.post(reverse('cat-update', kwargs={'pk': self.cat.id}), {'breed': 'calico', 'description': 'Kinda rude.', 'age': 3})
+        self.assertContains(self.client.get(reverse('cat-index')), 'calico')
+
+    def test_toy_changes_invalidate_detail(self):
+        self.client.get(self.detail_url)
+        self.toy.name = 'Laser'
+        self.toy.save()
+        self.assertContains(self.client.get(self.detail_url), 'Laser')
+        self.cat.toys.add(self.toy)
+        self.assertContains(self.client.get(self.detail_url), 'Remove Toy')
+        self.client.post(reverse('bulk-update-toys'), {'cat': self.cat.id, 'remove_one': self.toy.id})
+        self.assertNotContains(self.client.get(self.detail_url), 'Remove Toy')
+
+    def test_cache_backend_comes_from_the_environment(self):
+        def backend(**environ):
+            return load_settings('catcollector.settings', **environ).CACHES['default']
+        with mock.patch.dict(os.environ):
+            os.environ.pop('CACHE_URL', None)
+            self.assertEqual(backend()['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        redis = backend(CACHE_URL='redis://cache:6379/1')
+        self.assertEqual((redis['BACKEND'], redis['LOCATION']), ('django.core.cache.backends.redis.RedisCache', 'redis://cache:6379/1'))
+        memcached = backend(CACHE_URL='memcached://cache:11211')
+        self.assertEqual((memcached['BACKEND'], memcached['LOCATION']), ('django.core.cache.backends.memcached.PyMemcacheCache', 'cache:11211'))
+
+class BenchmarkConnectionsCommandTests(CatCollectorTestCase):
+    # The test database lives in memory and Django never really closes those connections, so benchmark against a throwaway file instead
+    def test_only_new_connection_reconnects_every_request(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_dict = {**connection.settings_dict, 'NAME': os.path.join(directory, 'benchmark.sqlite3')}
+        command = BenchmarkConnectionsCommand()
+        setup = command.build_connection('setup', settings_dict)
+        setup.cursor().execute(*setup.SchemaEditorClass(setup).table_sql(Cat))
+        setup.close()
+        new_connection = command.run_strategy('new-connection', {**settings_dict, 'CONN_MAX_AGE': 0}, 5)
+        persistent = command.run_strategy('persistent', {**settings_dict, 'CONN_MAX_AGE': None}, 5)
+        self.assertEqual(new_connection['connects'], 5)
+        self.assertEqual(persistent['connects'], 1)
+        self.assertEqual(persistent['requests'], 5)
+
+    def test_async_servers_never_keep_connections(self):
+        environ = {'DB_POOL': '', 'DB_CONN_MAX_AGE': '60', 'DJANGO_ASGI': '', 'ASYNC_READ_VIEWS': ''}
+        self.assertEqual(load_settings('catcollector.settings', **environ).DATABASES['default']['CONN_MAX_AGE'], 60)
+        for variable in ['DJANGO_ASGI', 'ASYNC_READ_VIEWS']:
+            with self.subTest(variable):
+                settings_module = load_settings('catcollector.settings', **{**environ, variable: '1'})
+                self.assertEqual(settings_module.DATABASES['default']['CONN_MAX_AGE'], 0)
+
+# Pretend 'default' is also the read replica, so the routing decisions can be seen without a second database:
+# the router returns the replica alias ('default') for reads it sends to the replica and None for everything else.
+@override_settings(REPLICA_DATABASE_ALIAS='default')
+class ReadReplicaRoutingTests(CatCollectorTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+        cls.cat = Cat.objects.create(name='Lolo', breed='tabby', description='Kinda rude.', age=3, user=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    # Make the request and return {model label: set of databases the router chose for its reads}
+    def routed_reads(self, url):
+        decisions = {}
+        db_for_read = ReadReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            database = db_for_read(router, model, **hints)
+            decisions.setdefault(model._meta.label, set()).add(database)
+            return database
+
+        with mock.patch.object(ReadReplicaRouter, 'db_for_read', autospec=True, side_effect=record):
+            self.client.get(url)
+        return decisions
+
+    # Pretend these scopes were last invalidated long ago, so refilling their pages may read from the replica
+    def age_versions(self, *scopes):
+        cache.get_cache().set_many({cache._version_key(scope): 1 for scope in scopes}, timeout=None)
+
+    def test_read_views_use_the_replica_for_app_tables_only(self):
+        self.age_versions(cache.cat_scope(self.cat.id), cache.TOYS_SCOPE)
+        decisions = self.routed_reads(reverse('cat-detail', kwargs={'cat_id': self.cat.id}))
+        self.assertEqual(decisions['main_app.Cat'], {'default'})
+        self.assertEqual(decisions['main_app.Toy'], {'default'})
+        self.assertEqual(decisions['auth.User'], {None})
+        self.assertEqual(decisions['sessions.Session'], {None})
+
+    def test_other_views_use_the_primary(self):
+        decisions = self.routed_reads(reverse('cat-update', kwargs={'pk': self.cat.id}))
+        self.assertEqual(decisions['main_app.Cat'], {None})
+
+    def test_reads_stick_to_the_primary_after_a_change(self):
+        self.client.post(reverse('add-feeding', kwargs={'cat_id': self.cat.id}), {'date': date.today().isoformat(), 'meal': 'B'})
+        decisions = self.routed_reads(reverse('cat-index'))
+        self.assertEqual(decisions['main_app.Cat'], {None})
+        # Once REPLICA_STICKY_SECONDS have passed, reads go back to the replica
+        cache.get_cache().clear()
+        self.age_versions(cache.user_scope(self.user.id))
+        with mock.patch('catcollector.db_routers.time.time', return_value=time.time() + 60):
+            decisions = self.routed_reads(reverse('cat-index'))
+        self.assertEqual(decisions['main_app.Cat'], {'default'})
+
+    def test_pages_invalidated_moments_ago_are_refilled_from_the_primary(self):
+        detail_url = reverse('cat-detail', kwargs={'cat_id': self.cat.id})
+        self.age_versions(cache.cat_scope(self.cat.id), cache.TOYS_SCOPE)
+        # Someone else's change (this user's session is not pinned to the primary) invalidates the page
+        Toy.objects.create(name='Laser', color='red')
+        self.assertEqual(self.routed_reads(detail_url)['main_app.Cat'], {None})
+        # Once the replica has had time to catch up, refills read from it again
+        cache.get_cache().clear()
+        self.age_versions(cache.cat_scope(self.cat.id), cache.TOYS_SCOPE)
+        self.assertEqual(self.routed_reads(detail_url)['main_app.Cat'], {'default'})
+
+    def test_writes_always_go_to_the_primary(self):
+        self.assertEqual(ReadReplicaRouter().db_for_write(Cat, instance=self.cat), 'default')
+        self.assertIsNone(ReadReplicaRouter().db_for_write(User))
+
+# The site's URLs with the async cat views swapped in, as main_app/urls.py does when ASYNC_READ_VIEWS is on
+class AsyncReadUrls:
+    urlpatterns = [
+        path('cats/', views.cat_index_async, name='cat-index'),
+        path('cats/<int:cat_id>/', views.cat_detail_async, name='cat-detail'),
+        path('', include('catcollector.urls')),
+    ]
+
+@override_settings(ROOT_URLCONF=AsyncReadUrls)
+class AsyncReadViewTests(CatCollectorTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+        cls.cat = Cat.objects.create(name='Lolo', breed='tabby', description='Kinda rude.', age=3, user=cls.user)
+        cls.cat.toys.add(Toy.objects.create(name='Mouse', color='grey'))
+        Toy.objects.create(name='Laser', color='red')
+        for meal, _ in MEALS:
+            Feeding.objects.create(cat=cls.cat, date=date.today(), meal=meal)
+        Cat.objects.create(name='Not mine', breed='bombay', description='Someone else.', age=1,
+                           user=User.objects.create_user(username='other', password='not-a-real-password'))
+
+    # Run the async client's request from this (sync) test so assertNumQueries sees its queries:
+    # the async ORM sends them back to this thread, on the test's own connection.
+    def get(self, url):
+        return async_to_sync(self.async_client.get)(url)
+
+    def test_index_lists_only_the_users_cats(self):
+        self.async_client.force_login(self.user)
+        # The same queries as the sync view: the session, the logged in user and the page of cats
+        with self.assertNumQueries(3):
+            response = self.get(reverse('cat-index'))
+        self.assertContains(response, 'Lolo')
+        self.assertContains(response, 'Fed for today')
+        self.assertNotContains(response, 'Not mine')
+        self.assertContains(response, 'Log out')
+        # The second visit is served from the cache, after the ETag query the CSRF cookie set by the first visit allows
+        with self.assertNumQueries(3):
+            self.get(reverse('cat-index'))
+
+    def test_unchanged_index_gets_a_304(self):
+        self.async_client.force_login(self.user)
+        # The first visit sets the CSRF cookie the ETag is made from
+        self.get(reverse('cat-index'))
+        etag = self.get(reverse('cat-index'))['ETag']
+        response = async_to_sync(self.async_client.get)(reverse('cat-index'), headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_loads_everything_before_rendering(self):
+        self.async_client.force_login(self.user)
+        with self.assertNumQueries(CatDetailQueryBudgetTests.QUERY_BUDGET):
+            response = self.get(reverse('cat-detail', kwargs={'cat_id': self.cat.id}))
+        self.assertContains(response, 'has been fed all their meals for today!')
+        self.assertContains(response, 'A grey Mouse')
+        self.assertContains(response, 'A red Laser')
+        # The queries the async ORM ran in its worker thread are counted too
+        self.assertIn(f'desc="{CatDetailQueryBudgetTests.QUERY_BUDGET} queries"', response['Server-Timing'])
+
+    def test_anonymous_users_are_redirected(self):
+        response = self.get(reverse('cat-index'))
+        self.assertEqual(response.status_code, 302)
+
+class RequestMetricsTests(CatCollectorTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+
+    def setUp(self):
+        super().setUp()
+        # Snapshots go to a folder of their own, so files left by other processes are never merged in
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        metrics_settings = override_settings(REQUEST_METRICS_DIR=directory)
+        metrics_settings.enable()
+        self.addCleanup(metrics_settings.disable)
+        registry.reset()
+        self.client.force_login(self.user)
+
+    def test_server_timing_header_reports_queries(self):
+        response = self.client.get(reverse('toy-index'))
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="3 queries"$')
+
+    def test_metrics_are_aggregated_per_view_and_dumped(self):
+        for _ in range(3):
+            self.client.get(reverse('toy-index'))
+        self.client.get(reverse('about'))
+        stats = registry.snapshot()
+        self.assertEqual(stats['toy-index']['requests'], 3)
+        # 3 queries for the first visit, then 4 once the CSRF cookie lets the list work out its ETag
+        self.assertEqual(stats['toy-index']['queries'], 11)
+        self.assertEqual(sum(stats['toy-index']['duration_histogram']), 3)
+        self.assertEqual(stats['about']['requests'], 1)
+
+        registry.flush()
+        out = StringIO()
+        call_command('dump_request_metrics', '--json', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['toy-index']['requests'], 3)
+        out = StringIO()
+        call_command('dump_request_metrics', '--reset', stdout=out)
+        self.assertIn('toy-index', out.getvalue())
+        out = StringIO()
+        call_command('dump_request_metrics', stdout=out)
+        self.assertIn('No request metrics', out.getvalue())
+
+    def test_reset_reaches_processes_that_are_still_running(self):
+        for _ in range(2):
+            registry.record('toy-index', 12.0, 3, 1.0)
+        registry.flush()
+        old_epoch = read_epoch()
+        call_command('dump_request_metrics', '--reset', stdout=StringIO())
+        self.assertNotEqual(read_epoch(), old_epoch)
+        # A process that wrote its old totals just before noticing the reset is ignored
+        write_snapshot({'toy-index': registry.snapshot()['toy-index']}, old_epoch)
+        self.assertEqual(load_snapshots(), {})
+        # This (still running) process drops its old totals on its next flush instead of writing them back
+        registry.flush()
+        self.assertEqual(load_snapshots(), {})
+        registry.record('toy-index', 12.0, 3, 1.0)
+        registry.flush()
+        self.assertEqual(load_snapshots()['toy-index']['requests'], 1)
+
+    def test_requests_since_the_last_flush_are_written_at_exit(self):
+        registry.flush()
+        # Fewer than REQUEST_METRICS_FLUSH_SECONDS after the last snapshot, so nothing is written yet
+        registry.record('toy-index', 12.0, 3, 1.0)
+        self.assertEqual(load_snapshots(), {})
+        registry.flush_pending()
+        self.assertEqual(load_snapshots()['toy-index']['requests'], 1)
+
+class TemplateCacheTests(TestCase):
+    def test_production_settings_refuse_the_repository_key(self):
+        with self.assertRaises(ImproperlyConfigured):
+            load_settings('catcollector.production_settings', DJANGO_SECRET_KEY='')
+        self.assertEqual(production_settings.SECRET_KEY, 'not-the-real-key')
+
+    def test_production_settings_use_the_cached_loader(self):
+        self.assertFalse(production_settings.DEBUG)
+        self.assertTrue(production_settings.WARM_TEMPLATES)
+        engine = production_settings.TEMPLATES[0]
+        self.assertFalse(engine['APP_DIRS'])
+        self.assertFalse(engine['OPTIONS']['debug'])
+        self.assertEqual(engine['OPTIONS']['loaders'][0][0], 'django.template.loaders.cached.Loader')
+        self.assertIn('django.contrib.auth.context_processors.auth', engine['OPTIONS']['context_processors'])
+        self.assertEqual(production_settings.STORAGES['staticfiles']['BACKEND'], 'catcollector.static_storage.CompressedManifestStaticFilesStorage')
+        with override_settings(TEMPLATES=production_settings.TEMPLATES):
+            self.assertContains(self.client.get(reverse('about')), 'About')
+
+    def test_warm_templates_loads_every_site_template(self):
+        names = template_names(django_engines()[0])
+        self.assertIn('cats/index.html', names)
+        self.assertIn('partials/pagination.html', names)
+        # Django's own templates (the admin's) are not warmed
+        self.assertFalse(any(name.startswith('admin/') for name in names))
+        out = StringIO()
+        call_command('warm_templates', stdout=out)
+        self.assertIn(f'Loaded {len(names)} templates', out.getvalue())
+
+    def test_warm_templates_fails_on_a_broken_template(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        Path(directory, 'broken.html').write_text('{% if %}')
+        templates = [{'BACKEND': 'django.template.backends.django.DjangoTemplates', 'DIRS': [directory]}]
+        with override_settings(TEMPLATES=templates, BASE_DIR=Path(directory)):
+            with self.assertRaises(CommandError):
+                call_command('warm_templates', stdout=StringIO(), stderr=StringIO())
+
+    def test_benchmark_compares_the_loaders(self):
+        out = StringIO()
+        call_command('benchmark_templates', '--renders', '2', '--template', 'about.html', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['strategies']), {'uncached', 'cached-debug', 'cached'})
+        self.assertEqual(report['strategies']['cached']['renders'], 2)
+        with self.assertRaises(CommandError):
+            call_command('benchmark_templates', '--renders', '1', '--template', 'missing.html', stdout=StringIO())
+
+class StaticUrls:
+    urlpatterns = [re_path(r'^static/(?P<path>.*)$', serve_static)]
+
+@override_settings(ROOT_URLCONF=StaticUrls)
+class StaticPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Collect once into a throwaway STATIC_ROOT with the production storage
+        cls.static_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            STATIC_ROOT=cls.static_root,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'catcollector.static_storage.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        cls.settings_override.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.static_root, 'staticfiles.json')) as manifest:
+            cls.manifest = json.load(manifest)['paths']
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.static_root)
+        super().tearDownClass()
+
+    def read(self, name):
+        with open(os.path.join(self.static_root, name), 'rb') as file:
+            return file.read()
+
+    def test_collectstatic_hashes_and_compresses(self):
+        hashed = self.manifest['css/base.css']
+        self.assertRegex(hashed, r'^css/base\.[0-9a-f]{12}\.css$')
+        self.assertEqual(self.read(hashed), self.read('css/base.css'))
+        self.assertEqual(gzip.decompress(self.read(hashed + '.gz')), self.read(hashed))
+        # Images that are not text are left alone
+        self.assertFalse(any(name.endswith('.png.gz') for name in os.listdir(os.path.join(self.static_root, 'admin', 'img'))))
+
+    def test_minify_uses_the_optional_minifiers(self):
+        css = b'a {  color: red;  }'
+        with mock.patch('catcollector.static_storage.rcssmin', None):
+            self.assertEqual(minify('css/base.css', css), css)
+        fake = mock.Mock(cssmin=lambda text: text.replace(' ', ''))
+        with mock.patch('catcollector.static_storage.rcssmin', fake):
+            self.assertEqual(minify('css/base.css', css), b'a{color:red;}')
+            # Files that are minified already are copied as they are
+            self.assertEqual(minify('vendor/lib.min.css', css), css)
+
+    def test_hashed_files_are_cached_forever_and_sent_compressed(self):
+        url = f"/static/{self.manifest['css/base.css']}"
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.read(self.manifest['css/base.css']))
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': plain['ETag']}).status_code, 304)
+        # The unhashed name may change, so browsers must check back
+        self.assertEqual(self.client.get('/static/css/base.css')['Cache-Control'], 'no-cache')
+
+    def test_only_collected_files_are_served(self):
+        for url in ['/static/../catcollector/settings.py', f"/static/{self.manifest['css/base.css']}.gz", '/static/missing.css']:
+            with self.subTest(url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+class VendoredAssetTests(TestCase):
+    path = 'vendor/mc-datepicker/mc-calendar.min.js'
+
+    def test_deploy_check_reports_missing_files(self):
+        with mock.patch('main_app.vendor.finders.find', return_value=None):
+            errors = check_vendor_assets(None)
+        self.assertEqual([error.id for error in errors], ['main_app.E001'] * len(VENDOR_ASSETS))
+        with mock.patch('main_app.vendor.finders.find', return_value='/somewhere'):
+            self.assertEqual(check_vendor_assets(None), [])
+
+    def test_detail_page_never_loads_from_a_cdn(self):
+        user = User.objects.create_user(username='tester', password='not-a-real-password')
+        cat = Cat.objects.create(name='Lolo', breed='tabby', description='Kinda rude.', age=3, user=user)
+        self.client.force_login(user)
+        response = self.client.get(reverse('cat-detail', kwargs={'cat_id': cat.id}))
+        self.assertContains(response, f'/static/{self.path}')
+        self.assertNotContains(response, 'cdn.jsdelivr.net')
+
+    def test_downloads_are_pinned_to_a_release(self):
+        for url in VENDOR_ASSETS.values():
+            self.assertIn(f'/mc-datepicker@{MC_DATEPICKER_VERSION}/', url)
+
+    def test_vendor_assets_command_downloads_every_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        download = mock.MagicMock()
+        download.return_value.__enter__.return_value.read.return_value = b'/* datepicker */'
+        with mock.patch('main_app.management.commands.vendor_assets.urlopen', download):
+            call_command('vendor_assets', '--directory', directory, stdout=StringIO())
+        for path in VENDOR_ASSETS:
+            self.assertEqual(Path(directory, path).read_bytes(), b'/* datepicker */')
+        with mock.patch('main_app.management.commands.vendor_assets.urlopen', side_effect=OSError('offline')):
+            with self.assertRaises(CommandError):
+                call_command('vendor_assets', '--directory', directory, stdout=StringIO())
+
+class ConditionalPageTests(CatCollectorTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='not-a-real-password')
+        cls.cat = Cat.objects.create(name='Lolo', breed='tabby', description='Kinda rude.', age=3, user=cls.user)
+        Toy.objects.create(name='Mouse', color='grey')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        # The first visit sets the CSRF cookie the ETags are made from
+        self.client.get(reverse('cat-index'))
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        return response['ETag']
+
+    def test_unchanged_lists_are_not_rendered_again(self):
+        for url in [reverse('cat-index'), reverse('toy-index')]:
+            with self.subTest(url):
+                etag = self.etag(url)
+                # The session, the user and the ETag query; no page query and no rendering
+                with self.assertNumQueries(3):
+                    response = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_changes_give_a_new_etag(self):
+        index_etag = self.etag(reverse('cat-index'))
+        # Feedings update the cat's counters with update(), which sets updated_at itself
+        time.sleep(0.002)
+        Feeding.objects.create(cat=self.cat, date=date.today(), meal='B')
+        self.assertNotEqual(self.etag(reverse('cat-index')), index_etag)
+
+        toy_etag = self.etag(reverse('toy-index'))
+        Toy.objects.get(name='Mouse').delete()
+        self.assertNotEqual(self.etag(reverse('toy-index')), toy_etag)
+
+    def test_etag_depends_on_user_and_csrf_cookie(self):
+        etag = self.etag(reverse('toy-index'))
+        self.client.cookies['csrftoken'] = 'x' * 32
+        self.assertNotEqual(self.etag(reverse('toy-index')), etag)
+        self.client.force_login(User.objects.create_user(username='other', password='not-a-real-password'))
+        self.assertNotEqual(self.etag(reverse('toy-index')), etag)
+
+    def test_logged_out_visitors_are_redirected_without_an_etag(self):
+        self.client.logout()
+        response = self.client.get(reverse('toy-index'))
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('ETag', response)
+
+    def test_compressed_pages_keep_matching(self):
+        response = self.client.get(reverse('cat-index'), headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'Lolo', gzip.decompress(response.content))
+        # Compressing makes the ETag weak, which If-None-Match still matches
+        self.assertTrue(response['ETag'].startswith('W/'))
+        response = self.client.get(reverse('cat-index'), headers={'Accept-Encoding': 'gzip', 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_images_and_ranges_are_not_compressed(self):
+        request = RequestFactory().get('/', headers={'Accept-Encoding': 'gzip'})
+        middleware = CompressionMiddleware(lambda request: None)
+        for response in [
+            HttpResponse(b'x' * 1000, content_type='image/png'),
+            HttpResponse(b'x' * 1000, content_type='text/css', status=206, headers={'Content-Range': 'bytes 0-999/5000'}),
+        ]:
+            self.assertNotIn('Content-Encoding', middleware.process_response(request, response))
+        response = middleware.process_response(request, HttpResponse(b'x' * 1000, content_type='text/css; charset=utf-8'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
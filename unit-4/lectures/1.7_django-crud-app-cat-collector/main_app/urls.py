@@ -1,14 +1,21 @@
+from django.conf import settings
 from django.urls import path
 from . import views # Import views to connect routes to view functions
 
+# Serve the cat pages with the async views when the site runs under an ASGI server (see ASYNC_READ_VIEWS in settings.py)
+if settings.ASYNC_READ_VIEWS:
+    cat_index_view, cat_detail_view = views.cat_index_async, views.cat_detail_async
+else:
+    cat_index_view, cat_detail_view = views.cat_index, views.cat_detail
+
 urlpatterns = [
     # Routes will be added here
     # ? path('', views.home, name='home'),
     path('', views.Home.as_view(), name='home'),
     path('about/', views.about, name='about'),
     # route for cats index
-    path('cats/', views.cat_index, name='cat-index'),
-    path('cats/<int:cat_id>/', views.cat_detail, name='cat-detail'),
+    path('cats/', cat_index_view, name='cat-index'),
+    path('cats/<int:cat_id>/', cat_detail_view, name='cat-detail'),
     path('cats/create/', views.CatCreate.as_view(), name='cat-create'),
     # By convention, CBVs that work with individual model instances will expect to find a named parameter of pk for “primary key”. This is why we didn’t use cat_id as we did in the detail entry.
     path('cats/<int:pk>/update/', views.CatUpdate.as_view(), name='cat-update'),
@@ -26,5 +33,9 @@ urlpatterns = [
     # New URL to associate a toy with a cat
     path('cats/<int:cat_id>/associate-toy/<int:toy_id>/', views.associate_toy, name='associate-toy'),
     path('cats/<int:cat_id>/remove-toy/<int:toy_id>/', views.remove_toy, name='remove-toy'),
+    # Add and/or remove several toys for one or more cats in a single POST
+    path('cats/toys/', views.bulk_update_toys, name='bulk-update-toys'),
     path('accounts/signup/', views.signup, name='signup'),
+    # Download the logged in user's cats, feedings and toys as CSV or JSON Lines
+    path('export/', views.export_data, name='export'),
 ]
@@ -0,0 +1,32 @@
+from pathlib import Path
+from django.contrib.staticfiles import finders
+from django.core.checks import Error, Tags, register
+
+# NOTES ON VENDORED ASSETS:
+# Third-party files the pages use (the MCDatepicker calendar on the cat detail page) are kept in main_app/static/vendor/ rather than loaded from a CDN,
+# so they go through the same pipeline as our own files (hashed names, compressed copies, year-long caching; see catcollector/static_storage.py)
+# and the page no longer depends on, or opens a connection to, another server.
+# `python manage.py vendor_assets` downloads them; commit the files it writes. The templates load them with {% static %} only, there is no CDN fallback.
+# The URLs name an exact release, so the download never changes under us. To upgrade, change the version below, re-run the command and commit the new files.
+# `python manage.py check --deploy` fails while any of them is missing: the hashed static storage cannot give a URL for a file collectstatic never saw.
+# Until then (e.g. in development) cat-detail.js leaves the feeding form with the browser's own date input.
+
+MC_DATEPICKER_VERSION = '0.6.5'
+
+# Static path -> where to download it from
+VENDOR_ASSETS = {
+    'vendor/mc-datepicker/mc-calendar.min.css': f'https://cdn.jsdelivr.net/npm/mc-datepicker@{MC_DATEPICKER_VERSION}/dist/mc-calendar.min.css',
+    'vendor/mc-datepicker/mc-calendar.min.js': f'https://cdn.jsdelivr.net/npm/mc-datepicker@{MC_DATEPICKER_VERSION}/dist/mc-calendar.min.js',
+}
+VENDOR_DIRECTORY = Path(__file__).resolve().parent / 'static'
+
+def missing_vendor_assets():
+    return [path for path in VENDOR_ASSETS if finders.find(path) is None]
+
+# Registered in MainAppConfig.ready()
+@register(Tags.staticfiles, deploy=True)
+def check_vendor_assets(app_configs, **kwargs):
+    return [
+        Error(f'{path} has not been vendored.', hint='Run `python manage.py vendor_assets` and commit the files it writes.', id='main_app.E001')
+        for path in missing_vendor_assets()
+    ]
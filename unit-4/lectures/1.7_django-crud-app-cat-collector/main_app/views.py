@@ -2,6 +2,8 @@
 
 # Add redirect import since we will be redirecting after a feed form submission
 from django.shortcuts import render, redirect
+from django.db import IntegrityError, transaction
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.views.generic import ListView, DetailView
 # Add the two imports below
@@ -14,7 +16,17 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from .models import Cat, Toy
 # Import the FeedingForm
 from .forms import FeedingForm
+# Import the keyset paginator used by the cat and toy lists
+from .pagination import KeysetPage, apaginate_by_id, get_cursor, get_page_size, paginate_by_id
+# Import the page cache helpers
+from . import cache
+# Import the streaming export helpers
+from .exports import EXPORT_FORMATS
 from django.contrib.auth.views import LoginView
+from django.views.decorators.http import require_POST
+from django.utils.decorators import method_decorator
+# Import the ETag helpers that let unchanged lists answer with a 304
+from .conditional import acat_index_etag, cat_index_etag, conditional_page, toy_list_etag
 
 # Import HttpResponse to send text-based responses
 # ? from django.http import HttpResponse
@@ -51,21 +63,51 @@ def about(request):
 # ]
 
 @login_required
+# An unchanged list is answered with a 304 before anything below runs (see conditional.py)
+@conditional_page(cat_index_etag)
 def cat_index(request):
     # Render the cats/index.html template with the cats data
     # This reads ALL cats, not just the logged in user's cats
     # ? cats = Cat.objects.all()
     # To display just the logged in user’s cats, we just need to change the query to this:
-    cats = Cat.objects.filter(user=request.user)
+    # ? cats = Cat.objects.filter(user=request.user)
+    # Load the user's cats with their feeding counters so the template can show who is hungry without a query per cat.
+    # Only load one page of cats at a time, walking forward by id with ?after=<last id>.
+    # Each page is cached per user and thrown away as soon as any of the user's cats or feedings change (see cache.py).
+    key = cache.page_key(
+        'cat-index', [cache.user_scope(request.user.id)],
+        request.user.id, get_cursor(request), get_page_size(request),
+    )
+    cached = cache.get_page(key)
+    if cached is None:
+        page = paginate_by_id(Cat.objects.with_feeding_status(request.user), request)
+        cache.set_page(key, (page.items, page.next_cursor, page.page_size))
+    else:
+        page = KeysetPage(*cached, request)
     # You could also retrieve the logged in user's cats like this
     # cats = request.user.cat_set.all()
-    return render(request, 'cats/index.html', {'cats': cats})
+    return render(request, 'cats/index.html', {'cats': page.items, 'page': page})
 
 @login_required
 def cat_detail(request, cat_id):
-    cat = Cat.objects.get(id=cat_id)
-    # Only get the toys the cat does not have
-    toys_cat_doesnt_have = Toy.objects.exclude(id__in = cat.toys.all().values_list('id'))
+    # ? cat = Cat.objects.get(id=cat_id)
+    # Fetch the cat together with its owner (JOIN) and prefetch its feedings and toys up front.
+    # The template reads cat.feeding_set.all and cat.toys.all, which are served from this prefetch instead of one query each (cat.fed_for_today reads the cat's own counter fields).
+    # The loaded cat (with its prefetched feedings and toys) and the available toys are cached, so repeat visits skip the database entirely until the cat, its feedings or any toy changes.
+    key = cache.page_key(
+        'cat-detail', [cache.cat_scope(cat_id), cache.TOYS_SCOPE],
+        request.user.id, cat_id,
+    )
+    cached = cache.get_page(key)
+    if cached is None:
+        cat = Cat.objects.select_related('user').prefetch_related('feeding_set', 'toys').get(id=cat_id)
+        # Only get the toys the cat does not have
+        # ? toys_cat_doesnt_have = Toy.objects.exclude(id__in = cat.toys.all().values_list('id'))
+        # The cat's toys are already in memory, so exclude them by id and evaluate the list once here rather than letting the template run a COUNT and then a SELECT.
+        toys_cat_doesnt_have = list(Toy.objects.exclude(id__in=[toy.id for toy in cat.toys.all()]))
+        cache.set_page(key, (cat, toys_cat_doesnt_have))
+    else:
+        cat, toys_cat_doesnt_have = cached
     # ? toys = Toy.objects.all()  # Fetch all toys
     # instantiate FeedingForm to be rendered in the template
     feeding_form = FeedingForm()
@@ -77,6 +119,49 @@ def cat_detail(request, cat_id):
         'toys': toys_cat_doesnt_have  # send those toys
     })
 
+# Async versions of cat_index and cat_detail, used instead of them when ASYNC_READ_VIEWS is on (see urls.py).
+# Under an ASGI server (uvicorn, daphne) an async view gives the thread back to the event loop while it waits for the cache or the database,
+# so one worker process can serve many slow clients at once. Under WSGI (runserver, gunicorn) Django would have to start an event loop for every request, so keep the sync views there.
+# Nothing may touch the database lazily inside an async view: the ORM only allows that through its a-prefixed methods (aget, acount...) and `async for`,
+# so the user is loaded with request.auser() and everything the templates read is fetched (or prefetched) before rendering.
+@login_required
+@conditional_page(acat_index_etag)
+async def cat_index_async(request):
+    # login_required already loaded the user with await request.auser(); put it on request.user so the templates can read it without a query
+    request.user = user = await request.auser()
+    key = await cache.apage_key(
+        'cat-index', [cache.user_scope(user.id)],
+        user.id, get_cursor(request), get_page_size(request),
+    )
+    cached = await cache.aget_page(key)
+    if cached is None:
+        page = await apaginate_by_id(Cat.objects.with_feeding_status(user), request)
+        await cache.aset_page(key, (page.items, page.next_cursor, page.page_size))
+    else:
+        page = KeysetPage(*cached, request)
+    return render(request, 'cats/index.html', {'cats': page.items, 'page': page})
+
+@login_required
+async def cat_detail_async(request, cat_id):
+    request.user = user = await request.auser()
+    key = await cache.apage_key(
+        'cat-detail', [cache.cat_scope(cat_id), cache.TOYS_SCOPE],
+        user.id, cat_id,
+    )
+    cached = await cache.aget_page(key)
+    if cached is None:
+        # aget runs the query and its prefetches together, so cat.feeding_set.all and cat.toys.all are ready for the template
+        cat = await Cat.objects.select_related('user').prefetch_related('feeding_set', 'toys').aget(id=cat_id)
+        toys_cat_doesnt_have = [toy async for toy in Toy.objects.exclude(id__in=[toy.id for toy in cat.toys.all()])]
+        await cache.aset_page(key, (cat, toys_cat_doesnt_have))
+    else:
+        cat, toys_cat_doesnt_have = cached
+    return render(request, 'cats/detail.html', {
+        'cat': cat,
+        'feeding_form': FeedingForm(),
+        'toys': toys_cat_doesnt_have,
+    })
+
 class CatCreate(LoginRequiredMixin, CreateView):
     model = Cat
     fields = ['name', 'breed', 'description', 'age']
@@ -111,7 +196,13 @@ def add_feeding(request, cat_id):
         # After ensuring that the form contains valid data, we save the form with the commit=False option, which returns an in-memory model object so that we can assign the cat_id before actually saving to the database.
         new_feeding = form.save(commit=False)
         new_feeding.cat_id = cat_id
-        new_feeding.save()
+        # The database only allows each meal once per cat per day, so a duplicate meal is simply ignored.
+        # The savepoint keeps a rejected insert from breaking any surrounding transaction, and also rolls back the cat's feeding counters, which Feeding.save() bumps in the same transaction.
+        try:
+            with transaction.atomic():
+                new_feeding.save()
+        except IntegrityError:
+            pass
     # Finally we will redirect instead of render since data has been changed in the database.
     return redirect('cat-detail', cat_id=cat_id)
 
@@ -119,8 +210,24 @@ class ToyCreate(LoginRequiredMixin, CreateView):
     model = Toy
     fields = '__all__'
 
+# Runs before LoginRequiredMixin's check, so toy_list_etag gives logged out visitors no ETag and they are redirected as before
+@method_decorator(conditional_page(toy_list_etag), name='dispatch')
 class ToyList(LoginRequiredMixin, ListView):
     model = Toy
+    # The queryset below returns a plain list (one page), so name the template and context variable explicitly.
+    template_name = 'main_app/toy_list.html'
+    context_object_name = 'toy_list'
+
+    # ListView's built-in paginate_by uses OFFSET, which gets slower the deeper you page.
+    # Use keyset pagination on the id instead so every page of the shared toy catalogue costs the same.
+    def get_queryset(self):
+        self.page = paginate_by_id(Toy.objects.all(), self.request)
+        return self.page.items
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page'] = self.page
+        return context
 
 class ToyDetail(LoginRequiredMixin, DetailView):
     model = Toy
@@ -142,12 +249,59 @@ def associate_toy(request, cat_id, toy_id):
 @login_required
 def remove_toy(request, cat_id, toy_id):
     # Look up the cat
-    cat = Cat.objects.get(id=cat_id)
+    # ? cat = Cat.objects.get(id=cat_id)
     # Look up the toy
-    toy = Toy.objects.get(id=toy_id)
+    # ? toy = Toy.objects.get(id=toy_id)
     # Remove the toy from the cat
-    cat.toys.remove(toy)
-    return redirect('cat-detail', cat_id=cat.id)
+    # ? cat.toys.remove(toy)
+    # Like associate_toy, pass the toy's id instead of fetching the whole toy first
+    Cat.objects.get(id=cat_id).toys.remove(toy_id)
+    return redirect('cat-detail', cat_id=cat_id)
+
+# Turn a list of submitted ids into a set of integers, ignoring anything that is not a number
+def _parse_ids(values):
+    return {int(value) for value in values if value.isdigit()}
+
+@login_required
+@require_POST
+def bulk_update_toys(request):
+    # The form can send several "cat", "add" and "remove" values at once, e.g. cat=1&cat=2&add=5&add=6&remove=7
+    # Only the logged in user's cats can be changed.
+    cats = Cat.objects.filter(user=request.user, id__in=_parse_ids(request.POST.getlist('cat')))
+    # A toy's own button on the cat detail page sends add_one or remove_one: change just that toy, not the other toys ticked in the same form
+    if 'add_one' in request.POST or 'remove_one' in request.POST:
+        add_ids = _parse_ids(request.POST.getlist('add_one'))
+        remove_ids = _parse_ids(request.POST.getlist('remove_one')) - add_ids
+    else:
+        add_ids = _parse_ids(request.POST.getlist('add'))
+        remove_ids = _parse_ids(request.POST.getlist('remove')) - add_ids
+    # Skip ids that do not belong to a toy so the insert below cannot fail on the foreign key
+    if add_ids:
+        add_ids = list(Toy.objects.filter(id__in=add_ids).values_list('id', flat=True))
+    # Apply every change in one transaction: one DELETE and one INSERT no matter how many cats and toys were picked
+    with transaction.atomic():
+        if remove_ids:
+            cats.remove_toys(remove_ids)
+        if add_ids:
+            cats.add_toys(add_ids)
+    # Back to the cat's page when one cat was picked, as long as it is one of the user's; otherwise (or for a bad id) to the index
+    if len(request.POST.getlist('cat')) == 1:
+        cat_id = cats.values_list('id', flat=True).first()
+        if cat_id is not None:
+            return redirect('cat-detail', cat_id=cat_id)
+    return redirect('cat-index')
+
+@login_required
+def export_data(request):
+    # Choose the export format with ?format=csv (the default) or ?format=jsonl
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f'Unknown export format: {export_format}')
+    stream_rows, content_type, extension = EXPORT_FORMATS[export_format]
+    # StreamingHttpResponse sends each row as the generator produces it instead of building the whole file in memory first
+    response = StreamingHttpResponse(stream_rows(request.user), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="catcollector-export.{extension}"'
+    return response
 
 def signup(request):
     error_message = ''